@@ -2,11 +2,280 @@
 __init__.py file to expose user-friendly API
 '''
 
-from typing import Dict, List, Union
+import functools
+import io
+import mmap
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Union
 
-from .lexer import lex
-from .parser_ import parse
+from .aio import load_async, load_async_stream
+from .decoder import decode
+from .documents import check_end, iter_documents
+from .events import Event, events
+from .extract import extract
+from .incremental import IncrementalDocument
+from .instrument import ParseStats, load_instrumented
+from .jsonl import iter_jsonl, load_jsonl_file
+from .keycache import KeyCache
+from .lazy import LazyArray, LazyObject, build_tape, load_lazy
+from .lexer import (NumberHook, TokenStream, decode_chunks, lex, lex_bytes,
+                    lex_chunks, lex_compact, lex_iter, position)
+from .parallel import parse_parallel, split_array
+from .parsecache import ParseCache, freeze
+from .parser_ import ParseError, locate, parse, parse_iterative
+from .schema import Record, SchemaParser
+from .validator import validate
+from .writer import encode, iter_encode
 
+DEFAULT_CHUNK_SIZE = 64 * 1024
 
-def load_json_string(json: str) -> Union[Dict, List, None]:
-    return parse(lex(json))
+
+PARSE_ENGINES = ["direct", "tokens"]
+
+
+def load_json_string(json: str, engine: str = "direct", parse_float: NumberHook = None,
+                     parse_int: NumberHook = None, key_cache: Optional[KeyCache] = None,
+                     max_depth: Optional[int] = None, cache: Optional[ParseCache] = None,
+                     strict: bool = False, stats: Optional[ParseStats] = None) -> Any:
+    '''
+    Args:
+        json: The JSON text to parse
+        engine: "direct" to build the result in a single pass over the text
+            (see decoder.decode), or "tokens" to lex the text into tokens and
+            parse those. Both give the same results and raise the same errors
+        parse_float: Called with the text of each number with a fraction or
+            exponent, float by default. Pass decimal.Decimal for exact values
+        parse_int: Called with the text of each other number, int by default
+        key_cache: A KeyCache to intern object keys with (see keycache.KeyCache),
+            which saves memory on documents with many objects of the same shape
+        max_depth: The deepest nesting allowed before raising a DepthError,
+            unlimited by default. Any depth can be parsed either way
+        cache: A ParseCache to look json up in before parsing it, which
+            returns frozen results or fresh copies (see parsecache.ParseCache)
+        strict: Whether to raise a TrailingDataError (a ParseError) if there
+            is anything but whitespace after the top-level object or array.
+            Otherwise the parser stops reading after its closing bracket
+        stats: A ParseStats to record the time spent in each stage of
+            parsing in, along with what json holds (see instrument.ParseStats)
+
+    Returns:
+        The parsed JSON
+
+    '''
+    if cache is not None:
+        load = functools.partial(load_json_string, engine=engine, parse_float=parse_float,
+                                 parse_int=parse_int, key_cache=key_cache, max_depth=max_depth, strict=strict,
+                                 stats=stats)
+        return cache.get(json, load, (parse_float, parse_int, max_depth, strict))
+    if stats is not None and engine in PARSE_ENGINES:
+        result = load_instrumented(json, stats, engine, parse_float, parse_int, key_cache, max_depth)
+    elif engine == "direct":
+        result = decode(json, parse_float, parse_int, key_cache, max_depth)
+    elif engine == "tokens":
+        # lex lazily so that the full token list is never materialized
+        tokens = lex_iter(json, parse_float=parse_float, parse_int=parse_int)
+        try:
+            result = parse_iterative(tokens, key_cache, max_depth)
+        except ParseError as error:
+            locate(error, json, max_depth)
+            raise
+    else:
+        raise ValueError(f"Unknown parse engine '{engine}'. Expected one of {PARSE_ENGINES}")
+    if strict:
+        check_end(json)
+    return result
+
+
+def validate_json(json: Union[str, bytes]) -> None:
+    '''
+    Checks that json (a str, or UTF-8 encoded bytes) would parse, without
+    building anything, and otherwise raises the TokenError or ParseError that
+    parsing it would. See validator.validate.
+    '''
+    validate(json)
+
+
+def load_json_lazy(json: str, parse_float: NumberHook = None,
+                   parse_int: NumberHook = None) -> Union[LazyObject, LazyArray, Dict, List, None]:
+    '''
+    Indexes json in a single pass and returns a read-only view of its
+    top-level object or array, which decodes values only as they are read.
+    See lazy.load_lazy, and load_json_string for the arguments.
+    '''
+    return load_lazy(json, parse_float, parse_int)
+
+
+def iter_json_events(json: str) -> Iterator[Event]:
+    ''' Yields (path, event, value) tuples for json, see events.events '''
+    return events(lex_iter(json))
+
+
+def load_json_stream(fileobj: IO, chunk_size: int = DEFAULT_CHUNK_SIZE, parse_float: NumberHook = None,
+                     parse_int: NumberHook = None) -> Union[Dict, List, None]:
+    '''
+    Args:
+        fileobj: A file object opened in text mode, or in binary mode in
+            which case its contents are decoded as UTF-8
+        chunk_size: The number of characters (or bytes) to read at a time
+        parse_float: See load_json_string
+        parse_int: See load_json_string
+
+    Returns:
+        The parsed JSON, as with load_json_string
+
+    The stream is read one chunk at a time, so memory use does not grow with
+    the size of the document (aside from the parsed result itself).
+
+    '''
+    chunk_start = [0, 1, 1]
+    chunks = _track_chunks(_read_chunks(fileobj, chunk_size), chunk_start)
+    try:
+        return parse_iterative(lex_chunks(chunks, parse_float=parse_float, parse_int=parse_int))
+    except ParseError as error:
+        if error.offset is None:
+            # the text read so far is gone, so report the chunk being read
+            error.offset, error._line_number, error._column = chunk_start
+        raise
+
+
+def load_json_file(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, parse_float: NumberHook = None,
+                   parse_int: NumberHook = None) -> Union[Dict, List, None]:
+    ''' Parses the UTF-8 encoded JSON file at path, see load_json_stream '''
+    with open(path, "rb") as f:
+        return load_json_stream(f, chunk_size, parse_float, parse_int)
+
+
+def iter_json_documents(fileobj: IO, chunk_size: int = DEFAULT_CHUNK_SIZE, parse_float: NumberHook = None,
+                        parse_int: NumberHook = None, max_depth: Optional[int] = None) -> Iterator[Union[Dict, List]]:
+    '''
+    Yields each of the JSON objects and arrays written one after another to a
+    file object (such as a socket's makefile("rb")), as soon as it has been
+    read in full. See documents.iter_documents, and load_json_stream for the
+    other arguments.
+    '''
+    return iter_documents(_read_chunks(fileobj, chunk_size), parse_float, parse_int, max_depth)
+
+
+def load_json_bytes(data: Any, parse_float: NumberHook = None, parse_int: NumberHook = None,
+                    key_cache: Optional[KeyCache] = None, max_depth: Optional[int] = None) -> Union[Dict, List, None]:
+    '''
+    Args:
+        data: A UTF-8 encoded JSON text as bytes, or any other object
+            supporting the buffer protocol, such as a bytearray, memoryview
+            or mmap
+        parse_float: See load_json_string
+        parse_int: See load_json_string
+        key_cache: See load_json_string
+        max_depth: See load_json_string
+
+    Returns:
+        The parsed JSON, as with load_json_string(data.decode("utf-8"))
+
+    Only strings and numbers are decoded, as they are lexed (see
+    lexer.lex_bytes), so no decoded copy of the whole text is made unless a
+    ParseError needs to be located in it.
+
+    '''
+    tokens = lex_bytes(data, parse_float, parse_int)
+    try:
+        return parse_iterative(tokens, key_cache, max_depth)
+    except ParseError as error:
+        # the error's traceback keeps the lexer alive, and with it a view of
+        # data, which an mmap cannot be closed with
+        tokens.close()
+        locate(error, data, max_depth)
+        raise
+
+
+def load_json_mmap(path: str, parse_float: NumberHook = None, parse_int: NumberHook = None,
+                   key_cache: Optional[KeyCache] = None, max_depth: Optional[int] = None) -> Union[Dict, List, None]:
+    '''
+    Parses the UTF-8 encoded JSON file at path by memory-mapping it and
+    lexing the mapped bytes in place, see load_json_bytes. Pages of the file
+    are read in by the operating system as the lexer reaches them, and can be
+    dropped again from the page cache once it has moved on.
+    '''
+    with open(path, "rb") as f:
+        # an empty file cannot be mapped
+        if f.seek(0, io.SEEK_END) == 0:
+            return load_json_bytes(b"", parse_float, parse_int, key_cache, max_depth)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return load_json_bytes(data, parse_float, parse_int, key_cache, max_depth)
+
+
+def _read_chunks(fileobj: IO, chunk_size: int) -> Iterator[str]:
+    return decode_chunks(_read(fileobj, chunk_size))
+
+
+def _read(fileobj: IO, chunk_size: int) -> Iterator[Union[str, bytes]]:
+    # read1 returns whatever is available, rather than waiting for a full chunk
+    read = getattr(fileobj, "read1", fileobj.read)
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _track_chunks(chunks: Iterator[str], start: List[int]) -> Iterator[str]:
+    # keeps start as the offset, line and column of the chunk last read, or
+    # of the end of the text once every chunk has been read
+    offset, line_number, column = 0, 1, 1
+    for chunk in chunks:
+        if chunk:
+            start[:] = offset, line_number, column
+            yield chunk
+            offset += len(chunk)
+            line_number, column = position(chunk, len(chunk), line_number, column)
+    start[:] = offset, line_number, column
+
+
+def dump_json_string(obj: Any, indent: Optional[int] = None,
+                     default: Optional[Callable[[Any], Any]] = None) -> str:
+    '''
+    Args:
+        obj: The Python object to convert into a JSON string
+        indent: None for compact output, or the number of spaces to indent
+            each nested level by
+        default: Called with objects that cannot otherwise be written, and
+            should return one that can (see writer.encode)
+
+    Returns:
+        str: The JSON text
+
+    load_json_string reads the text back as obj when obj is a dict or a
+    list. Other objects, such as a str or an int, are written as well, but
+    the parser only accepts an object or array at the top level, so their
+    text cannot be read back with it.
+
+    '''
+    return encode(obj, indent, default)
+
+
+def dump_json_stream(obj: Any, fileobj: IO, indent: Optional[int] = None,
+                     default: Optional[Callable[[Any], Any]] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    '''
+    Writes obj as JSON to a file object opened in text mode, or in binary
+    mode in which case the text is encoded as UTF-8. The text is written in
+    chunks of about chunk_size characters as it is produced, so it is never
+    held in memory all at once. See dump_json_string for the other arguments.
+    '''
+    chunks = iter_encode(obj, indent, default, chunk_size)
+    binary = not isinstance(fileobj, io.TextIOBase)
+    if binary:
+        # other file objects, such as a SpooledTemporaryFile, may be in
+        # either mode, so writing a str to them is tried first
+        chunk = next(chunks, "")
+        try:
+            fileobj.write(chunk)
+            binary = False
+        except TypeError:
+            fileobj.write(chunk.encode("utf-8"))
+    for chunk in chunks:
+        fileobj.write(chunk.encode("utf-8") if binary else chunk)
+
+
+def dump_json_file(obj: Any, path: str, indent: Optional[int] = None,
+                   default: Optional[Callable[[Any], Any]] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    ''' Writes obj as JSON to the file at path, UTF-8 encoded, see dump_json_stream '''
+    with open(path, "w", encoding="utf-8") as f:
+        dump_json_stream(obj, f, indent, default, chunk_size)
@@ -0,0 +1,143 @@
+"""
+Title: JSON Asyncio API
+Author: Brent Pappas
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, AsyncIterable, Dict, Iterator, List, Optional, Union
+
+from .decoder import decode
+from .lexer import NumberHook, TokenError, decode_chunks, lex_chunks
+from .parallel import split_chunks
+from .parser_ import ParseError, parse_iterative
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# documents shorter than this are parsed right away, in the event loop
+DEFAULT_YIELD_THRESHOLD = 16 * 1024
+# documents at least this long are parsed in an executor
+DEFAULT_OFFLOAD_THRESHOLD = 1024 * 1024
+
+
+async def load_async(text: str, parse_float: NumberHook = None, parse_int: NumberHook = None,
+                     max_depth: Optional[int] = None, yield_threshold: int = DEFAULT_YIELD_THRESHOLD,
+                     offload_threshold: int = DEFAULT_OFFLOAD_THRESHOLD,
+                     executor: Optional[Executor] = None) -> Union[Dict, List, None]:
+    '''
+    Args:
+        text: The JSON text to parse
+        parse_float: See lexer.lex_iter
+        parse_int: See lexer.lex_iter
+        max_depth: See parser_.parse_iterative
+        yield_threshold: Texts shorter than this many characters are parsed
+            at once. Longer ones are parsed in pieces of about this size
+        offload_threshold: Texts at least this many characters long are
+            parsed in executor
+        executor: The executor to parse large texts in, the event loop's
+            default thread pool if None. A ProcessPoolExecutor keeps even the
+            GIL free for the event loop
+
+    Returns:
+        The parsed JSON, exactly as decoder.decode(text) would
+
+    Between the two thresholds, a text that is a single array is split into
+    pieces of whole elements (see parallel.split_chunks) in the default
+    thread pool, and control is given back to the event loop after each
+    piece is parsed. Any other text
+    of that size is parsed in executor too. Whichever way a text is parsed,
+    the same TokenError or ParseError is raised.
+
+    '''
+    parse = functools.partial(decode, parse_float=parse_float, parse_int=parse_int, max_depth=max_depth)
+    if len(text) < yield_threshold:
+        return parse(text)
+
+    loop = asyncio.get_running_loop()
+    chunks = None
+    if len(text) < offload_threshold:
+        # scanning for the elements takes about a quarter as long as parsing
+        # them, so that is not done in the event loop either
+        chunks = await loop.run_in_executor(None, split_chunks, text, yield_threshold)
+    if chunks is None:
+        return await loop.run_in_executor(executor, parse, text)
+
+    result = []
+    for start, end in chunks:
+        await asyncio.sleep(0)
+        try:
+            result.extend(parse("[" + text[start:end] + "]"))
+        except (TokenError, ParseError):
+            # raise the error exactly as parsing the whole text would
+            return await loop.run_in_executor(executor, parse, text)
+    return result
+
+
+async def load_async_stream(stream: Any, chunk_size: int = DEFAULT_CHUNK_SIZE, parse_float: NumberHook = None,
+                            parse_int: NumberHook = None, max_depth: Optional[int] = None) -> Union[Dict, List, None]:
+    '''
+    Args:
+        stream: An asyncio.StreamReader, or any other object with an async
+            read(n) method, or an async iterable of chunks. Chunks of bytes
+            are decoded as UTF-8
+        chunk_size: The number of bytes (or characters) to read at a time
+        parse_float: See lexer.lex_iter
+        parse_int: See lexer.lex_iter
+        max_depth: See parser_.parse_iterative
+
+    Returns:
+        The parsed JSON, as with __init__.load_json_stream
+
+    The lexer and parser run in the event loop's default thread pool, and
+    read each chunk through the event loop as they need it. Parsing thus
+    keeps up with the stream as it arrives, never holds more than about a
+    chunk of text at once, and leaves the event loop free in the meantime.
+    If this is cancelled, so is the read the thread is waiting on, and the
+    thread stops.
+
+    '''
+    loop = asyncio.get_running_loop()
+    closed = threading.Event()
+    fetching = []
+    chunks = decode_chunks(_fetch_chunks(stream, chunk_size, loop, closed, fetching))
+    tokens = lex_chunks(chunks, parse_float=parse_float, parse_int=parse_int)
+    try:
+        return await loop.run_in_executor(None, functools.partial(parse_iterative, tokens, max_depth=max_depth))
+    finally:
+        # after a cancellation, the thread may still be waiting for a chunk
+        closed.set()
+        for future in list(fetching):
+            future.cancel()
+
+
+def _fetch_chunks(stream: Any, chunk_size: int, loop: asyncio.AbstractEventLoop, closed: threading.Event,
+                  fetching: List[Future]) -> Iterator[Union[str, bytes]]:
+    # runs in a worker thread, blocking on the event loop for each chunk.
+    # The read in progress is kept in fetching so that it can be cancelled
+    if hasattr(stream, "read"):
+        fetch = functools.partial(_read, stream, chunk_size)
+    else:
+        fetch = functools.partial(_anext, stream.__aiter__())
+    while True:
+        future = asyncio.run_coroutine_threadsafe(fetch(), loop)
+        fetching[:] = [future]
+        if closed.is_set():
+            future.cancel()
+        chunk = future.result()
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def _read(stream: Any, chunk_size: int) -> Any:
+    # returns None at the end of the stream
+    return await stream.read(chunk_size) or None
+
+
+async def _anext(iterator: AsyncIterable) -> Any:
+    # returns None at the end of the iterator
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
@@ -0,0 +1,258 @@
+"""
+Title: JSON Parser Benchmarks
+Author: Brent Pappas
+
+Run from the directory containing the package, for example:
+
+    python -m python_json_parser.benchmark --output results.json
+    python -m python_json_parser.benchmark --baseline results.json
+
+Measured lex[loop] time over lex[scan] time (best of 3, full-size corpora,
+CPython 3.11), which vary between machines and runs:
+
+    numbers    1.4x
+    escapes    1.2 to 2.1x
+    nested     2.1x
+    wide       2.3 to 2.5x
+    records    2.7 to 3.2x
+    strings    12 to 14x
+
+So the scan engine is ten times faster than the loop engine only on texts
+made of long strings. Elsewhere each token still costs a step of a Python
+loop, and converting numbers and unescaping strings take much of the rest.
+validate should never be slower than load[direct].
+
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from .decoder import decode
+from .lexer import ENGINES, lex, lex_compact
+from .parser_ import parse, parse_iterative
+from .validator import validate
+
+DEFAULT_SEED = 2021
+DEFAULT_THRESHOLD = 0.1
+
+
+def number_heavy(rng: random.Random, size: int) -> str:
+    values = []
+    while size > 0:
+        kind = rng.randrange(4)
+        if kind == 0:
+            v = str(rng.randrange(-10**6, 10**6))
+        elif kind == 1:
+            v = str(rng.randrange(10**18, 10**19))
+        elif kind == 2:
+            v = repr(rng.uniform(-1000, 1000))
+        else:
+            v = f"{rng.uniform(1, 10):.6f}e{rng.randrange(-30, 30)}"
+        values.append(v)
+        size -= len(v) + 1
+    return "[" + ",".join(values) + "]"
+
+
+def string_heavy(rng: random.Random, size: int) -> str:
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+    values = []
+    while size > 0:
+        v = '"' + " ".join(rng.choice(words) for _ in range(rng.randrange(1, 40))) + '"'
+        values.append(v)
+        size -= len(v) + 2
+    return "[\n  " + ",\n  ".join(values) + "\n]"
+
+
+def deeply_nested(rng: random.Random, size: int) -> str:
+    # nested deep enough to stress the parsers, yet within the default recursion limit
+    depth = 150
+    one = "".join(rng.choice(['{"k": ', "["]) for _ in range(depth))
+    closing = "".join("}" if c == "{" else "]" for c in reversed(one.replace('{"k": ', "{")))
+    document = one + "1" + closing
+    count = max(1, size // len(document))
+    return "[" + ",".join([document] * count) + "]"
+
+
+def wide_objects(rng: random.Random, size: int) -> str:
+    objects = []
+    while size > 0:
+        members = [f'"field_{k}": {rng.randrange(1000)}' for k in range(200)]
+        v = "{" + ", ".join(members) + "}"
+        objects.append(v)
+        size -= len(v) + 1
+    return "[" + ",".join(objects) + "]"
+
+
+def escape_heavy(rng: random.Random, size: int) -> str:
+    escapes = ['\\n', '\\t', '\\"', '\\\\', '\\/', '\\u00e9', '\\u4e2d', '\\ud83d\\ude00']
+    values = []
+    while size > 0:
+        v = '"' + "".join(rng.choice(escapes) + rng.choice("abc ") for _ in range(rng.randrange(1, 30))) + '"'
+        values.append(v)
+        size -= len(v) + 1
+    return "[" + ",".join(values) + "]"
+
+
+def records(rng: random.Random, size: int) -> str:
+    lines = []
+    i = 0
+    while size > 0:
+        v = json.dumps({
+            "id": i,
+            "name": f"user {rng.randrange(10**6)}",
+            "email": f"user{i}@example.com",
+            "active": rng.random() < 0.5,
+            "score": round(rng.uniform(0, 100), 2),
+            "tags": rng.sample(["a", "b", "c", "d", "e"], 2),
+            "manager": None,
+        })
+        lines.append(v)
+        size -= len(v) + 4
+        i += 1
+    return "[\n  " + ",\n  ".join(lines) + "\n]"
+
+
+# corpus name -> (generator, size in characters)
+CORPORA = {
+    "numbers": (number_heavy, 256 * 1024),
+    "strings": (string_heavy, 256 * 1024),
+    "nested": (deeply_nested, 256 * 1024),
+    "wide": (wide_objects, 256 * 1024),
+    "escapes": (escape_heavy, 256 * 1024),
+    "records": (records, 4 * 1024 * 1024),
+}
+
+
+def generate(name: str, seed: int = DEFAULT_SEED, scale: float = 1.0) -> str:
+    ''' Returns the corpus called name, which is always the same for the same seed and scale '''
+    generator, size = CORPORA[name]
+    return generator(random.Random(seed), int(size * scale))
+
+
+def stages(text: str) -> Dict[str, Callable[[], object]]:
+    ''' Returns the benchmarked stages for text, by name '''
+    result = {}
+    for engine in ENGINES:
+        result[f"lex[{engine}]"] = lambda engine=engine: lex(text, engine)
+    result["lex[compact]"] = lambda: lex_compact(text)
+    tokens = lex(text)
+    # parse consumes a fresh iterator over the same tokens each time
+    result["parse"] = lambda: parse(tokens)
+    result["parse[iterative]"] = lambda: parse_iterative(tokens)
+    result["load[direct]"] = lambda: decode(text)
+    result["load[tokens]"] = lambda: parse(lex(text))
+    result["validate"] = lambda: validate(text)
+    result["stdlib json"] = lambda: json.loads(text)
+    return result
+
+
+def measure(function: Callable[[], object], repeat: int) -> Dict[str, float]:
+    ''' Returns the best wall time over repeat runs, and the peak traced memory of one run '''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def run(corpora: List[str], repeat: int = 3, seed: int = DEFAULT_SEED, scale: float = 1.0,
+        stage_filter: Optional[str] = None) -> Dict:
+    '''
+    Returns:
+        dict: Machine readable results, with an entry per corpus and stage
+        holding its throughput (MB/s), best time and peak memory
+
+    '''
+    results = {
+        "python": sys.version.split()[0],
+        "seed": seed,
+        "scale": scale,
+        "results": {},
+    }
+    for name in corpora:
+        text = generate(name, seed, scale)
+        megabytes = len(text.encode("utf-8")) / 1e6
+        entry = {"megabytes": megabytes, "stages": {}}
+        for stage, function in stages(text).items():
+            if stage_filter is not None and stage_filter not in stage:
+                continue
+            m = measure(function, repeat)
+            m["mb_per_s"] = megabytes / m["seconds"]
+            entry["stages"][stage] = m
+        results["results"][name] = entry
+    return results
+
+
+def regressions(results: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    '''
+    Returns:
+        list: A description of every corpus and stage whose throughput fell by
+        more than threshold (a fraction) compared to baseline
+
+    '''
+    found = []
+    for name, entry in results["results"].items():
+        old_entry = baseline.get("results", {}).get(name)
+        if old_entry is None:
+            continue
+        for stage, m in entry["stages"].items():
+            old = old_entry["stages"].get(stage)
+            if old is None:
+                continue
+            if m["mb_per_s"] < old["mb_per_s"] * (1 - threshold):
+                found.append(f"{name} {stage}: {m['mb_per_s']:.2f} MB/s, was {old['mb_per_s']:.2f} MB/s")
+    return found
+
+
+def report(results: Dict) -> str:
+    lines = [f"{'corpus':<10} {'stage':<16} {'MB/s':>9} {'seconds':>9} {'peak MB':>9}"]
+    for name, entry in results["results"].items():
+        for stage, m in entry["stages"].items():
+            lines.append(f"{name:<10} {stage:<16} {m['mb_per_s']:>9.2f} {m['seconds']:>9.4f} "
+                         f"{m['peak_bytes'] / 1e6:>9.2f}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Benchmark the JSON lexer and parsers")
+    arg_parser.add_argument("--corpus", action="append", choices=list(CORPORA),
+                            help="corpus to run (may be repeated), all by default")
+    arg_parser.add_argument("--stage", help="only run stages whose name contains this")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    arg_parser.add_argument("--scale", type=float, default=1.0, help="multiplies every corpus size")
+    arg_parser.add_argument("--output", help="write the results as JSON to this file")
+    arg_parser.add_argument("--baseline", help="fail if slower than the results in this file")
+    arg_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="fraction of throughput that may be lost before failing")
+    args = arg_parser.parse_args(argv)
+
+    results = run(args.corpus or list(CORPORA), args.repeat, args.seed, args.scale, args.stage)
+    print(report(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.threshold)
+        for line in found:
+            print(f"regression: {line}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Title: JSON Direct Decoder
+Author: Brent Pappas
+"""
+
+import re
+from typing import Dict, List, Optional, Union
+
+from .keycache import KeyCache
+from .lexer import (NUMBER_BODY, STRING_BODY, WHITESPACE_PATTERN, NumberHook,
+                    convert_number, lex_iter, unescape)
+from .parser_ import ParseError, locate, parse_iterative
+
+STRING_PATTERN = re.compile(r'"(' + STRING_BODY + r')"')
+NUMBER_PATTERN = re.compile(NUMBER_BODY)
+# whitespace is only skipped when it starts with one of these; any other
+# whitespace character makes the decoder fall back to the lexer
+WHITESPACE = " \n\r\t"
+# appended to the text, as a character no value starts or ends with
+END = "\0"
+
+
+class _Fallback(Exception):
+    """ Raised when the input is not plain, valid JSON (or, for a SchemaParser, not laid out as its schema expects) """
+
+
+def decode(text: str, parse_float: NumberHook = None, parse_int: NumberHook = None,
+           key_cache: Optional[KeyCache] = None, max_depth: Optional[int] = None) -> Union[Dict, List, None]:
+    '''
+    Args:
+        text: The JSON text to decode
+        parse_float: See lexer.lex_iter
+        parse_int: See lexer.lex_iter
+        key_cache: A KeyCache used to intern object keys and to predict the
+            keys of objects shaped like ones seen before
+        max_depth: See parser_.parse_iterative
+
+    Returns:
+        The parsed JSON, exactly as parser_.parse(lexer.lex(text)) would
+
+    This scans the text and builds Python objects in a single pass, without
+    creating any tokens. Whenever something unexpected is found, the text is
+    handed to the token based lexer and parser instead, so that exactly the
+    same TokenError or ParseError is raised (or the same result returned,
+    for the inputs the lexer is lenient about). Documents nested too deeply
+    for Python's recursion limit are handed over the same way, since
+    parser_.parse_iterative does not recurse.
+
+    Like parser_.parse, each of the decoder's recursive functions is a nested
+    function, which each return the decoded value and the index after it.
+
+    '''
+    skip = WHITESPACE_PATTERN.match
+    match_string = STRING_PATTERN.match
+    match_number = NUMBER_PATTERN.match
+    to_int = parse_int or int
+    to_float = parse_float or float
+    # reading past the end of the text finds END and falls back like any
+    # other unexpected character, so that an IndexError (or any other error)
+    # raised by parse_float or parse_int is never taken for one
+    source, text = text, text + END
+
+    def value(i: int):
+        c = text[i]
+        if c == '"':
+            match = match_string(text, i)
+            if match is None:
+                raise _Fallback
+            lexeme = match.group(1)
+            if not lexeme.isprintable():
+                # let the lexer decide whether it is a control character
+                raise _Fallback
+            if "\\" in lexeme:
+                lexeme = unescape(lexeme)
+            return lexeme, match.end()
+        elif c == "{":
+            return object_(i + 1)
+        elif c == "[":
+            return array(i + 1)
+        elif c == "t" and text.startswith("true", i):
+            return True, i + 4
+        elif c == "f" and text.startswith("false", i):
+            return False, i + 5
+        elif c == "n" and text.startswith("null", i):
+            return None, i + 4
+        match = match_number(text, i)
+        if match is None:
+            raise _Fallback
+        return convert_number(match.group(), to_int, to_float), match.end()
+
+    def array(i: int):
+        # {invariant: text[i-1] == "["}
+        result = []
+        if text[i] in WHITESPACE:
+            i = skip(text, i).end()
+        if text[i] == "]":
+            return result, i + 1
+
+        while True:
+            v, i = value(i)
+            result.append(v)
+            if text[i] in WHITESPACE:
+                i = skip(text, i).end()
+            c = text[i]
+            if c == ",":
+                i += 1
+                if text[i] in WHITESPACE:
+                    i = skip(text, i).end()
+            elif c == "]":
+                return result, i + 1
+            else:
+                raise _Fallback
+
+    def plain_object(i: int):
+        # {invariant: text[i-1] == "{"}
+        result = {}
+        if text[i] in WHITESPACE:
+            i = skip(text, i).end()
+        if text[i] == "}":
+            return result, i + 1
+
+        while True:
+            match = match_string(text, i)
+            if match is None:
+                raise _Fallback
+            key = match.group(1)
+            if not key.isprintable():
+                raise _Fallback
+            if "\\" in key:
+                key = unescape(key)
+            i = match.end()
+            if text[i] in WHITESPACE:
+                i = skip(text, i).end()
+            if text[i] != ":":
+                raise _Fallback
+            i += 1
+            if text[i] in WHITESPACE:
+                i = skip(text, i).end()
+            result[key], i = value(i)
+            if text[i] in WHITESPACE:
+                i = skip(text, i).end()
+            c = text[i]
+            if c == ",":
+                i += 1
+                if text[i] in WHITESPACE:
+                    i = skip(text, i).end()
+            elif c == "}":
+                return result, i + 1
+            else:
+                raise _Fallback
+
+    def cached_object(i: int):
+        # {invariant: text[i-1] == "{"}
+        if text[i] in WHITESPACE:
+            i = skip(text, i).end()
+        if text[i] == "}":
+            return {}, i + 1
+
+        values = []
+        # while an object matches the shape of an earlier one its keys are
+        # only compared against the text, and keys/quoted are left empty
+        expected_keys = expected_quoted = None
+        keys = []
+        quoted = []
+        k = 0
+        while True:
+            if expected_keys is not None and k < len(expected_keys) and text.startswith(expected_quoted[k], i):
+                i += len(expected_quoted[k])
+            else:
+                if expected_keys is not None:
+                    key_cache.key_hits += k - 1
+                    keys = list(expected_keys[:k])
+                    quoted = list(expected_quoted[:k])
+                    expected_keys = None
+                match = match_string(text, i)
+                if match is None:
+                    raise _Fallback
+                key = match.group(1)
+                if not key.isprintable():
+                    raise _Fallback
+                if "\\" in key:
+                    key = unescape(key)
+                key = key_cache.intern(key)
+                if k == 0 and key in key_cache.shapes:
+                    expected_keys, expected_quoted = key_cache.shapes[key]
+                else:
+                    keys.append(key)
+                    quoted.append(match.group())
+                i = match.end()
+            k += 1
+            if text[i] in WHITESPACE:
+                i = skip(text, i).end()
+            if text[i] != ":":
+                raise _Fallback
+            i += 1
+            if text[i] in WHITESPACE:
+                i = skip(text, i).end()
+            v, i = value(i)
+            values.append(v)
+            if text[i] in WHITESPACE:
+                i = skip(text, i).end()
+            c = text[i]
+            if c == ",":
+                i += 1
+                if text[i] in WHITESPACE:
+                    i = skip(text, i).end()
+            elif c == "}":
+                break
+            else:
+                raise _Fallback
+
+        if expected_keys is not None:
+            # the first key was looked up in the cache, the rest were not
+            key_cache.key_hits += k - 1
+            if k == len(expected_keys):
+                key_cache.shape_hits += 1
+                return dict(zip(expected_keys, values)), i + 1
+            keys = list(expected_keys[:k])
+            quoted = list(expected_quoted[:k])
+        key_cache.remember(keys, quoted)
+        return dict(zip(keys, values)), i + 1
+
+    depth = 0
+
+    def limit_depth(function):
+        def limited(i: int):
+            nonlocal depth
+            if depth >= max_depth:
+                # let the parser raise the DepthError
+                raise _Fallback
+            depth += 1
+            result = function(i)
+            depth -= 1
+            return result
+        return limited
+
+    object_ = plain_object if key_cache is None else cached_object
+    if max_depth is not None:
+        object_, array = limit_depth(object_), limit_depth(array)
+
+    i = skip(source).end()
+    if i == len(source):
+        return None
+    try:
+        if text[i] not in "[{":
+            raise _Fallback
+        result, i = value(i)
+        if skip(source, i).end() != len(source):
+            raise _Fallback
+        return result
+    except (_Fallback, RecursionError):
+        tokens = lex_iter(source, parse_float=parse_float, parse_int=parse_int)
+        try:
+            return parse_iterative(tokens, key_cache, max_depth)
+        except ParseError as error:
+            locate(error, source, max_depth)
+            raise
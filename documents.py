@@ -0,0 +1,183 @@
+"""
+Title: JSON Document Streams
+Author: Brent Pappas
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from .decoder import decode
+from .lexer import (LOOSE_STRING_BODY, WHITESPACE_PATTERN, NumberHook,
+                    TokenError, decode_chunks, lex_iter, position, scan_string,
+                    skip_value)
+from .parser_ import ParseError, TrailingDataError
+
+# matches either a whole string (possibly cut off by the end of the chunk,
+# in which case it has no closing quote group) or a single bracket or brace
+BRACKET_PATTERN = re.compile(r'"' + LOOSE_STRING_BODY + r'(")?|[\[\]{}]', re.DOTALL)
+# the end of a token other than a string or punctuation
+SCALAR_END_PATTERN = re.compile(r'["\s\[\]{},:]')
+
+
+def iter_documents(chunks: Iterable[Union[str, bytes]], parse_float: NumberHook = None,
+                   parse_int: NumberHook = None,
+                   max_depth: Optional[int] = None) -> Iterator[Union[Dict, List]]:
+    '''
+    Args:
+        chunks: An iterable of consecutive pieces of a text holding any
+            number of JSON objects and arrays one after another, with or
+            without whitespace between them, such as {...}{...}[...]. Pieces
+            of bytes are decoded as UTF-8
+        parse_float: See lexer.lex_iter
+        parse_int: See lexer.lex_iter
+        max_depth: See parser_.parse_iterative
+
+    Returns:
+        iterator: A generator yielding each document, as soon as the chunk
+        holding its end has been read
+
+    The end of each document is found by counting its brackets and braces
+    (skipping strings) as chunks arrive. Each chunk is scanned only once:
+    whether the scan is inside a string, or just after a backslash in one,
+    is carried over to the next chunk. The pieces of the current document
+    are kept until it ends, and are then joined and parsed on their own, so
+    memory use stays about one chunk (or one document) in size.
+
+    Anything other than an object or array raises the ParseError (or
+    TokenError) that parsing the rest of the text alone would, as soon as
+    enough of it has been read to tell. So does a document cut off by the
+    end of the text. Errors report their offset, line and column within the
+    whole text.
+
+    '''
+    # the pieces of the current document read so far and their total length,
+    # and the offset, line and column of its start in the whole text (or of
+    # the text not yet scanned, between documents)
+    parts = []
+    length = 0
+    offset = 0
+    line_number = 1
+    column = 1
+    # whether a document has started, how deeply it is nested (-1 for
+    # anything other than an object or array), and whether the scan is inside
+    # a string, and just after a backslash in one
+    started = False
+    depth = 0
+    in_string = False
+    escaped = False
+    # for anything other than an object or array, where its first token ends
+    # within it, once that has been read
+    token_end = None
+
+    def parse(text: str):
+        try:
+            return decode(text, parse_float, parse_int, max_depth=max_depth)
+        except (TokenError, ParseError) as error:
+            # the error was found within the document
+            error._relocate(offset, line_number, column)
+            raise
+
+    for chunk in decode_chunks(chunks):
+        n = len(chunk)
+        # the scan is at chunk[i], and the current document's part of chunk
+        # starts at chunk[k]
+        i = k = 0
+        while i < n:
+            if not started:
+                i = WHITESPACE_PATTERN.match(chunk, i).end()
+                offset += i - k
+                line_number, column = position(chunk[k:i], i - k, line_number, column)
+                k = i
+                if i == n:
+                    break
+                started = True
+                c = chunk[i]
+                depth = 0 if c in "[{" else -1
+                if depth < 0:
+                    # not a document, which is reported once its first token is known
+                    if c in ",:]}":
+                        token_end = 1
+                    in_string = c == '"'
+                    i += 1
+
+            if depth < 0:
+                if token_end is None:
+                    if in_string:
+                        end, escaped = scan_string(chunk, i, escaped)
+                        if end is not None:
+                            in_string = False
+                            token_end = length + end - k
+                    else:
+                        match = SCALAR_END_PATTERN.search(chunk, i)
+                        if match is not None:
+                            token_end = length + match.start() - k
+                # along with the few characters after it that the lexer may look at
+                if token_end is not None and length + n - k > token_end + 4:
+                    yield parse("".join(parts) + chunk[k:])
+                    return
+                break
+
+            if in_string:
+                i, escaped = scan_string(chunk, i, escaped)
+                if i is None:
+                    i = n
+                    break
+                in_string = False
+            for match in BRACKET_PATTERN.finditer(chunk, i):
+                c = chunk[match.start()]
+                if c == '"':
+                    if match.group(1) is None:
+                        # the string goes on in the next chunk
+                        in_string = True
+                        escaped = match.end() < n
+                        i = n
+                        break
+                elif c in "[{":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        i = match.end()
+                        text = "".join(parts) + chunk[k:i]
+                        yield parse(text)
+                        offset += len(text)
+                        line_number, column = position(text, len(text), line_number, column)
+                        parts = []
+                        length = 0
+                        started = False
+                        k = i
+                        break
+            else:
+                i = n
+        if started:
+            parts.append(chunk[k:])
+            length += n - k
+
+    if started:
+        # an unfinished document, or something other than one
+        yield parse("".join(parts))
+
+
+def check_end(text: str) -> None:
+    '''
+    Args:
+        text: A JSON text that parsed successfully
+
+    Raises:
+        TrailingDataError: If there is anything but whitespace after the end
+        of its top-level object or array, which the parser stops reading at
+
+    '''
+    i = WHITESPACE_PATTERN.match(text).end()
+    if i == len(text):
+        return
+    end = WHITESPACE_PATTERN.match(text, skip_value(text, i)).end()
+    if end < len(text):
+        try:
+            token = next(lex_iter(text[end:]))
+        except TokenError as error:
+            error._relocate(end, *position(text, end))
+            raise
+        error = TrailingDataError(token, None)
+        error._locate(text, end)
+        raise error
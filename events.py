@@ -0,0 +1,118 @@
+"""
+Title: JSON Event Parser
+Author: Brent Pappas
+"""
+
+from typing import Any, Iterable, Iterator, List, Tuple, Union
+
+from .lexer import Tag, Token
+from .parser_ import VALUE_TAGS, ParseError
+
+Path = Tuple[Union[str, int], ...]
+Event = Tuple[Path, str, Any]
+
+
+def events(tokens: Iterable[Token]) -> Iterator[Event]:
+    '''
+    Args:
+        tokens: An iterable of JSON lexical tokens
+
+    Returns:
+        iterator: A generator yielding (path, event, value) tuples
+
+    The event is one of "start_map", "map_key", "end_map", "start_array",
+    "end_array" or "value". The path is a tuple of the object keys and array
+    indices leading to the value the event belongs to; for "map_key" it is
+    the path of the enclosing object and the value is the key itself. Only
+    "map_key" and "value" events carry a value, the rest carry None.
+
+    No containers are built, so a consumer can filter or aggregate documents
+    of any size while keeping only the current path in memory. The same
+    grammar as parser_.parse is enforced, and the same ParseErrors raised.
+
+    Example:
+        '{"a": [1]}' produces
+            ((), "start_map", None)
+            ((), "map_key", "a")
+            (("a",), "start_array", None)
+            (("a", 0), "value", 1)
+            (("a",), "end_array", None)
+            ((), "end_map", None)
+
+    '''
+
+    stream = iter(tokens)
+
+    def pop(expected: List[Tag]) -> Token:
+        t = next(stream, None)
+        if t is None:
+            raise ParseError(None, expected)
+        return t
+
+    t = next(stream, None)
+    if t is None:
+        return
+    if t.tag not in [Tag.LEFT_BRACKET, Tag.LEFT_BRACE]:
+        raise ParseError(t, [Tag.LEFT_BRACKET, Tag.LEFT_BRACE])
+
+    path = []
+    # the closing tag of each container that is currently open
+    closers = []
+
+    while True:
+        # {invariant: t is the first token of a value}
+        if t.tag == Tag.LEFT_BRACKET:
+            yield tuple(path), "start_array", None
+            t = pop(VALUE_TAGS + [Tag.RIGHT_BRACKET])
+            if t.tag != Tag.RIGHT_BRACKET:
+                closers.append(Tag.RIGHT_BRACKET)
+                path.append(0)
+                continue
+            yield tuple(path), "end_array", None
+        elif t.tag == Tag.LEFT_BRACE:
+            yield tuple(path), "start_map", None
+            t = pop([Tag.OBJECT_KEY, Tag.RIGHT_BRACE])
+            if t.tag == Tag.OBJECT_KEY:
+                yield tuple(path), "map_key", t.lexeme
+                closers.append(Tag.RIGHT_BRACE)
+                path.append(t.lexeme)
+                t = pop(VALUE_TAGS)
+                continue
+            if t.tag != Tag.RIGHT_BRACE:
+                raise ParseError(t, [Tag.OBJECT_KEY])
+            yield tuple(path), "end_map", None
+        elif t.tag == Tag.LITERAL:
+            yield tuple(path), "value", t.lexeme
+        elif t.tag in [Tag.NUMBER, Tag.BOOLEAN]:
+            yield tuple(path), "value", t.value
+        elif t.tag == Tag.NULL:
+            yield tuple(path), "value", None
+        else:
+            raise ParseError(t, VALUE_TAGS)
+
+        # a value just ended, so close every container that ends with it
+        while True:
+            if not closers:
+                return
+            t = pop([Tag.COMMA, closers[-1]])
+            if t.tag == Tag.COMMA:
+                break
+            if t.tag != closers[-1]:
+                raise ParseError(t, [closers[-1]])
+            closers.pop()
+            path.pop()
+            if t.tag == Tag.RIGHT_BRACKET:
+                yield tuple(path), "end_array", None
+            else:
+                yield tuple(path), "end_map", None
+
+        # {invariant: a comma was just consumed}
+        if closers[-1] == Tag.RIGHT_BRACKET:
+            path[-1] += 1
+        else:
+            t = pop([Tag.OBJECT_KEY])
+            if t.tag != Tag.OBJECT_KEY:
+                raise ParseError(t, [Tag.OBJECT_KEY])
+            path[-1] = t.lexeme
+            yield tuple(path[:-1]), "map_key", t.lexeme
+        t = pop(VALUE_TAGS)
@@ -0,0 +1,171 @@
+"""
+Title: JSON Path Extraction
+Author: Brent Pappas
+"""
+
+from itertools import chain
+from typing import Any, List, Optional, Sequence, Union
+
+from .lexer import (STRING_PATTERN, TOKEN_PATTERN, WHITESPACE_PATTERN,
+                    Literal, Tag, TokenError, lex_iter, position, skip_value)
+from .parser_ import VALUE_TAGS, ParseError, parse_iterative
+
+WILDCARD = "*"
+# the tags that may follow a value in an object, and in an array
+OBJECT_FOLLOWERS = [Tag.COMMA, Tag.RIGHT_BRACE]
+ARRAY_FOLLOWERS = [Tag.COMMA, Tag.RIGHT_BRACKET]
+
+
+def extract(text: str, path: Sequence[Union[str, int]]) -> List[Any]:
+    '''
+    Args:
+        text: The JSON text to search
+        path: A sequence of object keys and array indices, where "*" matches
+            every key of an object or every element of an array
+
+    Returns:
+        list: The parsed values found at the path, in document order
+
+    Only the containers along the path are walked and only the matching
+    values are lexed and parsed. Every other subtree is skipped by balancing
+    its brackets and braces (see lexer.skip_value), so no tokens or Python
+    objects are created for it, and it is not checked for errors either.
+
+    Example:
+        extract('{"users": [{"id": 1}, {"id": 2}]}', ["users", "*", "id"])
+        returns [1, 2]
+
+    '''
+    results = []
+    i = _skip_whitespace(text, 0)
+    if i < len(text):
+        i = _walk(text, i, path, 0, results, None)
+    return results
+
+
+def _walk(text: str, i: int, path: Sequence[Union[str, int]], depth: int, results: List[Any],
+          followers: Optional[List[Tag]]) -> int:
+    '''
+    Walks the value starting at text[i] and returns the index after it. The
+    value is followed by one of followers, or is the whole text if None
+    '''
+    if depth == len(path):
+        end = skip_value(text, i)
+        if end == i:
+            _fail(text, i, VALUE_TAGS)
+        try:
+            results.append(_build(text[i:end], followers))
+        except (TokenError, ParseError) as error:
+            # the error was found within the value
+            error._relocate(i, *position(text, i))
+            raise
+        return end
+
+    selector = path[depth]
+    n = len(text)
+
+    if text[i] == "{":
+        i = _skip_whitespace(text, i + 1)
+        if i < n and text[i] == "}":
+            return i + 1
+        while True:
+            match = STRING_PATTERN.match(text, i)
+            if match is None:
+                _fail(text, i, [Tag.OBJECT_KEY])
+            key = text[match.start() + 1:match.end() - 1]
+            if "\\" in key:
+                try:
+                    key = next(lex_iter(match.group())).lexeme
+                except TokenError as error:
+                    # the error was found within the key
+                    error._relocate(i, *position(text, i))
+                    raise
+            i = _skip_whitespace(text, match.end())
+            if i >= n or text[i] != ":":
+                # without a colon the key is lexed as a string value
+                error = ParseError(Literal(key), [Tag.OBJECT_KEY])
+                error._locate(text, match.start())
+                raise error
+            i = _skip_whitespace(text, i + 1)
+            if i >= n:
+                _fail(text, i, VALUE_TAGS)
+            if selector == WILDCARD or selector == key:
+                i = _walk(text, i, path, depth + 1, results, OBJECT_FOLLOWERS)
+            else:
+                i = skip_value(text, i)
+            i = _skip_whitespace(text, i)
+            if i < n and text[i] == "}":
+                return i + 1
+            if i >= n or text[i] != ",":
+                _fail(text, i, OBJECT_FOLLOWERS)
+            i = _skip_whitespace(text, i + 1)
+
+    if text[i] == "[":
+        i = _skip_whitespace(text, i + 1)
+        if i < n and text[i] == "]":
+            return i + 1
+        index = 0
+        while True:
+            if i >= n:
+                _fail(text, i, VALUE_TAGS)
+            if selector == WILDCARD or selector == index:
+                i = _walk(text, i, path, depth + 1, results, ARRAY_FOLLOWERS)
+            else:
+                i = skip_value(text, i)
+            i = _skip_whitespace(text, i)
+            if i < n and text[i] == "]":
+                return i + 1
+            if i >= n or text[i] != ",":
+                _fail(text, i, ARRAY_FOLLOWERS)
+            i = _skip_whitespace(text, i + 1)
+            index += 1
+
+    # a scalar cannot contain the rest of the path
+    return skip_value(text, i)
+
+
+def _build(text: str, followers: Optional[List[Tag]]) -> Any:
+    tokens = lex_iter(text)
+    t = next(tokens)
+    if t.tag in [Tag.LEFT_BRACKET, Tag.LEFT_BRACE]:
+        return parse_iterative(chain([t], tokens))
+    # the slice may run on past the scalar (as in truex or 1x), in which case
+    # lexing the rest raises the TokenError load_json_string would
+    for extra in tokens:
+        if followers is None:
+            # a whole text is only parsed if it is an object or array
+            error = ParseError(t, [Tag.LEFT_BRACKET, Tag.LEFT_BRACE])
+            error._locate(text, 0)
+        else:
+            error = ParseError(extra, followers)
+            match = TOKEN_PATTERN.match(text)
+            if match is not None:
+                error._locate(text, match.end())
+        raise error
+    if t.tag == Tag.LITERAL:
+        return t.lexeme
+    elif t.tag in [Tag.NUMBER, Tag.BOOLEAN]:
+        return t.value
+    return None
+
+
+def _skip_whitespace(text: str, i: int) -> int:
+    return WHITESPACE_PATTERN.match(text, i).end()
+
+
+def _fail(text: str, i: int, expected: List[Tag]):
+    # raises the ParseError for the token at text[i] (or the end of text)
+    # where one of expected should have been, or the TokenError for text[i]
+    # if no token starts there
+    if i >= len(text):
+        error = ParseError(None, expected)
+        error._locate(text, len(text))
+        raise error
+    try:
+        token = next(lex_iter(text[i:]))
+    except TokenError as error:
+        error._relocate(i, *position(text, i))
+        raise
+    error = ParseError(token, expected)
+    error._locate(text, i)
+    raise error
@@ -0,0 +1,254 @@
+"""
+Title: JSON Incremental Parser
+Author: Brent Pappas
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from .decoder import decode
+from .documents import check_end
+from .lexer import (LOOSE_STRING_BODY, WHITESPACE_PATTERN, NumberHook,
+                    TokenError, unescape)
+from .parser_ import ParseError
+
+# a whole string, or a structural character outside of one
+INDEX_PATTERN = re.compile(r'"' + LOOSE_STRING_BODY + r'"|[\[\]{},:]', re.DOTALL)
+
+
+class _Node(object):
+    '''
+    The span of an object or array in the text, and of the objects and
+    arrays directly inside it. Spans are kept relative to each other, so that
+    an edit only changes the nodes around it:
+
+        key: The key (or index) of the container within its parent
+        lead: The distance from the end of the previous sibling container
+            (or the start of the parent) to the start of this one
+        length: The length of the container's text, brackets included
+        children: The nodes of the objects and arrays directly inside it
+        tree: A Fenwick tree over the children's lead + length, which finds
+            the child at an offset, and is updated when one changes length,
+            in O(log n) time
+
+    '''
+
+    __slots__ = ("key", "lead", "length", "children", "tree")
+
+    def __init__(self, key: Union[str, int, None], lead: int) -> None:
+        self.key = key
+        self.lead = lead
+        self.length = 0
+        self.children: List['_Node'] = []
+        self.tree: List[int] = [0]
+
+
+class IncrementalDocument(object):
+    '''
+    A parsed JSON text that can be edited and re-parsed a piece at a time
+
+    Besides the parsed value, the span of every object and array in the text
+    is kept. Each edit re-parses only the smallest object or array enclosing
+    it (without its brackets), and puts the result in place of the old one
+    in value, so the cost of an edit grows with the size of that container
+    rather than with the size of the whole text.
+
+    Any edit outside of the top-level object or array, or that does not
+    leave the re-parsed container a single object or array, is handled by
+    parsing the whole new text, which raises the same TokenError or
+    ParseError that load_json_string would. After an error, text holds the
+    edited text, value the last value parsed, and the next edit parses the
+    whole text again.
+
+    value is changed in place by each edit, and must not be changed by the
+    caller. Objects with repeated keys are always re-parsed as a whole.
+
+    '''
+
+    def __init__(self, text: str, parse_float: NumberHook = None, parse_int: NumberHook = None) -> None:
+        self.parse_float = parse_float
+        self.parse_int = parse_int
+        self.text = ""
+        self.value: Union[Dict, List, None] = None
+        self.root: Optional['_Node'] = None
+        self.root_start = 0
+        self.full_parses = 0
+        self.partial_parses = 0
+        self._parse(text)
+
+    def __repr__(self) -> str:
+        return (f"IncrementalDocument({len(self.text)} characters, {self.full_parses} full parses, "
+                f"{self.partial_parses} partial parses)")
+
+    def edit(self, offset: int, deleted: int, inserted: str) -> Union[Dict, List, None]:
+        '''
+        Args:
+            offset: The index in text where the edit starts
+            deleted: The number of characters removed from offset on
+            inserted: The text put in their place
+
+        Returns:
+            The parsed value of the edited text
+
+        '''
+        text = self.text
+        if offset < 0 or deleted < 0 or offset + deleted > len(text):
+            raise ValueError(f"Edit at {offset} deleting {deleted} characters is outside of the text")
+        new_text = text[:offset] + inserted + text[offset + deleted:]
+        end = offset + deleted
+        node, start = self.root, self.root_start
+        # the edit must leave the brackets of the re-parsed container alone,
+        # though an insertion may go right before the closing one
+        closing = deleted == 0
+        if node is None or not start < offset <= end < start + node.length - 1 + closing:
+            return self._parse(new_text)
+
+        # find the innermost container around the edit, keeping the nodes
+        # (and each one's index in its parent) along the way
+        path = []
+        while node.children:
+            j, before = _search(node.tree, offset - start)
+            if j == len(node.children):
+                break
+            child = node.children[j]
+            child_start = start + before + child.lead
+            if not child_start < offset <= end < child_start + child.length - 1 + closing:
+                break
+            path.append((node, j))
+            node, start = child, child_start
+
+        delta = len(inserted) - deleted
+        piece = new_text[start:start + node.length + delta]
+        try:
+            value = decode(piece, self.parse_float, self.parse_int)
+            # a container that now ends early would hide the rest of the piece
+            check_end(piece)
+        except (TokenError, ParseError):
+            return self._parse(new_text)
+
+        new_node = _index(piece, 0, value, node.key, node.lead)
+        if path:
+            parent = self.value
+            for ancestor, j in path[1:]:
+                parent = parent[ancestor.key]
+            parent[node.key] = value
+            parent_node, j = path[-1]
+            parent_node.children[j] = new_node
+            # every ancestor grows or shrinks by delta
+            for ancestor, j in path:
+                ancestor.length += delta
+                _add(ancestor.tree, j, delta)
+        else:
+            self.value = value
+            self.root = new_node
+        self.text = new_text
+        self.partial_parses += 1
+        return self.value
+
+    def _parse(self, text: str) -> Union[Dict, List, None]:
+        # parses the whole text, and indexes its containers
+        self.text = text
+        self.root = None
+        self.full_parses += 1
+        value = decode(text, self.parse_float, self.parse_int)
+        self.value = value
+        self.root_start = WHITESPACE_PATTERN.match(text).end()
+        # the lexer lets a few other characters through before the root
+        if isinstance(value, (dict, list)) and text[self.root_start] in "[{":
+            self.root = _index(text, self.root_start, value, None, 0)
+        return value
+
+
+def _index(text: str, start: int, value: Union[Dict, List], key: Union[str, int, None], lead: int) -> '_Node':
+    '''
+    Args:
+        text: A JSON text
+        start: The index of the opening bracket of a container in text
+        value: The parsed value of that container
+        key: The key of the container within its parent
+        lead: See _Node
+
+    Returns:
+        _Node: The node of the container, and of every container inside it
+
+    '''
+    root = _Node(key, lead)
+    # each frame holds a node, its start, its value (None if it has gone out
+    # of step with the text, which repeated keys do), whether it is an object,
+    # the key of its current member (or index of its current element), the
+    # number of its members seen, and the end of its last child container
+    stack = [[root, start, value, isinstance(value, dict), None if isinstance(value, dict) else 0, 0, start]]
+    frame = stack[0]
+    last_string = None
+    for match in INDEX_PATTERN.finditer(text, start + 1):
+        c = text[match.start()]
+        if c == '"':
+            last_string = match
+        elif c == ":":
+            key = last_string.group()[1:-1]
+            frame[4] = unescape(key) if "\\" in key else key
+            frame[5] += 1
+        elif c == ",":
+            if not frame[3]:
+                frame[4] += 1
+        elif c == "[" or c == "{":
+            child = _Node(frame[4], match.start() - frame[6])
+            frame[0].children.append(child)
+            parent = frame[2]
+            child_value = None
+            if parent is not None:
+                if frame[3]:
+                    child_value = parent.get(frame[4])
+                elif frame[4] < len(parent):
+                    child_value = parent[frame[4]]
+                if not isinstance(child_value, dict if c == "{" else list):
+                    child_value = None
+            frame = [child, match.start(), child_value, c == "{", None if c == "{" else 0, 0, 0]
+            frame[6] = frame[1]
+            stack.append(frame)
+        else:
+            node, node_start, node_value, is_object, _, members, _ = stack.pop()
+            node.length = match.end() - node_start
+            if node_value is None or (is_object and members != len(node_value)):
+                # its children cannot be matched up with its value
+                node.children = []
+            node.tree = _fenwick([child.lead + child.length for child in node.children])
+            if not stack:
+                return root
+            frame = stack[-1]
+            frame[6] = match.end()
+    raise ValueError("Unbalanced brackets")
+
+
+def _fenwick(values: List[int]) -> List[int]:
+    # builds a Fenwick tree (1-indexed, with tree[0] unused) over values
+    tree = [0] + values
+    n = len(tree)
+    for i in range(1, n):
+        j = i + (i & -i)
+        if j < n:
+            tree[j] += tree[i]
+    return tree
+
+
+def _add(tree: List[int], j: int, delta: int) -> None:
+    # adds delta to value j
+    j += 1
+    n = len(tree)
+    while j < n:
+        tree[j] += delta
+        j += j & -j
+
+
+def _search(tree: List[int], target: int) -> Tuple[int, int]:
+    # returns the first j whose values up to and including j add up to more
+    # than target (len(values) if there is none), and the sum of those before j
+    j = 0
+    total = 0
+    step = 1 << (len(tree).bit_length() - 1)
+    while step:
+        if j + step < len(tree) and total + tree[j + step] <= target:
+            j += step
+            total += tree[j]
+        step >>= 1
+    return j, total
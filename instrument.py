@@ -0,0 +1,206 @@
+"""
+Title: JSON Parse Instrumentation
+Author: Brent Pappas
+"""
+
+import itertools
+import re
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from .decoder import decode
+from .keycache import KeyCache
+from .lexer import (MAX_SHARED_KEYS, STRING_PATTERN, NumberHook, Tag,
+                    TokenError, lex, lex_iter)
+from .parser_ import ParseError, locate, parse_iterative
+
+# as the text has already been parsed, tokens are counted by searching for
+# their lexemes, once strings have been blanked out
+NUMBER_LEXEME_PATTERN = re.compile(r'-?[0-9][0-9.eE+-]*')
+KEY_PATTERN = re.compile("(" + STRING_PATTERN.pattern + r")\s*:", re.DOTALL)
+BRACKET_PATTERN = re.compile(r'[\[\]{}]')
+DEPTH_CHANGES = {"[": 1, "{": 1, "]": -1, "}": -1}
+PUNCTUATION_TAGS = {",": Tag.COMMA, "{": Tag.LEFT_BRACE, "}": Tag.RIGHT_BRACE,
+                    "[": Tag.LEFT_BRACKET, "]": Tag.RIGHT_BRACKET}
+
+
+class ParseStats(object):
+    '''
+    Records where the time goes when parsing JSON texts, and what they held
+
+    Pass the same ParseStats to any number of calls of load_json_string to
+    add up the following over all of them:
+
+        stages: The seconds spent in each stage of parsing. The direct engine
+            has a single "decode" stage, and the tokens engine a "lex" stage
+            followed by a "parse" stage. Counting what the texts held is
+            timed as the "count" stage, which is left out of throughput
+        documents: The number of texts parsed, and errors the number of
+            those that raised an error (whose contents are not counted)
+        characters: The total length of the texts
+        tokens: The number of tokens of each Tag
+        max_depth: The deepest nesting of objects and arrays
+        string_characters, number_characters: The total length of all
+            strings (and object keys, with their quotes) and numbers
+        allocations: The number of "tokens" (not counting the shared
+            punctuation, boolean and null tokens, nor repeated object keys,
+            which share the token of their first occurrence), "dicts",
+            "lists", "strings" and "numbers" created, and the net number of
+            memory "blocks" Python had allocated after each parse
+
+    Nothing is recorded (or costs anything) unless a ParseStats is passed.
+    With one, the tokens engine lexes the whole text before parsing it, so
+    that each stage can be timed on its own. What the text holds is counted
+    by a few regular expression searches over it once it has parsed.
+
+    '''
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = Counter()
+        self.documents = 0
+        self.errors = 0
+        self.characters = 0
+        self.tokens: Dict[Tag, int] = Counter()
+        self.max_depth = 0
+        self.string_characters = 0
+        self.number_characters = 0
+        self.allocations: Dict[str, int] = Counter()
+
+    def __repr__(self) -> str:
+        return f"ParseStats({self.stats()})"
+
+    @property
+    def seconds(self) -> float:
+        ''' The total time spent parsing, not counting the "count" stage '''
+        return sum(seconds for stage, seconds in self.stages.items() if stage != "count")
+
+    @property
+    def throughput(self) -> float:
+        ''' The number of characters parsed per second '''
+        seconds = self.seconds
+        return self.characters / seconds if seconds else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": self.documents,
+            "errors": self.errors,
+            "characters": self.characters,
+            "stages": dict(self.stages),
+            "throughput": self.throughput,
+            "tokens": {tag.name: n for tag, n in self.tokens.items()},
+            "max_depth": self.max_depth,
+            "string_characters": self.string_characters,
+            "number_characters": self.number_characters,
+            "allocations": dict(self.allocations),
+        }
+
+    def clear(self) -> None:
+        self.stages.clear()
+        self.documents = self.errors = self.characters = 0
+        self.tokens.clear()
+        self.max_depth = 0
+        self.string_characters = self.number_characters = 0
+        self.allocations.clear()
+
+    def count(self, text: str, engine: str) -> None:
+        '''
+        Args:
+            text: A JSON text that was just parsed without errors
+            engine: The parse engine it was parsed with
+
+        Adds what text holds to the totals, see ParseStats
+
+        '''
+        strings = STRING_PATTERN.findall(text)
+        rest = STRING_PATTERN.sub('""', text)
+        # every colon follows an object key
+        keys = rest.count(":")
+        numbers = NUMBER_LEXEME_PATTERN.findall(rest)
+        tokens = self.tokens
+        tokens[Tag.OBJECT_KEY] += keys
+        tokens[Tag.LITERAL] += len(strings) - keys
+        tokens[Tag.NUMBER] += len(numbers)
+        tokens[Tag.BOOLEAN] += rest.count("true") + rest.count("false")
+        tokens[Tag.NULL] += rest.count("null")
+        for c, tag in PUNCTUATION_TAGS.items():
+            tokens[tag] += rest.count(c)
+
+        brackets = BRACKET_PATTERN.findall(rest)
+        if brackets:
+            depths = itertools.accumulate(map(DEPTH_CHANGES.__getitem__, brackets))
+            self.max_depth = max(self.max_depth, max(depths))
+        self.string_characters += sum(map(len, strings))
+        self.number_characters += sum(map(len, numbers))
+
+        if engine == "tokens":
+            key_tokens = _key_tokens(KEY_PATTERN.findall(text))
+            self.allocations["tokens"] += len(strings) - keys + key_tokens + len(numbers)
+        self.allocations["dicts"] += rest.count("{")
+        self.allocations["lists"] += rest.count("[")
+        self.allocations["strings"] += len(strings)
+        self.allocations["numbers"] += len(numbers)
+
+
+def _key_tokens(keys: List[str]) -> int:
+    # the number of ObjectKey tokens the scan engine creates for keys, as it
+    # shares them between the occurrences of each (see lexer._lex_scan)
+    distinct = len(set(keys))
+    if distinct <= MAX_SHARED_KEYS:
+        return distinct
+    created = 0
+    shared = set()
+    for key in keys:
+        if key not in shared:
+            if len(shared) >= MAX_SHARED_KEYS:
+                shared.clear()
+            shared.add(key)
+            created += 1
+    return created
+
+
+def load_instrumented(text: str, stats: 'ParseStats', engine: str = "direct", parse_float: NumberHook = None,
+                      parse_int: NumberHook = None, key_cache: Optional[KeyCache] = None,
+                      max_depth: Optional[int] = None) -> Any:
+    '''
+    Parses text as load_json_string does (with the engine "direct" or
+    "tokens"), returning the same result or raising the same error, while
+    recording each stage and what text holds in stats. See ParseStats.
+    '''
+    clock = time.perf_counter
+    stats.documents += 1
+    stats.characters += len(text)
+    blocks = sys.getallocatedblocks()
+    start = clock()
+    try:
+        if engine == "direct":
+            try:
+                result = decode(text, parse_float, parse_int, key_cache, max_depth)
+            finally:
+                stats.stages["decode"] += clock() - start
+        else:
+            try:
+                tokens = lex(text, parse_float=parse_float, parse_int=parse_int)
+            except TokenError:
+                # lexing lazily may find a ParseError before the TokenError
+                tokens = lex_iter(text, parse_float=parse_float, parse_int=parse_int)
+            finally:
+                lexed = clock()
+                stats.stages["lex"] += lexed - start
+            try:
+                result = parse_iterative(tokens, key_cache, max_depth)
+            except ParseError as error:
+                locate(error, text, max_depth)
+                raise
+            finally:
+                stats.stages["parse"] += clock() - lexed
+    except Exception:
+        stats.errors += 1
+        raise
+    stats.allocations["blocks"] += sys.getallocatedblocks() - blocks
+
+    start = clock()
+    stats.count(text, engine)
+    stats.stages["count"] += clock() - start
+    return result
@@ -0,0 +1,131 @@
+"""
+Title: JSON Lines Reader
+Author: Brent Pappas
+"""
+
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .documents import check_end
+from .lexer import TokenError, lex_iter
+from .parser_ import ParseError, locate, parse_iterative
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def iter_jsonl(lines: Iterable[str], workers: Optional[int] = 1,
+               batch_size: int = DEFAULT_BATCH_SIZE, ordered: bool = True) -> Iterator[Union[Dict, List]]:
+    '''
+    Args:
+        lines: An iterable of lines, each holding one JSON document and
+            ending with its line ending, as the lines of an open text file
+            do. Blank lines are skipped
+        workers: The number of processes to parse with. 1 parses in this
+            process, and None uses one process per CPU
+        batch_size: The number of lines sent to a worker process at a time
+        ordered: Whether documents are yielded in the order of their lines.
+            When False, each batch is yielded as soon as it is parsed
+
+    Returns:
+        iterator: A generator yielding each parsed document
+
+    Lines are read and parsed lazily. With several workers, at most two
+    batches per worker are in flight at once, so memory use stays bounded
+    however long the input is. Anything but whitespace after the document
+    on a line raises a TrailingDataError. Errors report their offset and
+    line number within the whole input, not within their line. Offsets are
+    counted by adding up the lengths of the lines before, so they are only
+    right if each line keeps its line ending.
+
+    '''
+    numbered = _numbered(lines)
+
+    if workers == 1:
+        for line_number, offset, line in numbered:
+            yield _parse_line(line_number, offset, line)
+        return
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    limit = 2 * workers
+
+    with ProcessPoolExecutor(workers) as pool:
+        if ordered:
+            pending = deque()
+            try:
+                for batch in _batched(numbered, batch_size):
+                    if len(pending) >= limit:
+                        yield from pending.popleft().result()
+                    pending.append(pool.submit(_parse_batch, batch))
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+        else:
+            pending = set()
+            try:
+                for batch in _batched(numbered, batch_size):
+                    if len(pending) >= limit:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield from future.result()
+                    pending.add(pool.submit(_parse_batch, batch))
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def load_jsonl_file(path: str, workers: Optional[int] = 1, batch_size: int = DEFAULT_BATCH_SIZE,
+                    ordered: bool = True) -> Iterator[Union[Dict, List]]:
+    ''' Yields each document of the UTF-8 encoded JSON Lines file at path, see iter_jsonl '''
+    # \r\n line endings are kept as they are, so that offsets count them
+    with open(path, encoding="utf-8", newline="") as f:
+        yield from iter_jsonl(f, workers, batch_size, ordered)
+
+
+def _numbered(lines: Iterable[str]) -> Iterator[Tuple[int, int, str]]:
+    # yields the line number, offset and text of each line that is not blank,
+    # where each line keeps its line ending
+    offset = 0
+    for line_number, line in enumerate(lines, 1):
+        if line and not line.isspace():
+            yield line_number, offset, line
+        offset += len(line)
+
+
+def _parse_line(line_number: int, offset: int, line: str) -> Union[Dict, List]:
+    try:
+        value = parse_iterative(lex_iter(line))
+        check_end(line)
+    except ParseError as error:
+        locate(error, line)
+        error._relocate(offset, line_number, 1)
+        raise
+    except TokenError as error:
+        error._relocate(offset, line_number, 1)
+        raise
+    return value
+
+
+def _batched(numbered: Iterable[Tuple[int, int, str]],
+             batch_size: int) -> Iterator[List[Tuple[int, int, str]]]:
+    batch = []
+    for item in numbered:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _parse_batch(batch: List[Tuple[int, int, str]]) -> List[Union[Dict, List]]:
+    # runs in a worker process, like parallel._parse_chunk
+    return [_parse_line(line_number, offset, line) for line_number, offset, line in batch]
@@ -0,0 +1,70 @@
+"""
+Title: JSON Object Key Cache
+Author: Brent Pappas
+"""
+
+from typing import Dict, List, Tuple
+
+
+class KeyCache(object):
+    '''
+    Interns object keys and remembers the key sequences ("shapes") of objects
+
+    Passing the same KeyCache to every parse of a document (or of many
+    documents) makes equal keys share a single string object, and lets the
+    direct decoder recognize objects whose keys come in the same order as a
+    previous object with the same first key. For those objects the decoder
+    only compares the expected keys against the text, so no new key strings
+    are created at all.
+
+    '''
+
+    def __init__(self) -> None:
+        self.keys: Dict[str, str] = {}
+        # first key -> (interned keys, their quoted text as it appeared)
+        self.shapes: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+        self.key_hits = 0
+        self.key_misses = 0
+        self.shape_hits = 0
+        self.shape_misses = 0
+
+    def __repr__(self) -> str:
+        return f"KeyCache({self.stats()})"
+
+    def intern(self, key: str) -> str:
+        ''' Returns the cached string equal to key, caching key if there is none '''
+        cached = self.keys.get(key)
+        if cached is None:
+            self.keys[key] = key
+            self.key_misses += 1
+            return key
+        self.key_hits += 1
+        return cached
+
+    def remember(self, keys: List[str], quoted: List[str]) -> None:
+        ''' Records the keys of an object (and their quoted text) as the shape for its first key '''
+        self.shapes[keys[0]] = (tuple(keys), tuple(quoted))
+        self.shape_misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        ''' The fraction of keys that were already cached '''
+        total = self.key_hits + self.key_misses
+        return self.key_hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "keys": len(self.keys),
+            "shapes": len(self.shapes),
+            "key_hits": self.key_hits,
+            "key_misses": self.key_misses,
+            "shape_hits": self.shape_hits,
+            "shape_misses": self.shape_misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def clear(self) -> None:
+        self.keys.clear()
+        self.shapes.clear()
+        self.key_hits = self.key_misses = 0
+        self.shape_hits = self.shape_misses = 0
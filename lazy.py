@@ -0,0 +1,318 @@
+"""
+Title: JSON Lazy Document
+Author: Brent Pappas
+"""
+
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from .decoder import decode
+from .lexer import (TOKEN_PATTERN, WHITESPACE_PATTERN, NumberHook,
+                    _has_control_character, convert_number, lex_iter,
+                    unescape)
+from .parser_ import ParseError, locate, parse_iterative
+
+# the kinds of tape entries, matching TOKEN_PATTERN's group numbers where
+# there is one. Strings and keys holding escape sequences are marked with
+# ESCAPED, so that all others can be compared and sliced without decoding
+STRING = 1
+KEY = 2
+NUMBER = 3
+TRUE = 5
+FALSE = 6
+NULL = 7
+ARRAY = 8
+OBJECT = 9
+ESCAPED = 16
+
+# what the builder expects to see next
+_VALUE, _VALUE_OR_CLOSE, _KEY, _KEY_OR_CLOSE, _COMMA_OR_CLOSE, _DONE = range(6)
+
+
+class Tape(object):
+    '''
+    An index of every value and object key of a JSON text, in document order.
+    Entry i is described by the parallel arrays:
+
+        kinds[i]: One of the kinds above
+        starts[i], ends[i]: The span of the entry in the text. For arrays and
+            objects, this covers everything up to the closing bracket
+        skips[i]: The index of the entry after this one and, for arrays and
+            objects, all of their contents. This is the next sibling, which
+            is how a value is skipped over in O(1)
+        counts[i]: The number of elements of an array or members of an
+            object, and 0 for any other entry
+
+    '''
+
+    def __init__(self, text: str, parse_float: NumberHook = None, parse_int: NumberHook = None) -> None:
+        self.text = text
+        self.parse_float = parse_float
+        self.parse_int = parse_int
+        self.kinds = array("B")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.skips = array("q")
+        self.counts = array("q")
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def value(self, i: int) -> Any:
+        '''
+        Args:
+            i: The index of an entry that is not an object key
+
+        Returns:
+            The decoded value of a string, number, boolean or null entry, or a
+            LazyArray or LazyObject for an array or object entry
+
+        '''
+        kind = self.kinds[i]
+        if kind == ARRAY:
+            return LazyArray(self, i)
+        elif kind == OBJECT:
+            return LazyObject(self, i)
+        elif kind & ~ESCAPED == STRING:
+            return self.string(i)
+        elif kind == NUMBER:
+            return convert_number(self.text[self.starts[i]:self.ends[i]], self.parse_int or int,
+                                  self.parse_float or float)
+        elif kind == TRUE:
+            return True
+        elif kind == FALSE:
+            return False
+        return None
+
+    def string(self, i: int) -> str:
+        ''' Returns the decoded contents of the string or object key entry i '''
+        lexeme = self.text[self.starts[i] + 1:self.ends[i] - 1]
+        return unescape(lexeme) if self.kinds[i] & ESCAPED else lexeme
+
+    def materialize(self, i: int) -> Any:
+        ''' Returns the value of entry i fully parsed, as load_json_string would '''
+        if self.kinds[i] not in (ARRAY, OBJECT):
+            return self.value(i)
+        return decode(self.text[self.starts[i]:self.ends[i]], self.parse_float, self.parse_int)
+
+
+class LazyArray(Sequence):
+    '''
+    A read-only list-like view of an array in a Tape. Elements are decoded
+    each time they are accessed, and reaching element i hops over the i
+    elements before it without looking inside them.
+    '''
+
+    def __init__(self, tape: 'Tape', entry: int) -> None:
+        self.tape = tape
+        self._entry = entry
+
+    def __len__(self) -> int:
+        return self.tape.counts[self._entry]
+
+    def __getitem__(self, i: int) -> Any:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("LazyArray index out of range")
+        skips = self.tape.skips
+        j = self._entry + 1
+        for _ in range(i):
+            j = skips[j]
+        return self.tape.value(j)
+
+    def __iter__(self) -> Iterator[Any]:
+        tape = self.tape
+        j = self._entry + 1
+        for _ in range(len(self)):
+            yield tape.value(j)
+            j = tape.skips[j]
+
+    def __eq__(self, o: Any) -> bool:
+        if isinstance(o, (list, LazyArray)):
+            return len(self) == len(o) and all(a == b for a, b in zip(self, o))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"LazyArray({len(self)} elements)"
+
+    def materialize(self) -> List:
+        ''' Returns the array fully parsed into a list '''
+        return self.tape.materialize(self._entry)
+
+
+class LazyObject(Mapping):
+    '''
+    A read-only dict-like view of an object in a Tape. Keys are only decoded
+    the first time one is looked up, and values each time they are accessed.
+    As with dicts, the last value of a repeated key wins.
+    '''
+
+    def __init__(self, tape: 'Tape', entry: int) -> None:
+        self.tape = tape
+        self._entry = entry
+        self._values = None
+
+    def __len__(self) -> int:
+        return len(self._members())
+
+    def __getitem__(self, key: str) -> Any:
+        return self.tape.value(self._members()[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._members())
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._members()
+
+    def __repr__(self) -> str:
+        return f"LazyObject({len(self)} members)"
+
+    def materialize(self) -> Dict:
+        ''' Returns the object fully parsed into a dict '''
+        return self.tape.materialize(self._entry)
+
+    def _members(self) -> Dict[str, int]:
+        # maps each key to the index of its value's entry
+        if self._values is None:
+            tape = self.tape
+            skips = tape.skips
+            self._values = {}
+            j = self._entry + 1
+            for _ in range(tape.counts[self._entry]):
+                self._values[tape.string(j)] = j + 1
+                j = skips[j + 1]
+        return self._values
+
+
+def build_tape(text: str, parse_float: NumberHook = None, parse_int: NumberHook = None) -> Optional['Tape']:
+    '''
+    Args:
+        text: The JSON text to index
+        parse_float: See lexer.lex_iter, applied as numbers are accessed
+        parse_int: See lexer.lex_iter, applied as numbers are accessed
+
+    Returns:
+        Tape: The index of text, or None if it is not a single, plain JSON
+        object or array that the scan engine's TOKEN_PATTERN can match
+
+    The text is checked against the same grammar as parser_.parse while it
+    is indexed, but no tokens or Python values are created for it.
+
+    '''
+    tape = Tape(text, parse_float, parse_int)
+    kinds, counts = tape.kinds, tape.counts
+    # appending through bound methods saves an attribute lookup per entry
+    add_kind, add_start, add_end = kinds.append, tape.starts.append, tape.ends.append
+    add_skip, add_count = tape.skips.append, counts.append
+    stack = []
+    expect = _VALUE
+    i = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        if match.start() != i or expect == _DONE:
+            break
+        i = match.end()
+        kind = match.lastindex
+
+        if kind == 4:
+            c = match.group(4)
+            if c == ",":
+                if expect != _COMMA_OR_CLOSE:
+                    return None
+                expect = _VALUE if kinds[stack[-1]] == ARRAY else _KEY
+                continue
+            if c == "]" or c == "}":
+                closes = ARRAY if c == "]" else OBJECT
+                if expect != _COMMA_OR_CLOSE and expect != (_VALUE_OR_CLOSE if closes == ARRAY else _KEY_OR_CLOSE):
+                    return None
+                top = stack.pop()
+                if kinds[top] != closes:
+                    return None
+                tape.ends[top] = i
+                tape.skips[top] = len(kinds)
+                expect = _COMMA_OR_CLOSE if stack else _DONE
+                continue
+            if expect != _VALUE and expect != _VALUE_OR_CLOSE:
+                return None
+            if stack and kinds[stack[-1]] == ARRAY:
+                counts[stack[-1]] += 1
+            stack.append(len(kinds))
+            add_kind(ARRAY if c == "[" else OBJECT)
+            add_start(i - 1)
+            add_end(i)
+            add_skip(len(kinds))
+            add_count(0)
+            expect = _VALUE_OR_CLOSE if c == "[" else _KEY_OR_CLOSE
+            continue
+
+        if kind <= KEY:
+            start, end = match.span(1)
+            lexeme = text[start + 1:end - 1]
+            if not lexeme.isprintable() and _has_control_character(lexeme):
+                return None
+            if kind == KEY:
+                if expect != _KEY and expect != _KEY_OR_CLOSE:
+                    return None
+                counts[stack[-1]] += 1
+                expect = _VALUE
+            elif expect != _VALUE and expect != _VALUE_OR_CLOSE:
+                return None
+            else:
+                expect = _COMMA_OR_CLOSE
+            if "\\" in lexeme:
+                kind |= ESCAPED
+        else:
+            if expect != _VALUE and expect != _VALUE_OR_CLOSE:
+                return None
+            start, end = match.span(kind)
+            expect = _COMMA_OR_CLOSE
+        if not stack:
+            # parser_.parse only accepts an object or array at the top
+            return None
+        if kind != KEY and kind != KEY | ESCAPED and kinds[stack[-1]] == ARRAY:
+            counts[stack[-1]] += 1
+        add_kind(kind)
+        add_start(start)
+        add_end(end)
+        add_skip(len(kinds))
+        add_count(0)
+
+    if expect != _DONE or WHITESPACE_PATTERN.match(text, i).end() < len(text):
+        return None
+    return tape
+
+
+def load_lazy(text: str, parse_float: NumberHook = None,
+              parse_int: NumberHook = None) -> Union['LazyObject', 'LazyArray', Dict, List, None]:
+    '''
+    Args:
+        text: The JSON text to load
+        parse_float: See lexer.lex_iter
+        parse_int: See lexer.lex_iter
+
+    Returns:
+        LazyObject | LazyArray: A view of the top-level object or array of
+        text, which decodes values only as they are accessed
+
+    Indexing the text checks it as fully as parsing it would. Whenever
+    build_tape cannot index it, the text is parsed by parser_.parse_iterative
+    instead, which raises the same TokenError or ParseError as
+    load_json_string would. For the few inputs the lexer accepts but
+    TOKEN_PATTERN does not (or that have other text after the top-level
+    value), that parsed dict or list is returned rather than a lazy view.
+
+    '''
+    tape = build_tape(text, parse_float, parse_int)
+    if tape is None:
+        try:
+            return parse_iterative(lex_iter(text, parse_float=parse_float, parse_int=parse_int))
+        except ParseError as error:
+            locate(error, text)
+            raise
+    return tape.value(0)
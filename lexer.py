@@ -6,23 +6,132 @@ Author: Brent Pappas
 # resources
 # https://www.json.org/json-en.html (visual, very nice)
 
+import codecs
+import re
 import unicodedata
+from array import array
 from enum import Enum
-from typing import List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 
-class TokenError(Exception):
+class ErrorPosition(object):
+    '''
+    Where in the text an error was raised:
+
+        offset: The index in the text of the character (or the start of the
+            token) the error was found at, or None if it is not known
+        line_number: The line of that index, counting from 1
+        column: Its column within that line, counting from 1, or None if the
+            offset is not known
+
+    The lexer only keeps track of its index in the text, never of lines, so
+    an error raised with a position keeps a reference to the text instead,
+    and the line and column are counted from it when first asked for.
+
+    '''
+
+    offset: Optional[int] = None
+    _line_number: Optional[int] = None
+    _column: Optional[int] = None
+    # the text the error was raised in, the index of the error in it, and
+    # the line and column of the text's first character
+    _source: Optional[Tuple[str, int, int, int]] = None
+
+    @property
+    def line_number(self) -> Optional[int]:
+        if self._source is not None:
+            self._count()
+        return self._line_number
+
+    @line_number.setter
+    def line_number(self, line_number: Optional[int]) -> None:
+        if self._source is not None:
+            self._count()
+        self._line_number = line_number
+
+    @property
+    def column(self) -> Optional[int]:
+        if self._source is not None:
+            self._count()
+        return self._column
+
+    def _locate(self, text: str, i: int, line_number: int = 1) -> None:
+        # sets the position to index i of text, where text[0] is at the start
+        # of line_number
+        self.offset = i
+        self._source = (text, i, line_number, 1)
+
+    def _relocate(self, offset: int, line_number: int, column: int) -> None:
+        # moves the position from within a piece of a text, where the piece
+        # starts at line 1 and column 1, to within the whole text, where the
+        # piece starts at offset, line_number and column
+        if self.offset is not None:
+            self.offset += offset
+        if self._source is not None:
+            text, i, piece_line, piece_column = self._source
+            if piece_line == 1:
+                piece_column += column - 1
+            self._source = (text, i, piece_line + line_number - 1, piece_column)
+            return
+        if self._line_number == 1 and self._column is not None:
+            self._column += column - 1
+        if self._line_number is not None:
+            self._line_number += line_number - 1
+
+    def _count(self) -> None:
+        text, i, line_number, column = self._source
+        # drop the text, which may be large, once it has been counted
+        self._source = None
+        self._line_number, self._column = position(text, i, line_number, column)
+
+    def _position_state(self) -> Dict[str, Optional[int]]:
+        # the position, without the text, for pickling along with the arguments
+        return {"offset": self.offset, "_line_number": self.line_number, "_column": self.column}
+
+
+class TokenError(ErrorPosition, Exception):
     """ Class for token errors """
 
     def __init__(self, character, line_number, message="Token error") -> None:
         self.character = character
-        self.line_number = line_number
+        self._line_number = line_number
         self.message = message
         super().__init__(self.message)
 
     def __str__(self) -> str:
         return f"{self.message}: Unexpected character '{self.character}' at line {self.line_number}"
 
+    def __reduce__(self):
+        # keep errors picklable so they can cross process boundaries
+        return (self.__class__, (self.character, self.line_number, self.message), self._position_state())
+
+
+def position(text: str, i: int, line_number: int = 1, column: int = 1) -> Tuple[int, int]:
+    '''
+    Args:
+        text: A JSON text, or a piece of one
+        i: An index in text
+        line_number: The line text[0] is on
+        column: The column of text[0] within that line
+
+    Returns:
+        tuple: The line and column of text[i], both counting from 1
+
+    '''
+    newlines = text.count("\n", 0, i)
+    if newlines == 0:
+        return line_number, column + i
+    return line_number + newlines, i - text.rfind("\n", 0, i)
+
+
+def _error(text: str, i: int, line_number: int, character: Optional[str] = None) -> 'TokenError':
+    # the TokenError for text[i] (reporting character instead, if given),
+    # where line_number is that of text[0]. Its line and column are only
+    # counted once they are asked for
+    error = TokenError(text[i] if character is None else character, None)
+    error._locate(text, i, line_number=line_number)
+    return error
+
 
 class Tag(Enum):
     """ Enum for token tags """
@@ -45,6 +154,8 @@ class Token(object):
     attribute.
     '''
 
+    __slots__ = ("tag",)
+
     def __init__(self, tag: 'Tag') -> None:
         self.tag = tag
 
@@ -58,8 +169,10 @@ class Token(object):
 class Number(Token):
     ''' Class for tokens representing integers and floating point numbers '''
 
+    __slots__ = ("value",)
+
     def __init__(self, value: 'Tag') -> None:
-        super().__init__(Tag.NUMBER)
+        self.tag = Tag.NUMBER
         self.value = value
 
     def __repr__(self) -> str:
@@ -72,8 +185,10 @@ class Number(Token):
 class Literal(Token):
     ''' Class for tokens representing string literals '''
 
+    __slots__ = ("lexeme",)
+
     def __init__(self, lexeme: str) -> None:
-        super().__init__(Tag.LITERAL)
+        self.tag = Tag.LITERAL
         self.lexeme = lexeme
 
     def __repr__(self) -> str:
@@ -86,16 +201,20 @@ class Literal(Token):
 class ObjectKey(Literal):
     ''' Class for tokens representing strings that are object keys '''
 
+    __slots__ = ()
+
     def __init__(self, lexeme: str) -> None:
-        super().__init__(lexeme)
         self.tag = Tag.OBJECT_KEY
+        self.lexeme = lexeme
 
 
 class Boolean(Token):
     ''' Class for tokens representing boolean values '''
 
+    __slots__ = ("value",)
+
     def __init__(self, value: bool) -> None:
-        super().__init__(Tag.BOOLEAN)
+        self.tag = Tag.BOOLEAN
         self.value = value
 
     def __repr__(self) -> str:
@@ -105,20 +224,91 @@ class Boolean(Token):
         return self.tag == o.tag and self.value == o.value
 
 
-def lex(text: str) -> List['Token']:
+ENGINES = ["scan", "loop"]
+DEFAULT_ENGINE = "scan"
+
+
+NumberHook = Optional[Callable[[str], Any]]
+
+
+def convert_number(lexeme: str, to_int: Callable[[str], Any], to_float: Callable[[str], Any]) -> Any:
+    '''
+    Args:
+        lexeme: The text of a JSON number
+        to_int: Called with lexeme if it has neither a fraction nor an exponent
+        to_float: Called with lexeme otherwise
+
+    Returns:
+        The number, as converted by to_int or to_float
+
+    '''
+    if lexeme.isdigit() or (lexeme[0] == "-" and lexeme[1:].isdigit()):
+        return to_int(lexeme)
+    return to_float(lexeme)
+
+
+def lex(text: str, engine: str = DEFAULT_ENGINE, parse_float: NumberHook = None,
+        parse_int: NumberHook = None) -> List['Token']:
     '''
     Args:
         text: The JSON text to lex into tokens
+        engine: The lexer engine to use, see lex_iter
+        parse_float: See lex_iter
+        parse_int: See lex_iter
 
     Returns:
         list: A list of JSON tokens
 
+    '''
+    return list(lex_iter(text, engine=engine, parse_float=parse_float, parse_int=parse_int))
+
+
+def lex_iter(text: str, line_number: int = 1, engine: str = DEFAULT_ENGINE,
+             parse_float: NumberHook = None, parse_int: NumberHook = None) -> Iterator['Token']:
+    '''
+    Args:
+        text: The JSON text to lex into tokens
+        line_number: The line number of the first character of text, used
+            when text is only one piece of a larger document
+        engine: "scan" to match whole tokens at a time with a compiled regular
+            expression, or "loop" to look at one character at a time. Both
+            produce the same tokens and raise the same TokenErrors. How much
+            faster "scan" is depends on the text (see benchmark.py)
+        parse_float: Called with the text of every number that has a fraction
+            or exponent, float by default. Pass decimal.Decimal to decode
+            such numbers exactly
+        parse_int: Called with the text of every other number, int by default
+
+    Returns:
+        iterator: A generator yielding JSON tokens one at a time
+
+    Tokens are produced lazily, so a consumer that does not hold on to them
+    (such as the parser) never keeps more than a single token in memory.
+
+    '''
+    return _lex_from(text, 0, line_number, engine, parse_float, parse_int)
+
+
+def _lex_from(text: str, i: int, line_number: int, engine: str, parse_float: NumberHook,
+              parse_int: NumberHook) -> Iterator['Token']:
+    # lexes text from index i onward, where line_number is that of text[0]
+    if engine == "scan":
+        return _lex_scan(text, i, line_number, parse_float, parse_int)
+    elif engine == "loop":
+        return _lex_loop(text, i, line_number, parse_float, parse_int)
+    raise ValueError(f"Unknown lexer engine '{engine}'. Expected one of {ENGINES}")
+
+
+def _lex_loop(text: str, i: int, line_number: int, parse_float: NumberHook,
+              parse_int: NumberHook) -> Iterator['Token']:
+    '''
+    The "loop" engine, lexing text from index i onward, where line_number
+    is that of text[0]. Only the index is kept track of, and the line of a
+    TokenError is counted from the text if it is ever asked for.
     '''
     n = len(text)
-    line_number = 1
-    token_list = []
-    i = 0
-    round_off_digit = 15
+    to_int = parse_int or int
+    to_float = parse_float or float
 
     def is_unicode(c):
         # https://stackoverflow.com/questions/4324790/removing-control-characters-from-a-string-in-python
@@ -128,186 +318,743 @@ def lex(text: str) -> List['Token']:
 
         # skip whitespace
         if text[i].isspace():
-            if text[i] == "\n":
-                line_number += 1
             i += 1
             continue
 
-        v_is_negative = False
         # check if number is negative first
+        start = i
         if text[i] == "-":
-            v_is_negative = True
             i += 1
             if i >= n:
-                raise TokenError(text[i-1], line_number)
+                raise _error(text, i-1, line_number)
 
         # check for number
         if text[i].isnumeric():
-            v = 0
+            is_integer = True
 
             # integer
             while i < n and text[i].isnumeric():
-                v *= 10
-                v += int(text[i])
                 i += 1
 
-            if i >= n or text[i].lower() not in [".", "e"]:
-                token_list.append(Number(v * (-1 if v_is_negative else 1)))
-                continue
-
             # float
-            if text[i] == ".":
+            if i < n and text[i] == ".":
+                is_integer = False
                 i += 1
-                mantissa = 0
-                e = -1
                 while i < n and text[i].isnumeric():
-                    mantissa += int(text[i]) * 10**e
-                    e -= 1
                     i += 1
-                v += mantissa
-            if i >= n or text[i].lower() != "e":
-                token_list.append(Number(v * (-1 if v_is_negative else 1)))
-                continue
 
             # scientific notation
-            # {invariant: text[i].lower() == "e"}
-            i += 1
-            if i >= n:
-                raise TokenError(text[i-1], line_number)
-
-            # check if exponent is negative
-            e_is_negative = False
-            if text[i] == '-':
-                e_is_negative = True
-                i += 1
-            elif text[i] == "+":
+            if i < n and text[i].lower() == "e":
+                is_integer = False
                 i += 1
-            else:
-                if not text[i].isnumeric():
-                    raise TokenError(text[i], line_number)
-            if i >= n:
-                raise TokenError(text[i-1], line_number)
-
-            e = 0
-            # e will always be an integer
-            while i < n and text[i].isnumeric():
-                e *= 10
-                e += int(text[i])
-                i += 1
-            if e_is_negative:
-                e *= -1
+                if i >= n:
+                    raise _error(text, i-1, line_number)
 
-            v *= 10**e
+                # check for the sign of the exponent
+                if text[i] in ["-", "+"]:
+                    i += 1
+                    if i >= n:
+                        raise _error(text, i-1, line_number)
+                if not text[i].isnumeric():
+                    raise _error(text, i, line_number)
 
-            if e != 0:
-                v = round(v, round_off_digit)
+                # the exponent is always an integer
+                while i < n and text[i].isnumeric():
+                    i += 1
 
-            token_list.append(Number(v * (-1 if v_is_negative else 1)))
-            i += 1
+            # convert the whole number at once, rather than digit by digit
+            lexeme = text[start:i]
+            yield Number(to_int(lexeme) if is_integer else to_float(lexeme))
             continue
 
         # check for true
         if text[i] == "t":
             if i + 3 >= n:
-                raise TokenError(text[i], line_number)
+                raise _error(text, i, line_number)
             if text[i:i+4] == "true":
-                token_list.append(Boolean(True))
+                yield Boolean(True)
                 i += 4
                 continue
 
         # check for false
         if text[i] == "f":
             if i + 4 >= n:
-                raise TokenError(text[i], line_number)
+                raise _error(text, i, line_number)
             elif text[i:i+5] == "false":
-                token_list.append(Boolean(False))
+                yield Boolean(False)
                 i += 5
                 continue
 
         # check for comma
         if text[i] == ",":
-            token_list.append(Token(Tag.COMMA))
+            yield Token(Tag.COMMA)
             i += 1
             continue
 
         # check for brackets
         if text[i] in ["[", "]"]:
-            token_list.append(
+            yield (
                 Token(Tag.LEFT_BRACKET if text[i] == "[" else Tag.RIGHT_BRACKET))
             i += 1
             continue
 
         # check for braces
         if text[i] in ["{", "}"]:
-            token_list.append(
+            yield (
                 Token(Tag.LEFT_BRACE if text[i] == "{" else Tag.RIGHT_BRACE))
             i += 1
             continue
 
         # check for string literal / object key
         if text[i] == '"':
-            buffer = ""
+            start = i + 1
+            has_escape = False
             while True:
                 i += 1
 
                 if i >= n:
-                    raise TokenError(text[i-1], line_number)
+                    raise _error(text, i-1, line_number)
 
                 if text[i] == '"':
+                    # slice the string out at once, and only decode it if needed
+                    lexeme = text[start:i]
+                    if has_escape:
+                        lexeme = unescape(lexeme)
                     # check whether object key or literal
                     # it may have been better to have made colon into a token, but this works
                     while i + 1 < n and text[i+1].isspace():
-                        if text[i + 1] == "\n":
-                            line_number += 1
                         i += 1
                     if i + 1 < n and text[i+1] == ":":
-                        token_list.append(ObjectKey(buffer))
+                        yield ObjectKey(lexeme)
                         i += 2  # we add 2 here and not just 1 since we break out of the inner loop
                     else:
-                        token_list.append(Literal(buffer))
+                        yield Literal(lexeme)
                         i += 1
                     break
 
                 if text[i] == "\\":
+                    has_escape = True
                     if i + 1 >= n:
-                        raise TokenError(text[i], line_number)
+                        raise _error(text, i, line_number)
                     if text[i + 1] not in ['"', "\\", "/", "b", "f", "n", "r", "t", "u"]:
-                        raise TokenError(text[i + 1], line_number)
+                        raise _error(text, i + 1, line_number)
                     if text[i + 1] != "u":
-                        buffer += text[i:i + 2]
                         i += 1
                         continue
                     # handle \u followed by 4 hex digits
                     if i + 5 >= n:
-                        raise TokenError(text[i], line_number)
-                    buffer += text[i]
-                    buffer += "u"
+                        raise _error(text, i, line_number)
                     i += 1
                     for _ in range(4):
                         i += 1
-                        if not (text[i].isnumeric() or text[i] in 'abcdefABCDEF'):
-                            raise TokenError(text[i], line_number)
-                        buffer += text[i]
+                        if text[i] not in "0123456789abcdefABCDEF":
+                            raise _error(text, i, line_number)
                     continue
 
                 if is_unicode(text[i]):
-                    raise TokenError(text[i], line_number)
-
-                buffer += text[i]
+                    raise _error(text, i, line_number)
             continue
 
         # check for null
         if text[i] == "n":
             if i + 3 >= n:
-                raise TokenError(text[i], line_number)
+                raise _error(text, i, line_number)
             if text[i:i+4] != "null":
-                raise TokenError(text[i], line_number)
-            token_list.append(Token(Tag.NULL))
+                raise _error(text, i, line_number)
+            yield Token(Tag.NULL)
             i += 4
             continue
 
         # this assumes that a valid match will end in a continue statement,
         # so if we reach this point then an invalid token was encountered
-        raise TokenError(text[i-1], line_number)
+        # (at the very start of the text there is no character before it)
+        raise _error(text, i, line_number, text[i-1] if i > 0 else text[i])
+
+
+STRING_BODY = r'[^"\\]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\]*)*'
+# like STRING_BODY, but passing over any escape, for skipping strings
+# without checking them
+LOOSE_STRING_BODY = r'[^"\\]*(?:\\.[^"\\]*)*'
+# a number may not be followed by anything that would make the loop engine
+# read it differently, so that those cases fall back to the loop engine
+NUMBER_BODY = r'-?[0-9]+(?:\.[0-9]*)?(?:[eE][+-]?[0-9]+)?(?![.eE\d])'
+# the index of the last group matched tells the kind of token:
+# 1 literal, 2 object key, 3 number, 4 punctuation, 5 true, 6 false, 7 null
+TOKEN_PATTERN = re.compile(
+    r'\s*(?:("' + STRING_BODY + r'")(\s*:)?|(' + NUMBER_BODY + r')|([,\[\]{}])|(true)|(false)|(null))')
+
+# tokens without an attribute carry no state, so the scan engine shares them
+SHARED_TOKENS = {
+    ",": Token(Tag.COMMA),
+    "[": Token(Tag.LEFT_BRACKET),
+    "]": Token(Tag.RIGHT_BRACKET),
+    "{": Token(Tag.LEFT_BRACE),
+    "}": Token(Tag.RIGHT_BRACE),
+}
+NULL_TOKEN = Token(Tag.NULL)
+TRUE_TOKEN = Boolean(True)
+FALSE_TOKEN = Boolean(False)
+# the most distinct object keys the scan engine shares tokens for at a time
+MAX_SHARED_KEYS = 1024
+
+
+def _lex_scan(text: str, i: int, line_number: int, parse_float: NumberHook,
+              parse_int: NumberHook) -> Iterator['Token']:
+    '''
+    The "scan" engine, lexing text from index i onward
+
+    Each step matches a whole token (and the whitespace before it) with
+    TOKEN_PATTERN, so runs of whitespace, digits and string characters are
+    consumed by the regular expression engine instead of one Python loop
+    iteration per character. Whenever the pattern does not match, lexing
+    falls back to the loop engine from that point on, which raises the
+    exact TokenError (or produces the exact tokens, for the inputs the loop
+    engine is lenient about) that lexing the whole text with it would.
+
+    Each call to the pattern's scanner matches right where the last match
+    ended, so there are no gaps to check for, and the ObjectKey token of a
+    key is shared by every later occurrence of it (up to MAX_SHARED_KEYS
+    distinct keys at a time), so repeated keys cost a single lookup.
 
-    return token_list
+    How much faster this is than the loop engine depends on the text (see
+    benchmark.py). It is never slower, so it is the default.
+
+    '''
+    n = len(text)
+    to_int = parse_int or int
+    to_float = parse_float or float
+    # the ObjectKey token of each key seen so far, by its text
+    keys = {}
+    # each call matches right where the last match ended, or returns None,
+    # so there is no need to check for gaps between the matches
+    match_next = TOKEN_PATTERN.scanner(text, i).match
+    # the last token matched, up to which everything has been lexed
+    last = None
+    while True:
+        match = match_next()
+        if match is None:
+            break
+        kind = match.lastindex
+        if kind == 4:
+            yield SHARED_TOKENS[match.group(4)]
+        elif kind == 2:
+            start, end = match.span(1)
+            lexeme = text[start + 1:end - 1]
+            token = keys.get(lexeme)
+            if token is None:
+                if not lexeme.isprintable() and _has_control_character(lexeme):
+                    break
+                if len(keys) >= MAX_SHARED_KEYS:
+                    keys.clear()
+                token = keys[lexeme] = ObjectKey(unescape(lexeme) if "\\" in lexeme else lexeme)
+            yield token
+        elif kind == 1:
+            start, end = match.span(1)
+            lexeme = text[start + 1:end - 1]
+            if not lexeme.isprintable() and _has_control_character(lexeme):
+                break
+            if "\\" in lexeme:
+                lexeme = unescape(lexeme)
+            yield Literal(lexeme)
+        elif kind == 3:
+            yield Number(convert_number(match.group(3), to_int, to_float))
+        elif kind == 5:
+            yield TRUE_TOKEN
+        elif kind == 6:
+            yield FALSE_TOKEN
+        else:
+            yield NULL_TOKEN
+        last = match
+
+    # skip trailing whitespace, or let the loop engine handle whatever failed to match
+    if last is not None:
+        i = last.end()
+    i = WHITESPACE_PATTERN.match(text, i).end()
+    if i < n:
+        yield from _lex_loop(text, i, line_number, parse_float, parse_int)
+
+
+# the tag of each kind of match of TOKEN_PATTERN, by the index of its last group
+MATCH_TAGS = [None, Tag.LITERAL, Tag.OBJECT_KEY, Tag.NUMBER, None, Tag.BOOLEAN, Tag.BOOLEAN, Tag.NULL]
+PUNCTUATION_TAGS = {c: token.tag for c, token in SHARED_TOKENS.items()}
+TAGS_BY_VALUE = {tag.value: tag for tag in Tag}
+
+
+class TokenStream(object):
+    '''
+    A compact list of the tokens of a JSON text, see lex_compact. Rather than
+    one object per token, only three parallel arrays are kept:
+
+        tags[i]: The value of the Tag of token i
+        starts[i], ends[i]: The span of token i in the text. For strings this
+            includes the quotes, but not the colon after an object key
+
+    Indexing or iterating the stream creates Token objects (equal to those
+    lex returns) one at a time, so it can be passed to parser_.parse.
+    Numbers are converted and strings are unescaped only then.
+
+    '''
+
+    def __init__(self, text: str, parse_float: NumberHook = None, parse_int: NumberHook = None) -> None:
+        self.text = text
+        self.parse_float = parse_float
+        self.parse_int = parse_int
+        self.tags = array("B")
+        self.starts = array("q")
+        self.ends = array("q")
+        # tokens of whatever is left after the scan engine stopped matching,
+        # which only the loop engine lexes (without keeping their spans)
+        self.tail = []
+
+    def __len__(self) -> int:
+        return len(self.tags) + len(self.tail)
+
+    def __getitem__(self, i: int) -> 'Token':
+        i = self._index(i)
+        n = len(self.tags)
+        return self.tail[i - n] if i >= n else self._token(i)
+
+    def __iter__(self) -> Iterator['Token']:
+        for i in range(len(self.tags)):
+            yield self._token(i)
+        yield from self.tail
+
+    def tag(self, i: int) -> 'Tag':
+        ''' Returns the Tag of token i, without creating the token '''
+        i = self._index(i)
+        if i >= len(self.tags):
+            return self.tail[i - len(self.tags)].tag
+        return TAGS_BY_VALUE[self.tags[i]]
+
+    def span(self, i: int) -> Optional[Tuple[int, int]]:
+        '''
+        Args:
+            i: The index of a token
+
+        Returns:
+            tuple: The start and end indices of the token in the text, or None
+            for the tokens of the tail, which has no spans
+
+        '''
+        i = self._index(i)
+        if i >= len(self.tags):
+            return None
+        return self.starts[i], self.ends[i]
+
+    def line_number(self, i: int) -> Optional[int]:
+        ''' Returns the line token i starts on, or None for tokens of the tail '''
+        span = self.span(i)
+        return None if span is None else self.text.count("\n", 0, span[0]) + 1
+
+    def _index(self, i: int) -> int:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("TokenStream index out of range")
+        return i
+
+    def _token(self, i: int) -> 'Token':
+        tag = TAGS_BY_VALUE[self.tags[i]]
+        start = self.starts[i]
+        end = self.ends[i]
+        if tag == Tag.LITERAL or tag == Tag.OBJECT_KEY:
+            lexeme = self.text[start + 1:end - 1]
+            if "\\" in lexeme:
+                lexeme = unescape(lexeme)
+            return Literal(lexeme) if tag == Tag.LITERAL else ObjectKey(lexeme)
+        elif tag == Tag.NUMBER:
+            return Number(convert_number(self.text[start:end], self.parse_int or int, self.parse_float or float))
+        elif tag == Tag.BOOLEAN:
+            return TRUE_TOKEN if self.text[start] == "t" else FALSE_TOKEN
+        elif tag == Tag.NULL:
+            return NULL_TOKEN
+        return SHARED_TOKENS[self.text[start]]
+
+
+def lex_compact(text: str, parse_float: NumberHook = None, parse_int: NumberHook = None) -> 'TokenStream':
+    '''
+    Args:
+        text: The JSON text to lex into tokens
+        parse_float: See lex_iter, applied as tokens are created
+        parse_int: See lex_iter, applied as tokens are created
+
+    Returns:
+        TokenStream: The same tokens as lex(text) returns, stored in 17 bytes
+        each rather than as one object per token
+
+    Strings are checked for control characters as they are lexed, so the
+    same TokenErrors are raised as by lex.
+
+    '''
+    stream = TokenStream(text, parse_float, parse_int)
+    add_tag, add_start, add_end = stream.tags.append, stream.starts.append, stream.ends.append
+    i = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        if match.start() != i:
+            break
+        kind = match.lastindex
+        if kind == 4:
+            start, end = match.span(4)
+            tag = PUNCTUATION_TAGS[text[start]]
+        else:
+            start, end = match.span(1 if kind == 2 else kind)
+            if kind <= 2:
+                lexeme = text[start + 1:end - 1]
+                if not lexeme.isprintable() and _has_control_character(lexeme):
+                    break
+            tag = MATCH_TAGS[kind]
+        add_tag(tag.value)
+        add_start(start)
+        add_end(end)
+        i = match.end()
+
+    # as with the scan engine, the loop engine lexes whatever failed to match
+    i = WHITESPACE_PATTERN.match(text, i).end()
+    if i < len(text):
+        stream.tail = list(_lex_loop(text, i, 1, parse_float, parse_int))
+    return stream
+
+
+# in bytes patterns \d only matches ASCII digits, so a number followed by any
+# non-ASCII byte (which may be another kind of digit, as in 1\u0663) is left
+# for the decoding path
+BYTES_TOKEN_PATTERN = re.compile(TOKEN_PATTERN.pattern.replace(r"(?![.eE\d])", r"(?![.eE\d\x80-\xff])")
+                                 .encode("ascii"))
+BYTES_WHITESPACE_PATTERN = re.compile(rb'\s*')
+NEWLINE_PATTERN = re.compile(rb'\n')
+# the bytes of a UTF-8 encoded character after its first
+CONTINUATION_PATTERN = re.compile(rb'[\x80-\xbf]')
+BYTES_SHARED_TOKENS = {c.encode("ascii"): token for c, token in SHARED_TOKENS.items()}
+# what may follow a string that is not an object key, other than whitespace
+STRING_FOLLOWERS = b",]}"
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+def lex_bytes(data: Any, parse_float: NumberHook = None, parse_int: NumberHook = None) -> Iterator['Token']:
+    '''
+    Args:
+        data: A UTF-8 encoded JSON text as bytes, or any other object
+            supporting the buffer protocol, such as a memoryview or mmap
+        parse_float: See lex_iter
+        parse_int: See lex_iter
+
+    Returns:
+        iterator: A generator yielding the same JSON tokens as
+        lex_iter(data.decode("utf-8"))
+
+    Tokens are matched with TOKEN_PATTERN directly over the bytes, and only
+    the contents of strings (and the few characters of each number) are ever
+    decoded, so the text as a whole is never copied into a str. On an mmap
+    this leaves reading the file to the operating system's page cache.
+
+    Whenever the pattern does not match, the rest of the data is decoded a
+    chunk at a time and lexed with lex_chunks, which raises the exact
+    TokenError (or UnicodeDecodeError, for data that is not valid UTF-8)
+    that decoding and lexing the whole text would.
+
+    '''
+    n = len(data)
+    i = 0
+    to_int = parse_int or int
+    to_float = parse_float or float
+    for match in BYTES_TOKEN_PATTERN.finditer(data):
+        if match.start() != i:
+            break
+        kind = match.lastindex
+        if kind == 4:
+            yield BYTES_SHARED_TOKENS[match.group(4)]
+        elif kind <= 2:
+            if kind == 1:
+                # the str lexer would also skip other whitespace, such as
+                # \x1c or U+2028, looking for a colon after the string
+                end = match.end()
+                if end < n and data[end] not in STRING_FOLLOWERS:
+                    end = BYTES_WHITESPACE_PATTERN.match(data, end).end()
+                    if end < n and data[end] not in STRING_FOLLOWERS:
+                        break
+            # groups are always bytes, whatever kind of buffer data is
+            lexeme = match.group(1)[1:-1].decode("utf-8")
+            if not lexeme.isprintable() and _has_control_character(lexeme):
+                break
+            if "\\" in lexeme:
+                lexeme = unescape(lexeme)
+            if kind == 2:
+                yield ObjectKey(lexeme)
+            else:
+                yield Literal(lexeme)
+        elif kind == 3:
+            yield Number(convert_number(match.group(3).decode("ascii"), to_int, to_float))
+        elif kind == 5:
+            yield TRUE_TOKEN
+        elif kind == 6:
+            yield FALSE_TOKEN
+        else:
+            yield NULL_TOKEN
+        i = match.end()
+
+    i = BYTES_WHITESPACE_PATTERN.match(data, i).end()
+    if i < n:
+        # the loop engine may report the character before the one it failed
+        # on, so decoding starts at the beginning of that character
+        start = max(i - 1, 0)
+        while start > 0 and 0x80 <= data[start] < 0xC0:
+            start -= 1
+        # the position of data[start] in the decoded text, counting characters
+        line_number = 1
+        line_start = 0
+        for match in NEWLINE_PATTERN.finditer(data, 0, start):
+            line_number += 1
+            line_start = match.end()
+        offset = start - len(CONTINUATION_PATTERN.findall(data, 0, start))
+        column = 1 + start - line_start - len(CONTINUATION_PATTERN.findall(data, line_start, start))
+        # no view of data is kept, so that an mmap can be closed after an error
+        chunks = decode_chunks(memoryview(data)[j:j + DECODE_CHUNK_SIZE] for j in range(start, n, DECODE_CHUNK_SIZE))
+        yield from _lex_chunks(chunks, int(start < i), line_number, DEFAULT_ENGINE, parse_float, parse_int,
+                               offset, column)
+
+
+def decode_chunks(chunks: Iterable[Any]) -> Iterator[str]:
+    '''
+    Args:
+        chunks: Consecutive pieces of a text, as str or as UTF-8 encoded
+            bytes (or any other buffer)
+
+    Returns:
+        iterator: A generator yielding each piece as a str
+
+    Pieces of bytes are decoded incrementally, since a multi-byte character
+    may be split between two of them.
+
+    '''
+    decoder = None
+    for chunk in chunks:
+        if not isinstance(chunk, str):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = decoder.decode(chunk)
+        yield chunk
+    if decoder is not None:
+        yield decoder.decode(b"", final=True)
+
+
+# a surrogate pair, any other \u escape, or a single character escape
+ESCAPE_PATTERN = re.compile(
+    r'\\u([dD][89abAB][0-9a-fA-F]{2})\\u([dD][c-fC-F][0-9a-fA-F]{2})|\\u([0-9a-fA-F]{4})|\\(.)', re.DOTALL)
+SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+def unescape(lexeme: str) -> str:
+    '''
+    Args:
+        lexeme: The (already validated) text between the quotes of a string
+
+    Returns:
+        str: The string the lexeme stands for, with every escape sequence
+        decoded. A \\u escape of a high surrogate followed by one of a low
+        surrogate becomes a single character, as in UTF-16
+
+    All escapes are replaced in one linear pass of the regular expression
+    engine, rather than by growing a buffer one character at a time.
+
+    '''
+    return ESCAPE_PATTERN.sub(_unescape_match, lexeme)
+
+
+def _unescape_match(match: 're.Match') -> str:
+    high, low, code, c = match.groups()
+    if high is not None:
+        return chr(0x10000 + ((int(high, 16) - 0xD800) << 10) + (int(low, 16) - 0xDC00))
+    if code is not None:
+        return chr(int(code, 16))
+    return SIMPLE_ESCAPES[c]
+
+
+def _has_control_character(lexeme: str) -> bool:
+    # same check as the loop engine's, only run on strings that are not printable
+    return any(unicodedata.category(c)[0] == "C" for c in lexeme)
+
+
+# matches either a whole string (possibly cut off by the end of the chunk, in
+# which case it has no closing quote group) or a single structural character
+# outside of a string
+STRUCTURE_PATTERN = re.compile(r'"' + LOOSE_STRING_BODY + r'(")?|[,\[\]{}]', re.DOTALL)
+# the rest of a string from somewhere inside it, and its closing quote if any
+STRING_TAIL_PATTERN = re.compile(LOOSE_STRING_BODY + r'(")?', re.DOTALL)
+
+
+def scan_string(text: str, i: int, escaped: bool = False) -> Tuple[Optional[int], bool]:
+    '''
+    Args:
+        text: A piece of a JSON text
+        i: An index inside a string in text, such as just past its opening
+            quote, or 0 for a string that began in an earlier piece
+        escaped: Whether text[i] follows a backslash at the end of the
+            earlier piece, and so is escaped
+
+    Returns:
+        tuple: The index just past the closing quote of the string (None if
+        the string goes on past the end of text), and whether the end of
+        text falls just after a backslash
+
+    '''
+    if escaped:
+        if i >= len(text):
+            return None, True
+        i += 1
+    match = STRING_TAIL_PATTERN.match(text, i)
+    if match.group(1) is not None:
+        return match.end(), False
+    # the pattern only stops short of the end at a backslash with nothing after it
+    return None, match.end() < len(text)
+
+
+def _last_cut(chunk: str, i: int, in_string: bool, escaped: bool) -> Tuple[int, bool, bool]:
+    # returns the index just past the last structural character of chunk
+    # outside of a string from i on (0 if there is none), and whether the
+    # end of chunk is inside a string, and just after a backslash in one
+    cut = 0
+    if in_string:
+        i, escaped = scan_string(chunk, i, escaped)
+        if i is None:
+            return cut, True, escaped
+    for match in STRUCTURE_PATTERN.finditer(chunk, i):
+        if chunk[match.start()] != '"':
+            cut = match.end()
+        elif match.group(1) is None:
+            # the string goes on in the next chunk
+            return cut, True, match.end() < len(chunk)
+    return cut, False, False
+
+
+def lex_chunks(chunks: Iterable[str], engine: str = DEFAULT_ENGINE, parse_float: NumberHook = None,
+               parse_int: NumberHook = None) -> Iterator['Token']:
+    '''
+    Args:
+        chunks: An iterable of consecutive pieces of a JSON text, such as the
+            blocks read from a file
+        engine: The lexer engine to use, see lex_iter
+        parse_float: See lex_iter
+        parse_int: See lex_iter
+
+    Returns:
+        iterator: A generator yielding the JSON tokens of the whole text
+
+    Tokens, escape sequences and numbers may straddle chunk boundaries. After
+    each chunk is read, the buffer is cut right after its last structural
+    character (a comma, bracket or brace outside of a string), since no token
+    can continue past that point. Everything before the cut is lexed and
+    discarded, and the rest is carried over to the next chunk, so the buffer
+    stays about one chunk in size no matter how large the document is.
+
+    '''
+    return _lex_chunks(chunks, 0, 1, engine, parse_float, parse_int)
+
+
+def _lex_chunks(chunks: Iterable[str], i: int, line_number: int, engine: str, parse_float: NumberHook,
+                parse_int: NumberHook, offset: int = 0, column: int = 1) -> Iterator['Token']:
+    # lexes the text of chunks from index i onward, where its first character
+    # is at offset, line_number and column of the whole text
+    chunks = iter(chunks)
+    buffer = ""
+    # the chunks read since the buffer was last cut, which are only joined to
+    # it once one of them has a structural character, and whether the scan
+    # for those is inside a string, just after a backslash in one
+    pending = []
+    in_string = escaped = False
+    # the characters at the start of the text that are not lexed
+    skip = i
+    try:
+        for chunk in chunks:
+            start = min(skip, len(chunk))
+            skip -= start
+            chunk_cut, in_string, escaped = _last_cut(chunk, start, in_string, escaped)
+            pending.append(chunk)
+            if chunk_cut == 0:
+                continue
+            buffer += "".join(pending)
+            pending = []
+            cut = len(buffer) - len(chunk) + chunk_cut
+            count = 0
+            try:
+                for token in _lex_from(buffer[:cut], i, 1, engine, parse_float, parse_int):
+                    yield token
+                    count += 1
+            except TokenError:
+                # the loop engine looks up to 4 characters ahead for the end of
+                # the text, so lex the piece again with those in place to raise
+                # the error the whole text would
+                while len(buffer) < cut + 4:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    buffer += chunk
+                tokens = _lex_from(buffer[:cut + 4], i, 1, engine, parse_float, parse_int)
+                for _ in range(count):
+                    next(tokens)
+                next(tokens, None)
+                raise
+            # keep the last character lexed, which the loop engine may report an error at
+            line_number, column = position(buffer, cut - 1, line_number, column)
+            offset += cut - 1
+            buffer = buffer[cut - 1:]
+            i = 1
+        buffer += "".join(pending)
+        yield from _lex_from(buffer, i, 1, engine, parse_float, parse_int)
+    except TokenError as error:
+        # the error was found within the buffer
+        error._relocate(offset, line_number, column)
+        raise
+
+
+STRING_PATTERN = re.compile(r'"' + LOOSE_STRING_BODY + r'"', re.DOTALL)
+WHITESPACE_PATTERN = re.compile(r'\s*')
+# like STRUCTURE_PATTERN, but only stops at brackets and braces
+CONTAINER_PATTERN = re.compile(r'"' + LOOSE_STRING_BODY + r'"|[\[\]{}]', re.DOTALL)
+SCALAR_END_PATTERN = re.compile(r'[\s,\]}]')
+
+
+def skip_value(text: str, i: int) -> int:
+    '''
+    Args:
+        text: A JSON text
+        i: The index of the first character of a value in text
+
+    Returns:
+        int: The index just past the end of that value
+
+    Only strings and brackets are matched, so the skipped value is not
+    otherwise checked to be valid JSON and no tokens are created for it.
+
+    '''
+    n = len(text)
+    if i >= n:
+        raise _error(text, i, 1, text[n-1:])
+    if text[i] == '"':
+        match = STRING_PATTERN.match(text, i)
+        if match is None:
+            raise _error(text, i, 1)
+        return match.end()
+    if text[i] not in "[{":
+        match = SCALAR_END_PATTERN.search(text, i)
+        return n if match is None else match.start()
+
+    depth = 0
+    for match in CONTAINER_PATTERN.finditer(text, i):
+        c = text[match.start()]
+        if c in "[{":
+            depth += 1
+        elif c in "]}":
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    raise _error(text, n, 1, text[n-1])
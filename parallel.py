@@ -0,0 +1,180 @@
+"""
+Title: JSON Parallel Array Parser
+Author: Brent Pappas
+"""
+
+import os
+import pickle
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple, Union
+
+from .decoder import decode
+from .lexer import (LOOSE_STRING_BODY, WHITESPACE_PATTERN, NumberHook,
+                    TokenError)
+from .parser_ import ParseError
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+_STRING = r'"' + LOOSE_STRING_BODY + r'"'
+# everything up to the next comma, bracket or brace outside of a string
+ELEMENT_PATTERN = re.compile(r'[^"\[\]{},]*(?:' + _STRING + r'[^"\[\]{},]*)*', re.DOTALL)
+# everything up to the next bracket or brace outside of a string, since
+# commas only separate elements of the top-level array
+NESTED_PATTERN = re.compile(r'[^"\[\]{}]*(?:' + _STRING + r'[^"\[\]{}]*)*', re.DOTALL)
+
+
+def split_array(text: str) -> Optional[List[Tuple[int, int]]]:
+    '''
+    Args:
+        text: A JSON text
+
+    Returns:
+        list: The (start, end) indices in text of each element of its
+        top-level array, including the whitespace around them, or None if
+        text is not a single array, or its brackets are not balanced
+
+    The text is only scanned for brackets, braces, commas and strings (with
+    their escape sequences), one run of other characters at a time, so the
+    elements themselves are not checked to be valid JSON.
+
+    '''
+    n = len(text)
+    i = WHITESPACE_PATTERN.match(text).end()
+    if i >= n or text[i] != "[":
+        return None
+
+    spans = []
+    depth = 1
+    i += 1
+    start = i
+    while True:
+        i = (ELEMENT_PATTERN if depth == 1 else NESTED_PATTERN).match(text, i).end()
+        if i >= n or text[i] == '"':
+            # unclosed brackets, or an unterminated string
+            return None
+        c = text[i]
+        if c in "[{":
+            depth += 1
+        elif c in "]}":
+            depth -= 1
+            if depth == 0:
+                if c != "]" or WHITESPACE_PATTERN.match(text, i + 1).end() < n:
+                    return None
+                # [] has no elements, but [ ] has an empty one
+                if i > start or spans:
+                    spans.append((start, i))
+                return spans
+        else:
+            spans.append((start, i))
+            start = i + 1
+        i += 1
+
+
+def parse_parallel(text: str, workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   parse_float: NumberHook = None, parse_int: NumberHook = None,
+                   max_depth: Optional[int] = None) -> Union[Dict, List, None]:
+    '''
+    Args:
+        text: The JSON text to parse, usually one large array
+        workers: The number of processes to parse with, or None to use one
+            process per CPU
+        chunk_size: The approximate number of characters of elements sent
+            to a worker process at a time
+        parse_float: See lexer.lex_iter
+        parse_int: See lexer.lex_iter
+        max_depth: See parser_.parse_iterative
+
+    Returns:
+        The parsed JSON, exactly as decoder.decode(text) would
+
+    The elements of the top-level array are grouped into chunks with
+    split_chunks, and each chunk is parsed as an array of its own by
+    a worker process. The chunks' elements are then joined back in order.
+    At most two chunks per worker are in flight at once.
+
+    Any other text, an array too small to be split into several chunks, or
+    hooks that cannot be pickled to send to the workers (such as lambdas)
+    are parsed in this process instead. So is the whole text whenever a
+    worker raises an error or the pool breaks, so that the same TokenError
+    or ParseError is raised as parsing it serially would.
+
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = None
+    if workers != 1 and len(text) >= 2 * chunk_size and _picklable(parse_float, parse_int):
+        chunks = split_chunks(text, chunk_size)
+    if chunks is None:
+        return decode(text, parse_float, parse_int, max_depth=max_depth)
+
+    limit = 2 * workers
+    result = []
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        try:
+            for start, end in chunks:
+                if len(pending) >= limit:
+                    result.extend(pending.popleft().result())
+                pending.append(pool.submit(_parse_chunk, text[start:end], parse_float, parse_int, max_depth))
+            while pending:
+                result.extend(pending.popleft().result())
+        except (TokenError, ParseError, BrokenProcessPool, pickle.PicklingError):
+            for future in pending:
+                future.cancel()
+            return decode(text, parse_float, parse_int, max_depth=max_depth)
+    return result
+
+
+def split_chunks(text: str, chunk_size: int) -> Optional[List[Tuple[int, int]]]:
+    '''
+    Args:
+        text: A JSON text
+        chunk_size: The least number of characters in each chunk but the last
+
+    Returns:
+        list: The (start, end) indices in text of runs of consecutive elements
+        of its top-level array, separated by single commas, or None if text
+        cannot be split into such runs (see split_array)
+
+    Each chunk can be parsed on its own by wrapping it in brackets. Arrays
+    with fewer than two elements, or with an empty element (a syntax error,
+    best reported by parsing the whole text), are not split.
+
+    '''
+    spans = split_array(text)
+    if spans is None or len(spans) < 2 or any(
+            WHITESPACE_PATTERN.match(text, start, end).end() == end for start, end in spans):
+        return None
+    return _chunked(spans, chunk_size)
+
+
+def _chunked(spans: List[Tuple[int, int]], chunk_size: int) -> List[Tuple[int, int]]:
+    # joins runs of consecutive elements into chunks of at least chunk_size characters
+    chunks = []
+    start = spans[0][0]
+    for _, end in spans:
+        if end - start >= chunk_size:
+            chunks.append((start, end))
+            start = end + 1
+    if start < spans[-1][1]:
+        chunks.append((start, spans[-1][1]))
+    return chunks
+
+
+def _picklable(*objects) -> bool:
+    try:
+        pickle.dumps(objects)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
+def _parse_chunk(chunk: str, parse_float: NumberHook, parse_int: NumberHook,
+                 max_depth: Optional[int]) -> List:
+    # runs in a worker process, so it must be a picklable module level function.
+    # The elements are wrapped in an array of their own, which nests them
+    # exactly as deep as the top-level array does
+    return decode("[" + chunk + "]", parse_float, parse_int, max_depth=max_depth)
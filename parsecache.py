@@ -0,0 +1,160 @@
+"""
+Title: JSON Parse Result Cache
+Author: Brent Pappas
+"""
+
+import hashlib
+import sys
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable, Tuple, Union
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_END = object()
+
+
+class ParseCache(object):
+    '''
+    Remembers the results of parsing recently seen JSON texts
+
+    Texts are looked up by a BLAKE2b digest of their contents, so the texts
+    themselves are not kept. The least recently used results are evicted
+    once the estimated size of all cached results exceeds max_bytes.
+
+    A cached result must not change when a caller modifies what it was
+    given. With frozen=True, results are cached (and returned) deeply frozen,
+    with objects as read-only MappingProxyType views and arrays as tuples,
+    so every hit returns the same object at no cost. With frozen=False,
+    every hit returns a fresh copy of the plain dicts and lists instead.
+
+    '''
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, frozen: bool = True) -> None:
+        self.max_bytes = max_bytes
+        self.frozen = frozen
+        # key -> (result, its estimated size in bytes)
+        self.entries: OrderedDict[Hashable, Tuple[Any, int]] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self) -> str:
+        return f"ParseCache({self.stats()})"
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, text: Union[str, bytes], parse: Callable[[Any], Any], options: Tuple = ()) -> Any:
+        '''
+        Args:
+            text: The JSON text (or UTF-8 encoded bytes) to look up
+            parse: Called with text to parse it on a miss
+            options: Anything else the result depends on, such as the
+                parse_float and parse_int hooks, which must be hashable
+
+        Returns:
+            The cached result for text and options, or else the result of
+            parse(text), which is then cached. Errors are never cached
+
+        '''
+        data = text.encode("utf-8", "surrogatepass") if isinstance(text, str) else text
+        key = (hashlib.blake2b(data, digest_size=16).digest(), options)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0] if self.frozen else _rebuild(entry[0], False, False)[0]
+
+        self.misses += 1
+        result = parse(text)
+        cached, size = _rebuild(result, self.frozen, True)
+        if size <= self.max_bytes:
+            self.entries[key] = (cached, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        # the copy of the result that was just cached is never handed out
+        return cached if self.frozen else result
+
+    @property
+    def hit_rate(self) -> float:
+        ''' The fraction of lookups that found a cached result '''
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+
+def freeze(obj: Any) -> Any:
+    ''' Returns a deeply frozen copy of a parsed JSON value, see ParseCache '''
+    return _rebuild(obj, True, False)[0]
+
+
+def _rebuild(obj: Any, frozen: bool, measure: bool) -> Tuple[Any, int]:
+    '''
+    Copies the dicts and lists of a parsed JSON value (freezing them if
+    frozen is set) and, if measure is set, estimates the size of the copy.
+    Structures are kept on an explicit stack, so any depth can be copied.
+    '''
+    size = 0
+    if not isinstance(obj, (dict, list)):
+        return obj, sys.getsizeof(obj) if measure else 0
+
+    # each frame holds whether it is a dict, an iterator over its members,
+    # the copy being built, and the key its current child goes under
+    stack = []
+
+    def open_structure(o):
+        nonlocal size
+        if measure:
+            size += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.append([True, iter(o.items()), {}, None])
+        else:
+            stack.append([False, iter(o), [], None])
+
+    open_structure(obj)
+    while True:
+        frame = stack[-1]
+        item = next(frame[1], _END)
+        if item is _END:
+            stack.pop()
+            value = frame[2]
+            if frozen:
+                value = MappingProxyType(value) if frame[0] else tuple(value)
+            if not stack:
+                return value, size
+            frame = stack[-1]
+        else:
+            if frame[0]:
+                frame[3], value = item
+                if measure:
+                    size += sys.getsizeof(frame[3])
+            else:
+                value = item
+            if isinstance(value, (dict, list)):
+                open_structure(value)
+                continue
+            if measure:
+                size += sys.getsizeof(value)
+        if frame[0]:
+            frame[2][frame[3]] = value
+        else:
+            frame[2].append(value)
@@ -3,28 +3,78 @@ Title: JSON Parser
 Author: Brent Pappas
 """
 
-from typing import Dict, List, Union
+import re
+from typing import Dict, Iterable, List, Optional, Union
 
-from .lexer import Tag, Token
+from .keycache import KeyCache
+from .lexer import (BYTES_TOKEN_PATTERN, TOKEN_PATTERN, WHITESPACE_PATTERN,
+                    ErrorPosition, Tag, Token, lex_bytes, lex_iter)
 
 
-class ParseError(Exception):
-    """ Class for parse errors """
+class ParseError(ErrorPosition, Exception):
+    '''
+    Class for parse errors, with a position once located (see locate)
+
+    Errors raised for a str, bytes or memory-mapped file are located in it.
+    A stream is no longer in memory by then, so errors raised while reading
+    one report the position of the start of the chunk that was being read,
+    which the error was found in or shortly before.
+    '''
 
-    def __init__(self, token: 'Token', expected: List[Tag], message="Parse error") -> None:
+    def __init__(self, token: Optional[Token], expected: List[Tag], message="Parse error") -> None:
         self.token = token
         self.expected = expected
         self.message = message
         super().__init__(self.message)
 
     def __str__(self) -> str:
-        return f"Parse error: Unexpected token {self.token.tag.name}. Expected one of {[t.name for t in self.expected]}"
+        found = "end of input" if self.token is None else f"token {self.token.tag.name}"
+        return f"Parse error: Unexpected {found}. Expected one of {[t.name for t in self.expected]}"
+
+    def __reduce__(self):
+        # keep errors picklable so they can cross process boundaries
+        return (self.__class__, (self.token, self.expected, self.message), self._position_state())
+
+
+class DepthError(ParseError):
+    """ Class for documents nested more deeply than allowed """
+
+    def __init__(self, token: Token, max_depth: int, message="Depth error") -> None:
+        self.max_depth = max_depth
+        super().__init__(token, [], message)
+
+    def __str__(self) -> str:
+        return f"{self.message}: Token {self.token.tag.name} nests deeper than {self.max_depth} levels"
+
+    def __reduce__(self):
+        return (self.__class__, (self.token, self.max_depth, self.message), self._position_state())
+
+
+class TrailingDataError(ParseError):
+    """ Class for tokens found after the end of a document that must be alone """
+
+    def __init__(self, token: Token, line_number: int, message="Trailing data error") -> None:
+        self._line_number = line_number
+        super().__init__(token, [], message)
+
+    def __str__(self) -> str:
+        return f"{self.message}: Unexpected token {self.token.tag.name} after the end of the document at line {self.line_number}"
 
+    def __reduce__(self):
+        return (self.__class__, (self.token, self.line_number, self.message), self._position_state())
 
-def parse(tokens: List['Token']) -> Union[Dict, List, None]:
+
+VALUE_TAGS = [Tag.LEFT_BRACKET, Tag.LEFT_BRACE,
+              Tag.LITERAL, Tag.NUMBER, Tag.BOOLEAN, Tag.NULL]
+
+
+def parse(tokens: Iterable[Token], key_cache: Optional[KeyCache] = None) -> Union[Dict, List, None]:
     '''
     Args:
-        tokens: A list of JSON lexical tokens
+        tokens: A list (or any other iterable, such as the generator returned
+            by lexer.lex_iter) of JSON lexical tokens
+        key_cache: A KeyCache used to intern object keys, so that equal keys
+            share one string object
 
     Returns:
         dict: A Python dictionary object containing the parsed JSON
@@ -35,35 +85,53 @@ def parse(tokens: List['Token']) -> Union[Dict, List, None]:
     function. It may be better to refactor this code in the future so that
     each of these functions may be individually unit tested
 
+    Tokens are consumed one at a time with a single token of lookahead, so
+    when fed a generator the parser's memory use depends on the nesting depth
+    of the document rather than on its size.
+
     '''
 
-    if tokens == []:
+    stream = iter(tokens)
+    lookahead = next(stream, None)
+
+    if lookahead is None:
         return None
 
-    def structure(tokens: List['Token']):
-        t = tokens[-1]
-        if t.tag not in [Tag.LEFT_BRACKET, Tag.LEFT_BRACE]:
+    def peek() -> Token:
+        return lookahead
+
+    def pop(expected: List[Tag]) -> Token:
+        nonlocal lookahead
+        t = lookahead
+        if t is None:
+            raise ParseError(None, expected)
+        lookahead = next(stream, None)
+        return t
+
+    def structure():
+        t = peek()
+        if t is None or t.tag not in [Tag.LEFT_BRACKET, Tag.LEFT_BRACE]:
             raise ParseError(t, [Tag.LEFT_BRACKET, Tag.LEFT_BRACE])
         elif t.tag == Tag.LEFT_BRACKET:
-            return array(tokens)
+            return array()
         elif t.tag == Tag.LEFT_BRACE:
-            return object_(tokens)
+            return object_()
 
-    def array(tokens: List['Token']):
+    def array():
         result = []
-        t = tokens.pop()
+        t = pop([Tag.LEFT_BRACKET])
         if t.tag != Tag.LEFT_BRACKET:
-            raise ParseError(t, Tag.LEFT_BRACKET)
+            raise ParseError(t, [Tag.LEFT_BRACKET])
 
-        t = tokens[-1]
+        t = peek()
         # check for empty array
-        if t.tag == Tag.RIGHT_BRACKET:
-            tokens.pop()
+        if t is not None and t.tag == Tag.RIGHT_BRACKET:
+            pop([Tag.RIGHT_BRACKET])
             return result
 
         while True:
-            result.append(value(tokens))
-            t = tokens.pop()
+            result.append(value())
+            t = pop([Tag.COMMA, Tag.RIGHT_BRACKET])
             if t.tag != Tag.COMMA:
                 break
 
@@ -72,25 +140,26 @@ def parse(tokens: List['Token']) -> Union[Dict, List, None]:
 
         return result
 
-    def object_(tokens: List['Token']):
+    def object_():
         result = {}
-        t = tokens.pop()
+        t = pop([Tag.LEFT_BRACE])
         if t.tag != Tag.LEFT_BRACE:
-            raise ParseError(t, Tag.LEFT_BRACE)
+            raise ParseError(t, [Tag.LEFT_BRACE])
 
-        t = tokens[-1]
-        # check for empty array
-        if t.tag == Tag.RIGHT_BRACE:
-            tokens.pop()
+        t = peek()
+        # check for empty object
+        if t is not None and t.tag == Tag.RIGHT_BRACE:
+            pop([Tag.RIGHT_BRACE])
             return result
 
         while True:
-            t = tokens.pop()
+            t = pop([Tag.OBJECT_KEY])
             if t.tag != Tag.OBJECT_KEY:
                 raise ParseError(t, [Tag.OBJECT_KEY])
-            result[t.lexeme] = value(tokens)
+            key = t.lexeme if key_cache is None else key_cache.intern(t.lexeme)
+            result[key] = value()
 
-            t = tokens.pop()
+            t = pop([Tag.COMMA, Tag.RIGHT_BRACE])
             if t.tag != Tag.COMMA:
                 break
 
@@ -99,20 +168,216 @@ def parse(tokens: List['Token']) -> Union[Dict, List, None]:
 
         return result
 
-    def value(tokens: List['Token']):
-        t = tokens.pop()
+    def value():
+        t = peek()
+        if t is None:
+            raise ParseError(t, VALUE_TAGS)
         if t.tag in [Tag.LEFT_BRACKET, Tag.LEFT_BRACE]:
-            tokens.append(t)
-            return structure(tokens)
-        elif t.tag == Tag.LITERAL:
+            return structure()
+        pop(VALUE_TAGS)
+        if t.tag == Tag.LITERAL:
             return t.lexeme
         elif t.tag in [Tag.NUMBER, Tag.BOOLEAN]:
             return t.value
         elif t.tag == Tag.NULL:
             return None
         else:
-            raise ParseError(t, [Tag.LEFT_BRACKET, Tag.LEFT_BRACE,
-                                 Tag.LITERAL, Tag.NUMBER, Tag.BOOLEAN, Tag.NULL])
+            raise ParseError(t, VALUE_TAGS)
+
+    return structure()
+
+
+def parse_iterative(tokens: Iterable[Token], key_cache: Optional[KeyCache] = None,
+                    max_depth: Optional[int] = None) -> Union[Dict, List, None]:
+    '''
+    Args:
+        tokens: An iterable of JSON lexical tokens
+        key_cache: See parse
+        max_depth: The deepest nesting of arrays and objects allowed, where
+            the outermost structure is at depth 1. Unlimited by default
+
+    Returns:
+        The parsed JSON, exactly as parse would
+
+    Rather than recursing for each nested structure, this keeps the
+    structures that are still open on an explicit stack. Documents of any
+    depth can be parsed in linear time without a RecursionError, and no
+    Python call frames are spent per value. A structure deeper than
+    max_depth raises a DepthError (a ParseError).
+
+    '''
+
+    # enum members are looked up once, as locals
+    LEFT_BRACKET, LEFT_BRACE, RIGHT_BRACKET, RIGHT_BRACE, OBJECT_KEY = (
+        Tag.LEFT_BRACKET, Tag.LEFT_BRACE, Tag.RIGHT_BRACKET, Tag.RIGHT_BRACE, Tag.OBJECT_KEY)
+    LITERAL, NUMBER, BOOLEAN, NULL, COMMA = (
+        Tag.LITERAL, Tag.NUMBER, Tag.BOOLEAN, Tag.NULL, Tag.COMMA)
+
+    stream = iter(tokens)
+    # keep one token of lookahead like parse does, so that tokens are lexed
+    # (and TokenErrors raised) at exactly the same points
+    lookahead = next(stream, None)
+
+    def pop(expected: List[Tag]) -> Token:
+        nonlocal lookahead
+        t = lookahead
+        if t is None:
+            raise ParseError(None, expected)
+        lookahead = next(stream, None)
+        return t
+
+    if lookahead is None:
+        return None
+    if lookahead.tag not in [LEFT_BRACKET, LEFT_BRACE]:
+        raise ParseError(lookahead, [LEFT_BRACKET, LEFT_BRACE])
+    t = pop([LEFT_BRACKET, LEFT_BRACE])
+
+    # the open structures, and for each the key its next value goes under
+    # (None for arrays)
+    stack = []
+    keys = []
+
+    while True:
+        # {invariant: t is the first token of a value, and was just popped}
+        tag = t.tag
+        if tag == LEFT_BRACKET or tag == LEFT_BRACE:
+            if max_depth is not None and len(stack) >= max_depth:
+                raise DepthError(t, max_depth)
+            if tag == LEFT_BRACKET:
+                t = pop(VALUE_TAGS)
+                if t.tag != RIGHT_BRACKET:
+                    stack.append([])
+                    keys.append(None)
+                    continue
+                v = []
+            else:
+                t = pop([OBJECT_KEY])
+                if t.tag == OBJECT_KEY:
+                    stack.append({})
+                    keys.append(t.lexeme if key_cache is None else key_cache.intern(t.lexeme))
+                    t = pop(VALUE_TAGS)
+                    continue
+                if t.tag != RIGHT_BRACE:
+                    raise ParseError(t, [OBJECT_KEY])
+                v = {}
+        elif tag == LITERAL:
+            v = t.lexeme
+        elif tag == NUMBER or tag == BOOLEAN:
+            v = t.value
+        elif tag == NULL:
+            v = None
+        else:
+            raise ParseError(t, VALUE_TAGS)
+
+        # store the value, and close every structure that ends with it
+        while True:
+            if not stack:
+                return v
+            key = keys[-1]
+            if key is None:
+                stack[-1].append(v)
+                closer = RIGHT_BRACKET
+            else:
+                stack[-1][key] = v
+                closer = RIGHT_BRACE
+            t = pop([COMMA, closer])
+            if t.tag == COMMA:
+                break
+            if t.tag != closer:
+                raise ParseError(t, [closer])
+            v = stack.pop()
+            keys.pop()
+
+        # {invariant: a comma was just consumed}
+        if keys[-1] is not None:
+            t = pop([OBJECT_KEY])
+            if t.tag != OBJECT_KEY:
+                raise ParseError(t, [OBJECT_KEY])
+            keys[-1] = t.lexeme if key_cache is None else key_cache.intern(t.lexeme)
+        t = pop(VALUE_TAGS)
 
-    # reverse tokens to support O(1) popping
-    return structure(tokens[::-1])
+
+def locate(error: ParseError, text: Union[str, bytes], max_depth: Optional[int] = None) -> None:
+    '''
+    Args:
+        error: A ParseError that parse_iterative raised for the tokens of text
+        text: The JSON text, or its UTF-8 encoding as bytes (or any other
+            object supporting the buffer protocol)
+        max_depth: The max_depth it was raised with
+
+    Sets the offset of error to the start of the token it was raised at (or
+    to the end of text, if the text ended too early), and lets its
+    line_number and column be counted from text when they are asked for.
+
+    The parser keeps no positions as it goes, so this is only paid for once
+    there is an error. Text is parsed again up to the error, counting the
+    tokens read, and the start of that token is found by matching tokens
+    with TOKEN_PATTERN. The offset is left None for the few tokens (other
+    than the first) that only the loop engine lexes, and errors that already
+    have one are left alone.
+
+    Bytes are parsed again with lexer.lex_bytes and matched with
+    BYTES_TOKEN_PATTERN, and only the bytes before the error are decoded, to
+    count the characters in them. They are decoded in full only if the
+    lexer had to decode them to read the tokens before the error.
+
+    '''
+    if error.offset is not None:
+        return
+    binary = not isinstance(text, str)
+    if error.token is None:
+        if binary:
+            text = str(text, "utf-8", "replace")
+        error._locate(text, len(text))
+        return
+
+    read = 0
+    ended = False
+
+    def counted(tokens: Iterable[Token]) -> Iterable[Token]:
+        nonlocal read, ended
+        for token in tokens:
+            read += 1
+            yield token
+        ended = True
+
+    # numbers are left unconverted, as only the tokens' tags matter
+    lexed = lex_bytes(text, str, str) if binary else lex_iter(text, parse_float=str, parse_int=str)
+    try:
+        parse_iterative(counted(lexed), max_depth=max_depth)
+    except ParseError:
+        pass
+    # the parser raises at the token before its lookahead, unless there is
+    # none left or it was the very first token
+    index = read - 1 if ended or read == 1 else read - 2
+
+    if binary:
+        i = _token_start(BYTES_TOKEN_PATTERN, text, index)
+        if i is not None:
+            prefix = str(text[:i], "utf-8", "replace")
+            error._locate(prefix, len(prefix))
+            return
+        # anything after the error that is not valid UTF-8 was never lexed
+        text = str(text, "utf-8", "replace")
+    if index == 0:
+        error._locate(text, WHITESPACE_PATTERN.match(text).end())
+        return
+    i = _token_start(TOKEN_PATTERN, text, index)
+    if i is not None:
+        error._locate(text, i)
+
+
+def _token_start(pattern: re.Pattern, text: Union[str, bytes], index: int) -> Optional[int]:
+    # returns the index in text of the start of its token at index, matching
+    # tokens with pattern, or None if the pattern does not match every token
+    # up to that one
+    i = 0
+    for k, match in enumerate(pattern.finditer(text)):
+        if match.start() != i:
+            return None
+        if k == index:
+            kind = match.lastindex
+            # the whitespace before the token is part of the match
+            return match.start(1 if kind == 2 else kind)
+        i = match.end()
+    return None
@@ -0,0 +1,342 @@
+"""
+Title: JSON Schema Compiled Parser
+Author: Brent Pappas
+"""
+
+import dataclasses
+import re
+import types
+import typing
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .decoder import END, WHITESPACE, _Fallback, decode
+from .lexer import (NUMBER_BODY, STRING_BODY, WHITESPACE_PATTERN, NumberHook,
+                    unescape)
+from .writer import escape_string
+
+# a number with neither a fraction nor an exponent, as the lexer reads them
+INT_BODY = r'-?[0-9]+(?![.eE\d])'
+# only the whitespace decoder.decode skips, so that any other falls back
+_WS = "[ \n\r\t]*"
+# the type of int | None, on versions of Python that have one
+UNION_TYPES = (Union, getattr(types, "UnionType", Union))
+
+
+class Record(object):
+    '''
+    The schema of a JSON object with exactly the keys of fields, each mapped
+    to the schema of its value. The values are passed, in the order of
+    fields, to into: dict builds a dict, tuple a tuple, and any other
+    callable (such as a class) is called with them as positional arguments.
+    '''
+
+    def __init__(self, fields: Dict[str, Any], into: Callable = dict) -> None:
+        self.fields = dict(fields)
+        self.into = into
+
+    def __repr__(self) -> str:
+        return f"Record({self.fields!r}, into={self.into!r})"
+
+
+class _Mismatch(Exception):
+    """ Raised when a parsed value does not fit the schema """
+
+
+# the generic parse marks each number with the kind of lexeme it came from,
+# so that the schema's hooks can be applied to it afterwards
+class _Int(str):
+    __slots__ = ()
+
+
+class _Float(str):
+    __slots__ = ()
+
+
+class SchemaParser(object):
+    '''
+    A parser specialized for JSON texts of one fixed layout
+
+    A schema is one of:
+
+        int, float, str, bool or None: A number without a fraction or
+            exponent, any number, a string, true or false, or null
+        Optional[schema]: null or a value of schema
+        [schema] or List[schema]: An array of values of schema
+        {key: schema, ...} or Record: An object with exactly these keys
+        A dataclass or NamedTuple class: An object with a key for each of
+            its fields (taking the field's type annotation as its schema),
+            built into an instance of the class
+
+    The top-level schema must be an array or object. Compiling the schema
+    turns each object into regular expressions that match its keys in order
+    along with the lexemes of its scalar values, so each run of scalar
+    members is matched at once and each value is decoded as the type its
+    schema expects. No tokens are created and nothing is dispatched on what
+    comes next. Values of float fields are always parsed with parse_float.
+
+    Any text that does not follow the schema exactly, down to key order, is
+    parsed by decoder.decode instead, which raises the same TokenError or
+    ParseError as load_json_string would. If the parsed value still fits the
+    schema (its keys were just in another order, say) it is built as the
+    schema describes. Otherwise the plain dicts and lists are returned as
+    they are. The fallbacks attribute counts the texts that were handed over.
+
+    '''
+
+    def __init__(self, schema: Any, parse_float: NumberHook = None, parse_int: NumberHook = None) -> None:
+        self.schema = schema
+        self.parse_float = parse_float
+        self.parse_int = parse_int
+        self.fallbacks = 0
+        if not isinstance(_normalize(schema), (list, Record)):
+            raise TypeError(f"The top-level schema must be an array or object, not {schema!r}")
+        self._parse, self._convert = self._compile(schema)
+
+    def __repr__(self) -> str:
+        return f"SchemaParser({self.schema!r})"
+
+    def parse(self, text: str) -> Any:
+        '''
+        Args:
+            text: The JSON text to parse
+
+        Returns:
+            The parsed JSON, built as the schema describes if it fits
+
+        '''
+        skip = WHITESPACE_PATTERN.match
+        try:
+            # see decoder.decode
+            i = skip(text).end()
+            result, i = self._parse(text + END, i)
+            if skip(text, i).end() == len(text):
+                return result
+        except _Fallback:
+            pass
+
+        self.fallbacks += 1
+        value = decode(text, _Float, _Int)
+        try:
+            return self._convert(value)
+        except _Mismatch:
+            return decode(text, self.parse_float, self.parse_int)
+
+    __call__ = parse
+
+    def _compile(self, schema: Any) -> Tuple[Callable, Callable]:
+        # returns the function parsing a value of schema from text at i, and
+        # the one building a value of schema from its generic parse
+        schema = _normalize(schema)
+        skip = WHITESPACE_PATTERN.match
+
+        scalar = self._scalar(schema)
+        if scalar is not None:
+            pattern, from_lexeme, convert = scalar
+            match_scalar = re.compile("(" + pattern + ")").match
+
+            def parse(text: str, i: int):
+                match = match_scalar(text, i)
+                if match is None:
+                    raise _Fallback
+                return from_lexeme(match.group(1)), match.end()
+
+        elif isinstance(schema, _Optional):
+            # null or an array or object: whatever follows null is checked by
+            # the enclosing array or object, as after any other value
+            parse_value, convert_value = self._compile(schema.schema)
+
+            def parse(text: str, i: int):
+                if text.startswith("null", i):
+                    return None, i + 4
+                return parse_value(text, i)
+
+            def convert(value: Any):
+                return None if value is None else convert_value(value)
+
+        elif isinstance(schema, list):
+            parse_item, convert_item = self._compile(schema[0])
+
+            def parse(text: str, i: int):
+                if text[i] != "[":
+                    raise _Fallback
+                i += 1
+                result = []
+                if text[i] in WHITESPACE:
+                    i = skip(text, i).end()
+                if text[i] == "]":
+                    return result, i + 1
+
+                while True:
+                    v, i = parse_item(text, i)
+                    result.append(v)
+                    if text[i] in WHITESPACE:
+                        i = skip(text, i).end()
+                    c = text[i]
+                    if c == ",":
+                        i += 1
+                        if text[i] in WHITESPACE:
+                            i = skip(text, i).end()
+                    elif c == "]":
+                        return result, i + 1
+                    else:
+                        raise _Fallback
+
+            def convert(value: Any):
+                if type(value) is not list:
+                    raise _Mismatch
+                return [convert_item(v) for v in value]
+
+        else:
+            keys = list(schema.fields)
+            into = schema.into
+            if into is dict:
+                build = lambda values: dict(zip(keys, values))
+            elif into is tuple:
+                build = tuple
+            else:
+                build = lambda values: into(*values)
+
+            # the object is matched in segments. Each segment is a regular
+            # expression matching everything from the end of the last array or
+            # object value up to the start of the next one, capturing the
+            # lexemes of the scalar values in between, followed by the
+            # function parsing that next value (None after the last one)
+            segments = []
+            pattern = r"\{"
+            from_lexemes = []
+            converters = []
+            for k, (key, field) in enumerate(schema.fields.items()):
+                if k > 0:
+                    pattern += _WS + ","
+                pattern += _WS + re.escape(escape_string(key)) + _WS + ":" + _WS
+                scalar = self._scalar(_normalize(field))
+                if scalar is not None:
+                    pattern += "(" + scalar[0] + ")"
+                    from_lexemes.append(scalar[1])
+                    converters.append(scalar[2])
+                else:
+                    parse_value, convert_value = self._compile(field)
+                    segments.append((re.compile(pattern).match, from_lexemes, parse_value))
+                    converters.append(convert_value)
+                    pattern = ""
+                    from_lexemes = []
+            segments.append((re.compile(pattern + _WS + r"\}").match, from_lexemes, None))
+
+            def parse(text: str, i: int):
+                values = []
+                for match_segment, from_lexemes, parse_value in segments:
+                    match = match_segment(text, i)
+                    if match is None:
+                        raise _Fallback
+                    i = match.end()
+                    if from_lexemes:
+                        values += [f(lexeme) for f, lexeme in zip(from_lexemes, match.groups())]
+                    if parse_value is not None:
+                        v, i = parse_value(text, i)
+                        values.append(v)
+                return build(values), i
+
+            def convert(value: Any):
+                if type(value) is not dict or len(value) != len(keys):
+                    raise _Mismatch
+                try:
+                    return build([c(value[key]) for key, c in zip(keys, converters)])
+                except KeyError:
+                    raise _Mismatch
+
+        return parse, convert
+
+    def _scalar(self, schema: Any) -> Optional[Tuple[str, Callable, Callable]]:
+        # returns a regular expression (without groups) matching the lexeme of
+        # a value of schema, the function decoding such a lexeme, and the one
+        # building the value from its generic parse, or None if schema is not
+        # a scalar or an optional scalar
+        to_int = self.parse_int or int
+        to_float = self.parse_float or float
+
+        if schema is int:
+            def convert(value: Any):
+                if type(value) is not _Int:
+                    raise _Mismatch
+                return to_int(value)
+            return INT_BODY, to_int, convert
+
+        elif schema is float:
+            def convert(value: Any):
+                if type(value) is not _Float and type(value) is not _Int:
+                    raise _Mismatch
+                return to_float(value)
+            return NUMBER_BODY, to_float, convert
+
+        elif schema is str:
+            def from_lexeme(lexeme: str):
+                lexeme = lexeme[1:-1]
+                if not lexeme.isprintable():
+                    raise _Fallback
+                if "\\" in lexeme:
+                    lexeme = unescape(lexeme)
+                return lexeme
+
+            def convert(value: Any):
+                if type(value) is not str:
+                    raise _Mismatch
+                return value
+            return '"' + STRING_BODY + '"', from_lexeme, convert
+
+        elif schema is bool:
+            def convert(value: Any):
+                if type(value) is not bool:
+                    raise _Mismatch
+                return value
+            return "true|false", "true".__eq__, convert
+
+        elif schema is None:
+            def convert(value: Any):
+                if value is not None:
+                    raise _Mismatch
+                return None
+            return "null", lambda lexeme: None, convert
+
+        elif isinstance(schema, _Optional):
+            scalar = self._scalar(_normalize(schema.schema))
+            if scalar is None:
+                return None
+            pattern, from_value_lexeme, convert_value = scalar
+            return ("null|" + pattern,
+                    lambda lexeme: None if lexeme == "null" else from_value_lexeme(lexeme),
+                    lambda value: None if value is None else convert_value(value))
+        return None
+
+
+class _Optional(object):
+    def __init__(self, schema: Any) -> None:
+        self.schema = schema
+
+
+def _normalize(schema: Any) -> Any:
+    # returns schema as one of int, float, str, bool, None, an _Optional, a
+    # list of one item schema, or a Record
+    if schema is type(None):
+        return None
+    if schema in (int, float, str, bool, None) or isinstance(schema, (_Optional, Record)):
+        return schema
+    if isinstance(schema, list) and len(schema) == 1:
+        return schema
+    if isinstance(schema, dict):
+        return Record(schema)
+
+    origin = typing.get_origin(schema)
+    args = typing.get_args(schema)
+    if origin in (list, List) and len(args) == 1:
+        return [args[0]]
+    if origin in UNION_TYPES and len(args) == 2 and type(None) in args:
+        return _Optional(args[0] if args[1] is type(None) else args[1])
+
+    if isinstance(schema, type):
+        if dataclasses.is_dataclass(schema):
+            hints = typing.get_type_hints(schema)
+            return Record({f.name: hints[f.name] for f in dataclasses.fields(schema) if f.init}, schema)
+        if issubclass(schema, tuple) and hasattr(schema, "_fields"):
+            hints = typing.get_type_hints(schema)
+            return Record({name: hints[name] for name in schema._fields}, schema)
+    raise TypeError(f"Unsupported schema {schema!r}")
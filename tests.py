@@ -1,8 +1,67 @@
+import asyncio
+import gzip
+import importlib
+import io
+import json
+import os
+import pickle
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, List, NamedTuple, Optional
 
-from lexer import (Boolean, Literal, Number, ObjectKey, Tag, Token, TokenError,
-                   lex)
-from parser_ import parse
+import benchmark
+from aio import load_async, load_async_stream
+from decoder import decode
+from documents import check_end, iter_documents
+from events import events
+from extract import extract
+from incremental import IncrementalDocument
+from instrument import ParseStats, load_instrumented
+from jsonl import iter_jsonl, load_jsonl_file
+from keycache import KeyCache
+from lazy import LazyArray, LazyObject, build_tape, load_lazy
+from lexer import (ENGINES, Boolean, Literal, Number, ObjectKey, Tag, Token,
+                   TokenError, convert_number, lex, lex_bytes, lex_chunks,
+                   lex_compact, lex_iter, position)
+from parallel import parse_parallel, split_array
+from parsecache import ParseCache, freeze
+from parser_ import (VALUE_TAGS, DepthError, ParseError, TrailingDataError,
+                     locate, parse, parse_iterative)
+from schema import Record, SchemaParser
+from validator import validate
+from writer import encode, escape_string, iter_encode
+
+# the package's own entry points, which can only be imported as part of it
+package = importlib.import_module(__package__)
+
+# malformed texts, and the error parse(lex_iter(text)) raises for each
+FAILURE_CASES = [
+    ('[1,]', ParseError),
+    ('[1, 2, 3,]', ParseError),
+    ('{"a" 1}', ParseError),
+    ('["a": 1]', ParseError),
+    ('[{]}', ParseError),
+    ('[1, [2, 3}, 4]', ParseError),
+    ('[1, 2', ParseError),
+    ('"a"', ParseError),
+    ('[tru]', TokenError),
+    ('[1, 2, tru]', TokenError),
+    ('["\x01"]', TokenError),
+    ('[1] x', TokenError),
+]
+
+
+def assert_fails_like_parse(test: unittest.TestCase, load: Callable[[str], Any]) -> None:
+    ''' Checks that load raises the same error as parse(lex_iter(text)) for each of FAILURE_CASES '''
+    for text, error in FAILURE_CASES:
+        with test.assertRaises(error) as cm:
+            load(text)
+        with test.assertRaises(error) as expected:
+            parse(lex_iter(text))
+        test.assertEqual(str(cm.exception), str(expected.exception))
 
 
 class LexerTest(unittest.TestCase):
@@ -20,6 +79,20 @@ class LexerTest(unittest.TestCase):
         self.assertEqual(lex(s), [Number(100), Number(2100.0), Number(
             0.0003), Number(100), Number(2100.0), Number(0.0003)])
 
+    def test_lex_exact_numbers(self):
+        s = "0.1 1e400 -0.0 12345678901234567890123 1.7976931348623157e308"
+        for engine in ["scan", "loop"]:
+            self.assertEqual(lex(s, engine), [Number(0.1), Number(float("inf")), Number(-0.0), Number(
+                12345678901234567890123), Number(1.7976931348623157e308)])
+
+    def test_lex_number_hooks(self):
+        s = "0.1 -2.50e1 7"
+        for engine in ["scan", "loop"]:
+            self.assertEqual(lex(s, engine, parse_float=Decimal),
+                             [Number(Decimal("0.1")), Number(Decimal("-25.0")), Number(7)])
+            self.assertEqual(lex(s, engine, parse_int=str),
+                             [Number(0.1), Number(-25.0), Number("7")])
+
     def test_lex_negatives(self):
         s = "-123 -45.6 -3e-4"
         # this may just be a quirk of the way this works, but
@@ -102,12 +175,20 @@ class LexerTest(unittest.TestCase):
         return self.assertEqual(lex(s), [
             Literal("a"),
             Literal("abc"),
-            Literal("ab\\b"),
-            Literal("\\t\\f\\n"),
-            Literal("\\u1234"),
-            Literal("ab\\b\\u0F9atest")
+            Literal("ab\b"),
+            Literal("\t\f\n"),
+            Literal("\u1234"),
+            Literal("ab\b\u0F9atest")
         ])
 
+    def test_lex_literal_escapes(self):
+        s = r'"\/\"\\ \ud83d\ude00 \ud83d \uDC00 \u00e9" "no escapes"'
+        for engine in ["scan", "loop"]:
+            self.assertEqual(lex(s, engine), [
+                Literal('/"\\ \U0001f600 \ud83d \udc00 \u00e9'),
+                Literal("no escapes")
+            ])
+
     def test_fail_lex_literal(self):
         tests = ["\\", "\"", "\\u1", "\\x", "\\uGGGG"
                  '''
@@ -133,10 +214,10 @@ class LexerTest(unittest.TestCase):
         return self.assertEqual(lex(s), [
             ObjectKey("a"),
             ObjectKey("abc"),
-            ObjectKey("ab\\b"),
-            ObjectKey("\\t\\f\\n"),
-            ObjectKey("\\u1234"),
-            ObjectKey("ab\\b\\u0F9atest")
+            ObjectKey("ab\b"),
+            ObjectKey("\t\f\n"),
+            ObjectKey("\u1234"),
+            ObjectKey("ab\b\u0F9atest")
         ])
 
     def test_fail_lex_object_key(self):
@@ -178,6 +259,154 @@ class LexerTest(unittest.TestCase):
             Token(Tag.RIGHT_BRACE)
         ])
 
+    def test_convert_number(self):
+        for lexeme, expected in [("0", 0), ("-12", -12), ("1.5", "1.5"), ("-1e2", "-1e2"), ("2E-3", "2E-3")]:
+            self.assertEqual(convert_number(lexeme, int, str), expected)
+
+    def test_lex_engines(self):
+        tests = [
+            '{"a": [1, -2, 3.5, 1e2, -3E-4, 0.], "b" \n : "c\\"\\u12aF"}',
+            '[true, false, null, "caf\u00e9"]', '1e2,3', '-123-45.6', '  ',
+            '"a\nb"', '"\\x"', '1e', '1.5e+', '-', 'tru', 'nul', ':', '[1.2.3]',
+            '[{"a\\n": 1}, {"a\\n": "\x01"}]', '[{"\x01": 1}]'
+        ]
+        for test in tests:
+            try:
+                expected = lex(test, engine="loop")
+            except TokenError as e:
+                with self.assertRaises(TokenError) as cm:
+                    lex(test, engine="scan")
+                self.assertEqual((cm.exception.character, cm.exception.line_number),
+                                 (e.character, e.line_number))
+            else:
+                self.assertEqual(lex(test, engine="scan"), expected)
+
+    def test_lex_shared_keys(self):
+        tokens = lex('[{"a": 1, "b": 2}, {"b": 3, "a": 4}]')
+        self.assertIs(tokens[2], tokens[13])
+        self.assertIs(tokens[5], tokens[10])
+        self.assertEqual(tokens[2], ObjectKey("a"))
+
+    def test_lex_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            lex("[]", engine="nope")
+
+    def test_lex_iter(self):
+        s = '{"a": [1, 2.5, true, null], "b": "c"}'
+        tokens = lex_iter(s)
+        self.assertIsInstance(next(tokens), Token)
+        self.assertEqual([Token(Tag.LEFT_BRACE)] + list(tokens), lex(s))
+
+    def test_lex_chunks(self):
+        s = '{"a": [1, 23.5, -4, "x\\u0041\\"y", "[{,"], "b"\n :\n {"c": null}}'
+        for size in range(1, len(s) + 1):
+            chunks = [s[i:i + size] for i in range(0, len(s), size)]
+            self.assertEqual(list(lex_chunks(chunks)), lex(s))
+        # a string spanning many chunks, with escapes split across them
+        s = '["' + 'ab\\\\\\"' * 20 + '", 1]'
+        for size in range(1, 8):
+            chunks = [s[i:i + size] for i in range(0, len(s), size)]
+            self.assertEqual(list(lex_chunks(chunks)), lex(s))
+
+    def test_fail_lex_chunks(self):
+        with self.assertRaises(TokenError) as cm:
+            list(lex_chunks(['[1,\n2,\n', '3,\n "a\n"]']))
+        self.assertEqual(cm.exception.line_number, 4)
+
+    def test_fail_lex_chunks_same_error(self):
+        for s in ['[1, t]', ' t-]"}{', '[false, 3]x', 'u]']:
+            with self.assertRaises(TokenError) as expected:
+                lex(s)
+            for size in range(1, len(s) + 1):
+                chunks = [s[i:i + size] for i in range(0, len(s), size)]
+                with self.assertRaises(TokenError) as cm:
+                    list(lex_chunks(chunks))
+                self.assertEqual(cm.exception.character, expected.exception.character)
+
+    def test_lex_compact(self):
+        s = '{"a": [1, -2.5e3, "x\\u00e9", true, false, null],\n "b" : {}}'
+        tokens = lex_compact(s)
+        self.assertEqual(list(tokens), lex(s))
+        self.assertEqual(len(tokens), 20)
+        self.assertEqual(tokens[-1], Token(Tag.RIGHT_BRACE))
+        self.assertEqual(tokens[7], Literal("x\u00e9"))
+        self.assertEqual(tokens.tag(1), Tag.OBJECT_KEY)
+        self.assertEqual(s[slice(*tokens.span(1))], '"a"')
+        self.assertEqual(s[slice(*tokens.span(5))], '-2.5e3')
+        self.assertEqual(tokens.line_number(16), 2)
+        self.assertEqual(parse(tokens), parse(lex(s)))
+        self.assertEqual(lex_compact("[1.5]", parse_float=Decimal)[1], Number(Decimal("1.5")))
+        with self.assertRaises(IndexError):
+            tokens[20]
+
+    def test_lex_compact_tail(self):
+        # only the loop engine lexes -true, as a boolean
+        tokens = lex_compact('[1, -true]')
+        self.assertEqual(list(tokens), lex('[1, -true]', engine="loop"))
+        self.assertEqual(tokens.tag(3), Tag.BOOLEAN)
+        self.assertIsNone(tokens.span(-1))
+
+    def test_fail_lex_compact(self):
+        for s in ['[1,\n2,\n@]', '["a\x01"]', '[1.2.3]', 'nul']:
+            with self.assertRaises(TokenError) as expected:
+                lex(s)
+            with self.assertRaises(TokenError) as cm:
+                lex_compact(s)
+            self.assertEqual(str(cm.exception), str(expected.exception))
+
+    def test_token_slots(self):
+        for token in lex('{"a": [1, true, null]}'):
+            self.assertFalse(hasattr(token, "__dict__"))
+
+    def test_lex_bytes(self):
+        s = '{"a": [1, 23.5, -4e2, "x\\u0041\\"y", "caf\u00e9 \U0001f600"], "b"\n :\n {"c": null}}'
+        data = s.encode("utf-8")
+        for buffer in [data, bytearray(data), memoryview(data)]:
+            self.assertEqual(list(lex_bytes(buffer)), lex(s))
+        # whitespace only the str lexer skips before a colon
+        for s in ['{"a"\x1c: 1}', '{"a" \u00a0: 1}', '{"a"\u2028:1}']:
+            self.assertEqual(list(lex_bytes(s.encode("utf-8"))), lex(s))
+            validate(s.encode("utf-8"))
+        # digits only the str lexer reads as part of a number
+        for s in ['[1\u0663]', '[1.5\u0663, 2]', '{"a": -2\uff11}']:
+            self.assertEqual(list(lex_bytes(s.encode("utf-8"))), lex(s))
+            validate(s.encode("utf-8"))
+        self.assertEqual(list(lex_bytes(b"[1.5]", parse_float=Decimal)), [
+            Token(Tag.LEFT_BRACKET), Number(Decimal("1.5")), Token(Tag.RIGHT_BRACKET)
+        ])
+
+    def test_fail_lex_bytes(self):
+        for s in ['[1,\n2,\n@]', '["\u00e9\n", \u00e9]', '["a\x01"]', '[1,\u00a0 2]', 'nul', '1.2.3']:
+            try:
+                expected = lex(s)
+            except TokenError as e:
+                with self.assertRaises(TokenError) as cm:
+                    list(lex_bytes(s.encode("utf-8")))
+                self.assertEqual((cm.exception.character, cm.exception.line_number),
+                                 (e.character, e.line_number))
+            else:
+                self.assertEqual(list(lex_bytes(s.encode("utf-8"))), expected)
+        with self.assertRaises(UnicodeDecodeError):
+            list(lex_bytes(b'["\xff"]'))
+
+    def test_token_error_position(self):
+        s = '["caf\u00e9",\n  1,\n  "\u00e9\u00e9", @]'
+        errors = []
+        for engine in ENGINES:
+            with self.assertRaises(TokenError) as cm:
+                lex(s, engine=engine)
+            errors.append(cm.exception)
+        for size in [1, 3, len(s)]:
+            with self.assertRaises(TokenError) as cm:
+                list(lex_chunks([s[i:i + size] for i in range(0, len(s), size)]))
+            errors.append(cm.exception)
+        with self.assertRaises(TokenError) as cm:
+            list(lex_bytes(s.encode("utf-8")))
+        errors.append(cm.exception)
+        for error in errors + [pickle.loads(pickle.dumps(errors[0]))]:
+            self.assertEqual((error.offset, error.line_number, error.column), (s.index("@"), 3, 9))
+        self.assertEqual(position(s, s.index("@")), (3, 9))
+
 
 class ParserTest(unittest.TestCase):
 
@@ -270,6 +499,926 @@ class ParserTest(unittest.TestCase):
         ]:
             self.assertEqual(parse(lex(test)), expected)
 
+    def test_parse_iterative(self):
+        tests = ['', '[]', '{}', '[null, ["test", 123, null], [], [[]]]',
+                 '{"a": {"b": [1, {"c": true}]}, "a": [], "d": "e"}']
+        for test in tests:
+            self.assertEqual(parse_iterative(lex(test)), parse(lex(test)))
+
+    def test_fail_parse_iterative(self):
+        tests = ['1', '[1 2]', '{"a": 1,}', '[1,', '{"a" 1}', '["a": 1]',
+                 '{,}', '[}', '{"a": 1]', '[1] x']
+        for test in tests:
+            with self.assertRaises((ParseError, TokenError)) as cm:
+                parse(lex_iter(test))
+            with self.assertRaises(type(cm.exception)) as cm_iterative:
+                parse_iterative(lex_iter(test))
+            self.assertEqual(str(cm_iterative.exception), str(cm.exception))
+
+    def test_parse_iterative_deep(self):
+        depth = 100000
+        result = parse_iterative(lex_iter("[" * depth + "]" * depth))
+        for _ in range(depth - 1):
+            result = result[0]
+        self.assertEqual(result, [])
+
+    def test_parse_iterative_max_depth(self):
+        self.assertEqual(parse_iterative(lex('[{"a": []}]'), max_depth=3), [{"a": []}])
+        for test in ['[{"a": []}]', '[{"a": [1]}]', '{"a": {"b": {}}}']:
+            with self.assertRaises(DepthError):
+                parse_iterative(lex(test), max_depth=2)
+
+    def test_parse_token_stream(self):
+        s = '{"name": "brent", "interests": [["juggling"], {"key": null}]}'
+        self.assertEqual(parse(lex_iter(s)), parse(lex(s)))
+
+    def test_parse_fail_end_of_input(self):
+        for test in ['[', '[1,', '{"a":', '{"a": 1', '[[]']:
+            with self.assertRaises(ParseError):
+                parse(lex_iter(test))
+
+    def test_locate(self):
+        for test, offset, max_depth in [
+            ('[1 2]', 3, None), ('{"a":\n 1,\n "b" 2}', 11, None), ('[1,', 3, None),
+            ('\n 5', 2, None), ('[[1], [[]]]', 7, 2), ('[1, -true 2]', None, None),
+        ]:
+            with self.assertRaises(ParseError) as cm:
+                parse_iterative(lex_iter(test), max_depth=max_depth)
+            self.assertIsNone(cm.exception.offset)
+            locate(cm.exception, test, max_depth)
+            self.assertEqual(cm.exception.offset, offset)
+            if offset is not None:
+                self.assertEqual((cm.exception.line_number, cm.exception.column), position(test, offset))
+        # bytes are located in characters, as lex_bytes locates token errors
+        for data in [b'["\xc3\xa9",\n 1 2]', memoryview(b'["\xc3\xa9",\n 1 2] \xff')]:
+            with self.assertRaises(ParseError) as cm:
+                parse_iterative(lex_bytes(data[:12]))
+            locate(cm.exception, data)
+            self.assertEqual((cm.exception.offset, cm.exception.line_number, cm.exception.column), (9, 2, 4))
+        # whitespace the bytes pattern does not match is decoded first
+        data = '[1,\u2028 2 3]'.encode("utf-8")
+        with self.assertRaises(ParseError) as cm:
+            parse_iterative(lex_bytes(data))
+        locate(cm.exception, data)
+        self.assertEqual((cm.exception.offset, cm.exception.line_number, cm.exception.column), (7, 1, 8))
+        cm.exception.line_number = 5
+        self.assertEqual((cm.exception.line_number, cm.exception.column), (5, 8))
+        with self.assertRaises(ParseError) as cm:
+            decode('{"a":\n 1,\n "b" 2}')
+        error = pickle.loads(pickle.dumps(cm.exception))
+        self.assertEqual((error.offset, error.line_number, error.column), (11, 3, 2))
+
+
+class DecoderTest(unittest.TestCase):
+
+    def test_decode(self):
+        tests = ['', '  ', '[]', '{}', '[1, -2, 3.5, 1e2, true, false, null]',
+                 '{"a" \n : {"b": ["c\\"", {}]}, "d": "\\u00e9"}',
+                 '[1] [2]', '[-true]']
+        for test in tests:
+            self.assertEqual(decode(test), parse(lex(test)))
+
+    def test_decode_deep(self):
+        depth = 10000
+        result = decode('{"a": ' * depth + '1' + '}' * depth)
+        for _ in range(depth):
+            result = result["a"]
+        self.assertEqual(result, 1)
+
+    def test_decode_max_depth(self):
+        self.assertEqual(decode('[[1], {"a": 2}]', max_depth=2), [[1], {"a": 2}])
+        with self.assertRaises(DepthError):
+            decode('[[1], {"a": {}}]', max_depth=2)
+
+    def test_decode_number_hooks(self):
+        s = '{"price": 19.99, "id": 12345678901234567890}'
+        self.assertEqual(decode(s, parse_float=Decimal),
+                         {"price": Decimal("19.99"), "id": 12345678901234567890})
+
+    def test_decode_hook_errors(self):
+        calls = []
+
+        def parse_int(lexeme):
+            # errors raised by a hook are not taken for the end of the text
+            calls.append(lexeme)
+            raise IndexError(lexeme)
+        for load in [lambda s: decode(s, parse_int=parse_int), SchemaParser([int], parse_int=parse_int)]:
+            del calls[:]
+            with self.assertRaises(IndexError):
+                load('[1, 2]')
+            self.assertEqual(calls, ["1"])
+
+    def test_fail_decode(self):
+        tests = ['[1 2]', '{"a": 1,}', '[1,', '{"a" 1}', '["a": 1]', '1',
+                 '[tru]', '["a\nb"]', '[1] x', '{"a": 1e}']
+        for test in tests:
+            try:
+                parse(lex(test))
+            except (TokenError, ParseError) as e:
+                with self.assertRaises(type(e)) as cm:
+                    decode(test)
+                self.assertEqual(str(cm.exception), str(e))
+            else:
+                self.fail(f"{test!r} should not parse")
+
+
+class KeyCacheTest(unittest.TestCase):
+
+    s = '''[
+        {"id": 1, "name": "a", "tags": {"id": 2}},
+        {"id": 3, "name": "b", "tags": {"id": 4}},
+        {"id": 5, "other": "c"},
+        {"id": 6}
+    ]'''
+
+    def test_decode_key_cache(self):
+        cache = KeyCache()
+        result = decode(self.s, key_cache=cache)
+        self.assertEqual(result, decode(self.s))
+        self.assertIs(list(result[0])[0], list(result[3])[0])
+        self.assertEqual(cache.stats()["keys"], 4)
+        self.assertEqual(cache.shape_hits, 1)
+        self.assertEqual(cache.key_hits + cache.key_misses, 11)
+
+    def test_parse_key_cache(self):
+        cache = KeyCache()
+        result = parse(lex(self.s), cache)
+        self.assertEqual(result, decode(self.s))
+        self.assertIs(list(result[0])[1], list(result[1])[1])
+        self.assertEqual(cache.hit_rate, 7 / 11)
+
+
+class ParseCacheTest(unittest.TestCase):
+
+    s = '{"a": [1, {"b": null}, "c"], "d": 2.5}'
+
+    def test_frozen(self):
+        cache = ParseCache()
+        first = cache.get(self.s, decode)
+        self.assertIs(cache.get(self.s, decode), first)
+        self.assertEqual(first["a"], (1, {"b": None}, "c"))
+        with self.assertRaises(TypeError):
+            first["a"][1]["b"] = 1
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_frozen_round_trip(self):
+        cache = ParseCache()
+        frozen = cache.get(self.s, decode)
+        self.assertEqual(decode(encode(frozen)), decode(self.s))
+        self.assertEqual(decode(encode(frozen, indent=2)), decode(self.s))
+        self.assertEqual(decode(encode(load_lazy(self.s))), decode(self.s))
+
+    def test_copy(self):
+        cache = ParseCache(frozen=False)
+        first = cache.get(self.s, decode)
+        first["a"][1]["b"] = 1
+        second = cache.get(self.s, decode)
+        self.assertEqual(second, decode(self.s))
+        self.assertIsNot(second["a"], cache.get(self.s, decode)["a"])
+
+    def test_options(self):
+        cache = ParseCache()
+        self.assertEqual(cache.get(self.s, decode)["d"], 2.5)
+        parse_decimal = lambda text: decode(text, parse_float=Decimal)
+        self.assertEqual(cache.get(self.s, parse_decimal, (Decimal,))["d"], Decimal("2.5"))
+        self.assertEqual(cache.misses, 2)
+
+    def test_eviction(self):
+        texts = ['[%d, "%s"]' % (i, "x" * 100) for i in range(10)]
+        cache = ParseCache(max_bytes=10 ** 9)
+        cache.get(texts[0], decode)
+        size = cache.bytes
+        cache = ParseCache(max_bytes=3 * size)
+        for text in texts:
+            cache.get(text, decode)
+        cache.get(texts[7], decode)
+        cache.get(texts[0], decode)
+        self.assertEqual(len(cache), 3)
+        self.assertLessEqual(cache.bytes, cache.max_bytes)
+        self.assertEqual(cache.stats()["evictions"], 8)
+        self.assertEqual((cache.hits, cache.misses), (1, 11))
+        # texts[7] was used more recently than texts[8]
+        self.assertEqual(cache.get(texts[7], decode), freeze(decode(texts[7])))
+        self.assertEqual(cache.hits, 2)
+
+    def test_load_json_string_cache(self):
+        cache = ParseCache()
+        floats = []
+
+        def parse_float(lexeme):
+            floats.append(lexeme)
+            return float(lexeme)
+        first = package.load_json_string(self.s, parse_float=parse_float, cache=cache)
+        # a hit returns the frozen result without parsing again
+        self.assertIs(package.load_json_string(self.s, parse_float=parse_float, cache=cache), first)
+        self.assertEqual((floats, cache.hits, cache.misses), (["2.5"], 1, 1))
+        with self.assertRaises(TypeError):
+            first["d"] = 1
+
+    def test_errors_not_cached(self):
+        cache = ParseCache()
+        for _ in range(2):
+            with self.assertRaises(ParseError):
+                cache.get('[1,]', decode)
+        self.assertEqual((len(cache), cache.misses), (0, 2))
+
+    def test_freeze_deep(self):
+        value = 0
+        for _ in range(10000):
+            value = [value]
+        frozen = freeze(value)
+        for _ in range(10000):
+            frozen = frozen[0]
+        self.assertEqual(frozen, 0)
+
+
+class SchemaTest(unittest.TestCase):
+
+    @dataclass
+    class Point:
+        x: int
+        y: float
+        label: Optional[str]
+
+    class Pair(NamedTuple):
+        left: bool
+        right: List[int]
+
+    @dataclass
+    class Shape:
+        points: Optional[List[int]]
+        origin: Optional["SchemaTest.Point"]
+
+    def test_schema_parse(self):
+        parser = SchemaParser([self.Point])
+        s = '[{"x": 1, "y": 2, "label": "a\\nb"},\n {"x":-3,"y":0.5e1,"label":null}]'
+        self.assertEqual(parser.parse(s), [self.Point(1, 2.0, "a\nb"), self.Point(-3, 5.0, None)])
+        parser = SchemaParser({"pairs": [self.Pair], "none": None, "empty": Record({}, tuple)})
+        s = '{"pairs": [{"left": true, "right": []}, {"left": false, "right": [1, 2]}], "none": null, "empty": {}}'
+        self.assertEqual(parser(s), {"pairs": [(True, []), (False, [1, 2])], "none": None, "empty": ()})
+        self.assertEqual(parser.fallbacks, 0)
+
+    def test_schema_optional_containers(self):
+        parser = SchemaParser(List[self.Shape])
+        s = '[{"points": [1, 2], "origin": {"x": 0, "y": 1, "label": null}}, {"points": null, "origin": null}]'
+        expected = [self.Shape([1, 2], self.Point(0, 1.0, None)), self.Shape(None, None)]
+        self.assertEqual(parser.parse(s), expected)
+        self.assertEqual(parser.fallbacks, 0)
+        s = '[{"origin": {"label": null, "y": 1, "x": 0}, "points": [1, 2]}, {"origin": null, "points": null}]'
+        self.assertEqual(parser.parse(s), expected)
+        self.assertEqual(parser.fallbacks, 1)
+        for s in ['[{"points": nullx, "origin": null}]', '[{"points": null , "origin": nul}]']:
+            with self.assertRaises((TokenError, ParseError)):
+                parser.parse(s)
+
+    def test_schema_hooks(self):
+        parser = SchemaParser({"a": float, "b": int}, parse_float=Decimal, parse_int=str)
+        self.assertEqual(parser.parse('{"a": 1.10, "b": 2}'), {"a": Decimal("1.10"), "b": "2"})
+        self.assertEqual(parser.parse('{"b": 2, "a": 1}'), {"a": Decimal("1"), "b": "2"})
+
+    def test_schema_fallback(self):
+        parser = SchemaParser([self.Point])
+        s = '[{"label": "a", "y": 1.5, "x": 1}]'
+        self.assertEqual(parser.parse(s), [self.Point(1, 1.5, "a")])
+        self.assertEqual(parser.fallbacks, 1)
+        for s in ['[{"x": 1.5, "y": 1, "label": "a"}]', '[{"x": 1}]', '{}', '']:
+            self.assertEqual(parser.parse(s), decode(s))
+        for s in ['[{"x": 1, "y": 1, "label": "a",}]', '[{"x": 1', '[{"x": 1, "y": 1, "label": "\x01"}]']:
+            with self.assertRaises((TokenError, ParseError)):
+                parser.parse(s)
+
+    def test_fail_schema(self):
+        with self.assertRaises(TypeError):
+            SchemaParser(int)
+        with self.assertRaises(TypeError):
+            SchemaParser([set])
+
+
+class DocumentsTest(unittest.TestCase):
+
+    s = '{"a": "}{\\"["}[1, 2]\n\n[{"b": [true]}] {}[]'
+    expected = [{"a": '}{"['}, [1, 2], [{"b": [True]}], {}, []]
+
+    def test_iter_documents(self):
+        for size in range(1, len(self.s) + 1):
+            chunks = [self.s[i:i + size] for i in range(0, len(self.s), size)]
+            self.assertEqual(list(iter_documents(chunks)), self.expected)
+        self.assertEqual(list(iter_documents([self.s.encode("utf-8")])), self.expected)
+        self.assertEqual(list(iter_documents(["", "  \n"])), [])
+        # a string spanning many chunks, with escapes split across them
+        s = '["' + 'a]\\\\\\"' * 20 + '"] {}'
+        for size in range(1, 8):
+            chunks = [s[i:i + size] for i in range(0, len(s), size)]
+            self.assertEqual(list(iter_documents(chunks)), [['a]\\"' * 20], {}])
+
+    def test_iter_documents_lazily(self):
+        def chunks():
+            yield '{"a": 1} ['
+            raise AssertionError("read too far")
+        self.assertEqual(next(iter_documents(chunks())), {"a": 1})
+
+    def test_fail_iter_documents(self):
+        with self.assertRaises(ParseError):
+            list(iter_documents(['[1] ', '[2', ']', ' 3 ', '[4]']))
+        with self.assertRaises(ParseError) as cm:
+            list(iter_documents(['[1]\n{"a": ', '1']))
+        self.assertIsNone(cm.exception.token)
+        with self.assertRaises(TokenError) as cm:
+            list(iter_documents(['[1]\n', '\n[2, @]']))
+        self.assertEqual(cm.exception.line_number, 3)
+        results = []
+        with self.assertRaises(ParseError):
+            for document in iter_documents(['[1]{"a" 1}[2]']):
+                results.append(document)
+        self.assertEqual(results, [[1]])
+
+    def test_check_end(self):
+        check_end('  {"a": [1, "]"]} \n')
+        check_end('')
+        with self.assertRaises(TrailingDataError) as cm:
+            check_end('{"a": 1}\n\n[2]')
+        self.assertEqual((cm.exception.token, cm.exception.line_number), (Token(Tag.LEFT_BRACKET), 3))
+        error = pickle.loads(pickle.dumps(cm.exception))
+        self.assertEqual(str(error), str(cm.exception))
+        self.assertEqual((error.offset, error.line_number, error.column), (10, 3, 1))
+
+    def test_iter_documents_error_position(self):
+        s = '[1]\n {"a":\n 2} [3, \u00e9, 4]'
+        data = s.encode("utf-8")
+        for size in [1, 4, len(data)]:
+            for chunks in [[s[i:i + size] for i in range(0, len(s), size)],
+                           [data[i:i + size] for i in range(0, len(data), size)]]:
+                with self.assertRaises(TokenError) as cm:
+                    list(iter_documents(chunks))
+                self.assertEqual((cm.exception.offset, cm.exception.line_number, cm.exception.column),
+                                 (s.index("\u00e9"), 3, 9))
+
+
+class LazyTest(unittest.TestCase):
+
+    text = '{"a": [1, 2.5, "x\\u00e9", true, false, null], "b": {"c": [[], {}]}, "\\n": -3, "a": [7, 8]}'
+
+    def test_load_lazy(self):
+        doc = load_lazy(self.text)
+        self.assertIsInstance(doc, LazyObject)
+        self.assertEqual(list(doc), ["a", "b", "\n"])
+        self.assertEqual(doc["a"][-1], 8)
+        self.assertEqual(doc["\n"], -3)
+        self.assertIsInstance(doc["b"]["c"], LazyArray)
+        self.assertEqual(len(doc["b"]["c"]), 2)
+        self.assertNotIn("c", doc)
+        self.assertEqual(doc, parse(lex(self.text)))
+        self.assertEqual(doc.materialize(), parse(lex(self.text)))
+        self.assertEqual(load_lazy('[1.5, 2]', parse_float=Decimal)[0], Decimal("1.5"))
+
+    def test_lazy_array(self):
+        doc = load_lazy('[0, [1, [2]], {"a": 3}, "4", 5]')
+        self.assertEqual(len(doc), 5)
+        self.assertEqual(doc[4], 5)
+        self.assertEqual(doc[1:4:2], [[1, [2]], "4"])
+        self.assertEqual(list(doc)[2]["a"], 3)
+        self.assertEqual(doc.index("4"), 3)
+        self.assertEqual(doc.count(5), 1)
+        with self.assertRaises(IndexError):
+            doc[5]
+
+    def test_build_tape(self):
+        tape = build_tape('[1, {"a": [2]}, "b"]')
+        self.assertEqual(len(tape), 7)
+        # the object at 2 skips over its key and value to "b" at 6
+        self.assertEqual(list(tape.counts), [3, 0, 1, 0, 1, 0, 0])
+        self.assertEqual(list(tape.skips), [7, 2, 6, 4, 6, 6, 7])
+        for s in ['', '5', '[1] 2', '[1,]', '{"a" 1}', '["a": 1]', '[{]}', '["\x01"]']:
+            self.assertIsNone(build_tape(s))
+
+    def test_fail_load_lazy(self):
+        assert_fails_like_parse(self, load_lazy)
+        self.assertEqual(load_lazy('[1] 2'), [1])
+        self.assertIsNone(load_lazy(''))
+
+
+class EventsTest(unittest.TestCase):
+
+    def test_events(self):
+        s = '{"a": [1, {"b": null}], "c": {}}'
+        self.assertEqual(list(events(lex(s))), [
+            ((), "start_map", None),
+            ((), "map_key", "a"),
+            (("a",), "start_array", None),
+            (("a", 0), "value", 1),
+            (("a", 1), "start_map", None),
+            (("a", 1), "map_key", "b"),
+            (("a", 1, "b"), "value", None),
+            (("a", 1), "end_map", None),
+            (("a",), "end_array", None),
+            ((), "map_key", "c"),
+            (("c",), "start_map", None),
+            (("c",), "end_map", None),
+            ((), "end_map", None)
+        ])
+
+    def test_events_none(self):
+        self.assertEqual(list(events(lex(''))), [])
+
+    def test_fail_events(self):
+        tests = ['1', '[1 2]', '{"a": 1,}', '[1,', '{"a" 1}', '{,}']
+        for test in tests:
+            with self.assertRaises(ParseError):
+                list(events(lex(test)))
+
+
+class ExtractTest(unittest.TestCase):
+
+    def test_extract(self):
+        s = '''
+        {
+            "users": [
+                {"id": 1, "name": "a]}", "tags": [1, 2]},
+                {"other": {"id": 9}, "id": 2},
+                {"id": {"key": [true, null]}}
+            ],
+            "id": 5
+        }
+        '''
+        for path, expected in [
+            (["users", "*", "id"], [1, 2, {"key": [True, None]}]),
+            (["users", 1, "other"], [{"id": 9}]),
+            (["users", "*", "tags", "*"], [1, 2]),
+            (["id"], [5]),
+            (["missing"], []),
+            (["id", "too deep"], [])
+        ]:
+            self.assertEqual(extract(s, path), expected)
+
+    def test_extract_whole_document(self):
+        s = '{"a": [1, {"b": "c"}]}'
+        self.assertEqual(extract(s, []), [parse(lex(s))])
+
+    def test_fail_extract(self):
+        tests = ['{"a": [1, tru]}', '{"a": [truex]}', '{"a": [1x]}', '{"a": ["b"x]}', '{"a": [@]}']
+        for test in tests:
+            with self.assertRaises(TokenError):
+                extract(test, ["a", "*"])
+        # grammar errors are ParseErrors, with the tokens that were expected
+        for test, found, expected, offset in [
+            ('{"a" 1}', Tag.LITERAL, [Tag.OBJECT_KEY], 1),
+            ('{"a": [1,', None, VALUE_TAGS, 9),
+            ('{"a": [1-2]}', Tag.NUMBER, [Tag.COMMA, Tag.RIGHT_BRACKET], 8),
+            ('{"a": [1 2]}', Tag.NUMBER, [Tag.COMMA, Tag.RIGHT_BRACKET], 9),
+            ('{"a": {3: 1}}', Tag.NUMBER, [Tag.OBJECT_KEY], 7),
+            ('{"a": 1 2}', Tag.NUMBER, [Tag.COMMA, Tag.RIGHT_BRACE], 8),
+        ]:
+            with self.assertRaises(ParseError) as cm:
+                extract(test, ["a", "*"])
+            self.assertEqual(None if cm.exception.token is None else cm.exception.token.tag, found)
+            self.assertEqual((cm.exception.expected, cm.exception.offset), (expected, offset))
+        with self.assertRaises(TokenError) as cm:
+            extract('{\n"a": 1,\n  "b\\x": 2}', ["b"])
+        self.assertEqual((cm.exception.offset, cm.exception.line_number), (15, 3))
+        for test in ['{"a": truex}', '{"a": 1x}', '{"a": nullx}']:
+            with self.assertRaises(TokenError):
+                parse(lex(test))
+            with self.assertRaises(TokenError):
+                extract(test, ["a"])
+
+    def test_extract_deep(self):
+        s = '{"a": %s1%s}' % ("[" * 5000, "]" * 5000)
+        value = extract(s, ["a"])[0]
+        for _ in range(5000):
+            value = value[0]
+        self.assertEqual(value, 1)
+
+
+class JsonlTest(unittest.TestCase):
+
+    lines = ['{"id": %d, "tags": ["a", "b"]}\n' % i for i in range(50)] + ["\n"]
+
+    def test_iter_jsonl(self):
+        self.assertEqual(list(iter_jsonl(self.lines)),
+                         [{"id": i, "tags": ["a", "b"]} for i in range(50)])
+
+    def test_iter_jsonl_workers(self):
+        expected = list(iter_jsonl(self.lines))
+        self.assertEqual(
+            list(iter_jsonl(self.lines, workers=2, batch_size=7)), expected)
+        unordered = iter_jsonl(self.lines, workers=2, batch_size=7, ordered=False)
+        self.assertEqual(sorted(unordered, key=lambda d: d["id"]), expected)
+
+    def test_fail_iter_jsonl(self):
+        with self.assertRaises(TokenError) as cm:
+            list(iter_jsonl(['[1]', '', '[tru]']))
+        self.assertEqual(cm.exception.line_number, 3)
+        with self.assertRaises(ParseError):
+            list(iter_jsonl(['[1]', '{"a" 1}'], workers=2, batch_size=1))
+        lines = ['[1]\n', '\n', '{"a": 1} [2]\n']
+        for workers in [1, 2]:
+            with self.assertRaises(TrailingDataError) as cm:
+                list(iter_jsonl(lines, workers=workers, batch_size=1))
+            self.assertEqual((cm.exception.offset, cm.exception.line_number, cm.exception.column),
+                             (14, 3, 10))
+        with self.assertRaises(ParseError) as cm:
+            list(iter_jsonl(['[1]\n', '[2, {"a" 1}]\n']))
+        self.assertEqual((cm.exception.offset, cm.exception.line_number, cm.exception.column),
+                         (9, 2, 6))
+
+    def test_fail_load_jsonl_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.jsonl")
+            with open(path, "wb") as f:
+                f.write(b'[1]\r\n\r\n{"a": 2}\r\n[3 4]\r\n')
+            with self.assertRaises(ParseError) as cm:
+                list(load_jsonl_file(path))
+            self.assertEqual((cm.exception.offset, cm.exception.line_number, cm.exception.column), (20, 4, 4))
+
+    def test_iter_jsonl_deep(self):
+        line = "[" * 5000 + "]" * 5000 + "\n"
+        self.assertEqual(len(list(iter_jsonl([line, line]))), 2)
+
+    def test_errors_pickle(self):
+        for error in [TokenError("x", 3), ParseError(Token(Tag.COMMA), [Tag.NULL])]:
+            self.assertEqual(str(pickle.loads(pickle.dumps(error))), str(error))
+
+
+class IncrementalTest(unittest.TestCase):
+
+    s = '{"a": [1, {"b": [2, 3]}], "c": {"d": "]"}, "e": [[], [4]]}'
+
+    def edit(self, doc, old, new, count=1):
+        # replaces the count-th occurrence of old in doc's text with new
+        offset = -1
+        for _ in range(count):
+            offset = doc.text.index(old, offset + 1)
+        expected = doc.text[:offset] + new + doc.text[offset + len(old):]
+        self.assertEqual(doc.edit(offset, len(old), new), decode(expected))
+        self.assertEqual(doc.text, expected)
+
+    def test_incremental_edits(self):
+        doc = IncrementalDocument(self.s)
+        self.edit(doc, "3", '{"x": [5]}')
+        self.edit(doc, "5", "6, 7")
+        self.edit(doc, '"]"', '"[", "f": {}')
+        self.edit(doc, "[4]", "[4, [8]]")
+        self.edit(doc, "8", "9")
+        self.edit(doc, '"b"', '"g"')
+        self.edit(doc, "1, ", "")
+        self.assertEqual((doc.full_parses, doc.partial_parses), (1, 7))
+        self.edit(doc, '{"a"', ' {"h": null, "a"')
+        self.assertEqual(doc.full_parses, 2)
+
+    def test_incremental_append(self):
+        # insertions right before a closing bracket go into that container
+        doc = IncrementalDocument('[[1,2],[3,4]]')
+        self.assertEqual(doc.full_parses, 1)
+        for offset, inserted, expected in [(12, ",5", [[1, 2], [3, 4], 5]), (11, ",6", [[1, 2], [3, 4, 6], 5]),
+                                           (5, ",[]", [[1, 2, []], [3, 4, 6], 5]), (7, "7", [[1, 2, [7]], [3, 4, 6], 5])]:
+            self.assertEqual(doc.edit(offset, 0, inserted), expected)
+        self.assertEqual((doc.full_parses, doc.partial_parses), (1, 4))
+
+    def test_incremental_repeated_keys(self):
+        doc = IncrementalDocument('{"a": [1], "b": {"a": [2], "a": [3]}}')
+        self.edit(doc, "3", "4")
+        self.edit(doc, "2", "5")
+        self.assertEqual(doc.value, {"a": [1], "b": {"a": [4]}})
+
+    def test_fail_incremental(self):
+        doc = IncrementalDocument(self.s)
+        with self.assertRaises(ParseError):
+            doc.edit(doc.text.index("2"), 1, "2]")
+        with self.assertRaises(ParseError):
+            doc.edit(doc.text.index("4"), 1, "@")
+        with self.assertRaises(TokenError):
+            doc.edit(doc.text.index("2]"), 2, "2")
+        self.edit(doc, "@", "4")
+        self.assertEqual(doc.value, decode(self.s))
+        with self.assertRaises(ValueError):
+            doc.edit(len(self.s), 1, "")
+
+
+class InstrumentTest(unittest.TestCase):
+
+    s = '{"ab": [1, 2.5, "c\\n"], "d": {"e": [true, null]}}'
+
+    def test_parse_stats(self):
+        for engine in ["direct", "tokens"]:
+            stats = ParseStats()
+            self.assertEqual(load_instrumented(self.s, stats, engine), json.loads(self.s))
+            load_instrumented(self.s, stats, engine)
+            self.assertEqual((stats.documents, stats.errors, stats.characters), (2, 0, 2 * len(self.s)))
+            self.assertEqual(set(stats.stages), {"decode", "count"} if engine == "direct" else {"lex", "parse", "count"})
+            self.assertEqual(stats.tokens[Tag.OBJECT_KEY], 6)
+            self.assertEqual(stats.tokens[Tag.COMMA], 8)
+            self.assertEqual(stats.max_depth, 3)
+            self.assertEqual(stats.string_characters, 2 * 15)
+            self.assertEqual(stats.number_characters, 2 * 4)
+            self.assertEqual(stats.allocations["dicts"], 4)
+            self.assertEqual(stats.allocations["tokens"], 0 if engine == "direct" else 12)
+            self.assertGreater(stats.throughput, 0)
+            self.assertEqual(stats.stats()["tokens"]["LEFT_BRACKET"], 4)
+            stats.clear()
+            self.assertEqual(stats.stats()["documents"], 0)
+        stats = ParseStats()
+        load_instrumented('[{"a": 1, "b": "x"}, {"a": 2, "b": "y"}]', stats, "tokens")
+        self.assertEqual(stats.allocations["tokens"], 6)
+
+    def test_parse_stats_errors(self):
+        stats = ParseStats()
+        for s in ['[1, @]', '[1,, @]', '{"a" 1}']:
+            for engine in ["direct", "tokens"]:
+                with self.assertRaises((TokenError, ParseError)) as cm:
+                    parse_iterative(lex_iter(s))
+                with self.assertRaises(type(cm.exception)) as instrumented:
+                    load_instrumented(s, stats, engine)
+                self.assertEqual(str(instrumented.exception), str(cm.exception))
+        self.assertEqual((stats.documents, stats.errors), (6, 6))
+        self.assertEqual(sum(stats.tokens.values()), 0)
+
+
+class ParallelTest(unittest.TestCase):
+
+    text = '[' + ', '.join('{"id": %d, "s": "a]\\"b,", "v": [%d, {}]}' % (i, i) for i in range(40)) + ']'
+
+    def test_split_array(self):
+        s = ' [1, "a,]", {"b": [2, 3]}, [[]] ] '
+        self.assertEqual([s[start:end] for start, end in split_array(s)],
+                         ['1', ' "a,]"', ' {"b": [2, 3]}', ' [[]] '])
+        self.assertEqual(split_array('[]'), [])
+        for s in ['{"a": 1}', '[1, [2]', '[1}', '["a]', '[1] 2', '']:
+            self.assertIsNone(split_array(s))
+
+    def test_parse_parallel(self):
+        expected = parse(lex(self.text))
+        self.assertEqual(parse_parallel(self.text, workers=2, chunk_size=50), expected)
+        self.assertEqual(parse_parallel(self.text, workers=1), expected)
+        self.assertEqual(parse_parallel('[1.5, 2]', workers=2, chunk_size=1, parse_float=Decimal),
+                         [Decimal("1.5"), 2])
+        self.assertEqual(parse_parallel('[1.5, 2]', workers=2, chunk_size=1, parse_float=lambda s: -float(s)),
+                         [-1.5, 2])
+
+    def test_fail_parse_parallel(self):
+        assert_fails_like_parse(self, lambda s: parse_parallel(s, workers=2, chunk_size=1))
+        with self.assertRaises(DepthError):
+            parse_parallel('[[1], [[2]]]', workers=2, chunk_size=1, max_depth=2)
+
+
+class AsyncTest(unittest.TestCase):
+
+    text = '[' + ', '.join('{"id": %d, "s": "caf\u00e9"}' % i for i in range(100)) + ']'
+
+    def test_load_async(self):
+        expected = parse(lex(self.text))
+        # parsed at once, in pieces, and in an executor
+        for yield_threshold, offload_threshold in [(10 ** 6, 10 ** 7), (100, 10 ** 7), (100, 200)]:
+            result = asyncio.run(load_async(self.text, yield_threshold=yield_threshold,
+                                            offload_threshold=offload_threshold))
+            self.assertEqual(result, expected)
+        self.assertEqual(asyncio.run(load_async('{"a": 1.5}', parse_float=Decimal, yield_threshold=1)),
+                         {"a": Decimal("1.5")})
+
+    def test_fail_load_async(self):
+        assert_fails_like_parse(self, lambda s: asyncio.run(load_async(s, yield_threshold=1)))
+
+    def test_load_async_stream(self):
+        data = self.text.encode("utf-8")
+
+        async def from_reader():
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            return await load_async_stream(reader, chunk_size=7)
+
+        async def from_iterator():
+            async def chunks():
+                for i in range(0, len(data), 5):
+                    yield data[i:i + 5]
+            return await load_async_stream(chunks())
+
+        expected = parse(lex(self.text))
+        self.assertEqual(asyncio.run(from_reader()), expected)
+        self.assertEqual(asyncio.run(from_iterator()), expected)
+
+    def test_fail_load_async_stream(self):
+        async def from_reader(data):
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            return await load_async_stream(reader, chunk_size=3)
+
+        with self.assertRaises(TokenError) as cm:
+            asyncio.run(from_reader(b'[1,\n2,\n@]'))
+        self.assertEqual(cm.exception.line_number, 3)
+
+    def test_cancel_load_async_stream(self):
+        async def cancel():
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(1))
+            reader = asyncio.StreamReader()
+            reader.feed_data(b'[1, 2')
+            task = asyncio.ensure_future(load_async_stream(reader))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            # the only thread is no longer waiting for the rest of the stream
+            return await asyncio.wait_for(loop.run_in_executor(None, int, "3"), 5)
+
+        self.assertEqual(asyncio.run(cancel()), 3)
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_corpora(self):
+        for name in benchmark.CORPORA:
+            text = benchmark.generate(name, scale=0.01)
+            self.assertEqual(text, benchmark.generate(name, scale=0.01))
+            self.assertEqual(decode(text), json.loads(text))
+            self.assertEqual(parse(lex(text)), json.loads(text))
+
+    def test_regressions(self):
+        results = benchmark.run(["numbers"], repeat=1, scale=0.01, stage_filter="load")
+        self.assertEqual(benchmark.regressions(results, results), [])
+        faster = json.loads(json.dumps(results))
+        for m in faster["results"]["numbers"]["stages"].values():
+            m["mb_per_s"] *= 2
+        self.assertEqual(len(benchmark.regressions(results, faster)), 2)
+
+    def test_stages(self):
+        text = benchmark.generate("records", scale=0.001)
+        stages = benchmark.stages(text)
+        for name in ["lex[compact]", "parse[iterative]", "validate"]:
+            self.assertIn(name, stages)
+            stages[name]()
+        self.assertEqual(stages["parse[iterative]"](), json.loads(text))
+
+
+class ValidatorTest(unittest.TestCase):
+
+    def test_validate(self):
+        for s in ['', ' {} ', '[1, -2.5E+3, "a\\u00e9\\n", true, false, null]',
+                  '{"a": {"b": [[], {}, "]"]}, "c": "\u00e9\u2028"}', '[01, 1.]', '[1] [2]',
+                  '[' * 100 + ']' * 100, '[' + '0, ' * 2000 + '{"k": [' * 40 + ']}' * 40 + ']']:
+            self.assertIsNone(validate(s))
+            self.assertIsNone(validate(s.encode("utf-8")))
+
+    def test_fail_validate(self):
+        for s in ['[1, 2', '[1,, 2]', '{"a" 1}', '{"a": 1,}', '[1 2]', '"a"', '[S]', '[V, "a"]',
+                  '[1.5.2]', '[tru]', '["a\tb"]', '["\\x"]', '["\u200b"]', '[1] @', '{"a": [}]',
+                  '[' * 100 + ']' * 99, '[' + '0, ' * 2000 + '{"k": [' * 40 + ']}' * 39 + ']']:
+            with self.assertRaises((TokenError, ParseError)) as cm:
+                parse_iterative(lex_iter(s))
+            for text in [s, s.encode("utf-8")]:
+                with self.assertRaises(type(cm.exception)) as validated:
+                    validate(text)
+                self.assertEqual(str(validated.exception), str(cm.exception))
+                if isinstance(cm.exception, ParseError):
+                    locate(cm.exception, s)
+                self.assertEqual(validated.exception.offset, cm.exception.offset)
+
+
+class WriterTest(unittest.TestCase):
+
+    obj = {"name": "brent", "age": 22, "height": 1.8, "ok": True, "no": False,
+           "none": None, "interests": ["juggling", []], "nested": {"key": {}}}
+
+    def test_encode(self):
+        self.assertEqual(encode(self.obj), json.dumps(self.obj, separators=(",", ":")))
+        self.assertEqual(encode(self.obj, indent=4), json.dumps(self.obj, indent=4))
+        self.assertEqual(encode([Decimal("1.10"), (1, 2)]), '[1.10,[1,2]]')
+        self.assertEqual(encode(b"x", default=lambda o: o.decode()), '"x"')
+
+    def test_encode_round_trip(self):
+        self.assertEqual(decode(encode(self.obj)), self.obj)
+        self.assertEqual(decode(encode(self.obj, indent=2)), self.obj)
+        strings = ['q"b\\', "\n\t\x01\x7f", "caf\u00e9 \u200b", "\U0001f600\U000e0001"]
+        self.assertEqual(decode(encode(strings)), strings)
+        self.assertEqual(parse(lex(encode({s: s for s in strings}))), {s: s for s in strings})
+
+    def test_iter_encode(self):
+        obj = [self.obj] * 100
+        chunks = list(iter_encode(obj, chunk_size=1000))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), encode(obj))
+
+    def test_encode_deep(self):
+        depth = 10000
+        obj = []
+        for _ in range(depth):
+            obj = [obj]
+        self.assertEqual(encode(obj), "[" * (depth + 1) + "]" * (depth + 1))
+
+    def test_escape_string(self):
+        for s, expected in [
+            ("plain", '"plain"'),
+            ('q"b\\', '"q\\"b\\\\"'),
+            ("\n\t\x01\x7f", '"\\n\\t\\u0001\\u007f"'),
+            ("caf\u00e9 \u200b", '"caf\u00e9 \\u200b"'),
+            ("\U000e0001", '"\\udb40\\udc01"')
+        ]:
+            self.assertEqual(escape_string(s), expected)
+            lex(expected)
+
+    def test_fail_encode(self):
+        circular = []
+        circular.append(circular)
+        for obj, error in [(float("nan"), ValueError), ([float("inf")], ValueError),
+                           (circular, ValueError), ({1: 2}, TypeError), (object(), TypeError)]:
+            with self.assertRaises(error):
+                encode(obj)
+        calls = []
+        with self.assertRaises(TypeError):
+            encode([1, object()], default=lambda o: calls.append(o) or object())
+        self.assertEqual(len(calls), 1)
+        with self.assertRaises(TypeError):
+            list(iter_encode({"a": b"x"}, default=lambda o: o))
+
+
+
+class StreamTest(unittest.TestCase):
+
+    s = '{"key": [12345.678e2, -90], "esc\\u00e9": "a\\nb\\u20ac", "caf\u00e9": "\u20ac\U0001f600"}'
+
+    class ReadOnly(object):
+        # a binary file object with read but not read1
+        def __init__(self, data):
+            self.file = io.BytesIO(data)
+
+        def read(self, size):
+            return self.file.read(size)
+
+    def test_load_json_stream(self):
+        expected = json.loads(self.s)
+        data = self.s.encode("utf-8")
+        # every chunk size cuts a number, an escape, a key and a multi-byte character somewhere
+        for size in range(1, len(data) + 1):
+            for fileobj in [io.StringIO(self.s), io.BytesIO(data), self.ReadOnly(data)]:
+                self.assertEqual(package.load_json_stream(fileobj, chunk_size=size), expected)
+        self.assertEqual(package.load_json_stream(io.StringIO("[1.5]"), parse_float=Decimal), [Decimal("1.5")])
+
+    def test_load_json_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.json")
+            with open(path, "wb") as f:
+                f.write(self.s.encode("utf-8"))
+            self.assertEqual(package.load_json_file(path, chunk_size=3), json.loads(self.s))
+
+    def test_dump_json_stream(self):
+        value = json.loads(self.s)
+        text = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        for mode in ["w+", "w+b"]:
+            # neither kind of SpooledTemporaryFile is a TextIOBase
+            with tempfile.SpooledTemporaryFile(mode=mode, encoding=None if "b" in mode else "utf-8") as f:
+                package.dump_json_stream(value, f, chunk_size=4)
+                f.seek(0)
+                self.assertEqual(f.read(), text.encode("utf-8") if "b" in mode else text)
+        fileobj = io.StringIO()
+        package.dump_json_stream(value, fileobj, chunk_size=4)
+        self.assertEqual(fileobj.getvalue(), text)
+        fileobj = io.BytesIO()
+        package.dump_json_stream(value, fileobj, chunk_size=4)
+        self.assertEqual(fileobj.getvalue(), text.encode("utf-8"))
+        # a GzipFile only takes bytes
+        compressed = io.BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode="wb") as fileobj:
+            package.dump_json_stream(value, fileobj, chunk_size=4)
+        self.assertEqual(gzip.decompress(compressed.getvalue()), text.encode("utf-8"))
+
+    def test_dump_json_file(self):
+        value = json.loads(self.s)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.json")
+            package.dump_json_file(value, path, indent=2, chunk_size=4)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), package.dump_json_string(value, indent=2).encode("utf-8"))
+            self.assertEqual(package.load_json_file(path), value)
+
+    def test_load_json_mmap(self):
+        data = self.s.encode("utf-8")
+        self.assertEqual(package.load_json_bytes(bytearray(data)), json.loads(self.s))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.json")
+            for contents, expected in [(data, json.loads(self.s)), (b"", None), (b" \n", None)]:
+                with open(path, "wb") as f:
+                    f.write(contents)
+                self.assertEqual(package.load_json_mmap(path), expected)
+            # the offset counts characters, not bytes
+            with open(path, "wb") as f:
+                f.write('{"\u20ac": [1,\n 2 3]}'.encode("utf-8"))
+            with self.assertRaises(ParseError) as cm:
+                package.load_json_mmap(path)
+            self.assertEqual((cm.exception.offset, cm.exception.line_number, cm.exception.column), (13, 2, 4))
+
+    def test_fail_load_json_stream(self):
+        s = '[1, 2, 3, 4, 5,\n 6, 7, 8 9, 10]'
+        # the error is at offset 25, in the chunk read from offset 24 on
+        for fileobj in [io.StringIO(s), io.BytesIO(s.encode("utf-8"))]:
+            with self.assertRaises(ParseError) as cm:
+                package.load_json_stream(fileobj, chunk_size=4)
+            self.assertEqual((cm.exception.offset, cm.exception.line_number, cm.exception.column), (24, 2, 9))
+        with self.assertRaises(TokenError) as cm:
+            package.load_json_stream(io.BytesIO(b'[1,\n 2, @]'), chunk_size=2)
+        self.assertEqual((cm.exception.offset, cm.exception.line_number), (8, 2))
+        with self.assertRaises(UnicodeDecodeError):
+            package.load_json_stream(io.BytesIO(b'["\xc3"]'), chunk_size=2)
+
 
 if __name__ == '__main__':
     unittest.main()
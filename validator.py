@@ -0,0 +1,139 @@
+"""
+Title: JSON Validator
+Author: Brent Pappas
+"""
+
+import re
+import unicodedata
+from typing import Union
+
+from .decoder import decode
+from .lexer import lex_bytes
+from .parser_ import ParseError, locate, parse_iterative
+
+# the deepest nesting collapsed before handing a text over to the parser,
+# since each level takes another pass over what is left of the text
+MAX_PASSES = 32
+
+# strict JSON, which the lexer and parser accept as well
+_STRING = r'"[^"\\\x00-\x1f\x7f]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\\x00-\x1f\x7f]*)*"'
+# innermost arrays and objects, once every string is S and other scalar V
+_ARRAY = r'\[(?:[SV](?:,[SV])*)?\]'
+_OBJECT = r'\{(?:S:[SV](?:,S:[SV])*)?\}'
+# more than MAX_PASSES arrays and objects opened one inside the next, each as
+# the first value of the last, which would take more passes to collapse
+_DEEP = r'(?:[\[{](?:S:)?){%d}' % (MAX_PASSES + 1)
+# the same before reducing anything, which is only looked for near the start
+# of the text since searching all of it costs about as much as reducing it
+_RAW_DEEP = r'(?:[\[{][ \t\n\r]*(?:"[^"\\]*"[ \t\n\r]*:[ \t\n\r]*)?){%d}' % (MAX_PASSES + 1)
+RAW_DEEP_LENGTH = 4096
+# every form of number, once each run of digits is a single 0, longest first
+NUMBER_SHAPES = sorted((sign + "0" + fraction + exponent for sign in ("-", "") for fraction in (".0", "")
+                        for exponent in ("e0", "e+0", "e-0", "E0", "E+0", "E-0", "")), key=len, reverse=True)
+DIGITS = list("123456789")
+LITERALS = ["true", "false", "null"]
+WHITESPACE = [" ", "\t", "\n", "\r"]
+
+NON_ASCII_PATTERN = re.compile(r'[^\x00-\x7f]')
+# the patterns and strings to reduce str and bytes texts with
+_PATTERNS = (_RAW_DEEP, _STRING, _ARRAY, _OBJECT, _DEEP)
+_REDUCERS = {
+    str: (*map(re.compile, _PATTERNS), NUMBER_SHAPES, DIGITS, LITERALS, WHITESPACE, "S", "V", "0", ""),
+    bytes: (*(re.compile(p.encode("ascii")) for p in _PATTERNS),
+            *([s.encode("ascii") for s in strings] for strings in (NUMBER_SHAPES, DIGITS, LITERALS, WHITESPACE)),
+            b"S", b"V", b"0", b""),
+}
+
+
+def validate(text: Union[str, bytes]) -> None:
+    '''
+    Args:
+        text: The JSON text to check, or its UTF-8 encoding as bytes
+
+    Raises:
+        TokenError, ParseError: The same error load_json_string (or for bytes,
+        load_json_bytes) would raise for text, if any
+
+    The text is checked without creating any tokens or Python values. Its
+    strings and other scalars are replaced by single letters, and then its
+    innermost arrays and objects, over and over until only one value (or
+    something else) is left. Each step is a regular expression substitution
+    or str.replace over the whole text, so no Python code runs per token.
+    Bytes that are all ASCII are checked as they are, without decoding them.
+
+    Only strict JSON is accepted this way. Anything else, such as the few
+    inputs the lexer is lenient about or text nested too deeply to collapse
+    in MAX_PASSES passes, is parsed instead to find its error, if it has one.
+    Runs of arrays and objects opened one inside the next are looked for
+    before collapsing anything, so most such texts are parsed without
+    spending any passes on them.
+
+    '''
+    if isinstance(text, (bytes, bytearray)):
+        data = text
+        if data.isascii():
+            if _is_strict(bytes(data)):
+                return
+        else:
+            try:
+                if _is_strict_text(data.decode("utf-8")):
+                    return
+            except UnicodeDecodeError:
+                pass
+        try:
+            parse_iterative(lex_bytes(data))
+        except ParseError as error:
+            locate(error, data)
+            raise
+        return
+
+    if not _is_strict_text(text):
+        decode(text)
+
+
+def _is_strict_text(text: str) -> bool:
+    # the lexer refuses any character in a Unicode "C" category in a string,
+    # which a regular expression cannot tell apart
+    if not text.isascii() and any(unicodedata.category(c)[0] == "C" for c in set(NON_ASCII_PATTERN.findall(text))):
+        return False
+    return _is_strict(text)
+
+
+def _is_strict(text: Union[str, bytes]) -> bool:
+    # whether text is a single strict JSON object or array (or empty)
+    (raw_deep, string, array, object_, deep, shapes, digits, literals, whitespace,
+     S, V, zero, empty) = _REDUCERS[type(text)]
+    if raw_deep.search(text, 0, RAW_DEEP_LENGTH):
+        return False
+    reduced, n = string.subn(S, text)
+    # a letter left in the text would be mistaken for a value
+    if reduced.count(S) != n or V in reduced:
+        return False
+    for literal in literals:
+        reduced = reduced.replace(literal, V)
+    # each run of digits becomes a single 0
+    for digit in digits:
+        reduced = reduced.replace(digit, zero)
+    while zero + zero in reduced:
+        reduced = reduced.replace(zero + zero, zero)
+    for shape in shapes:
+        reduced = reduced.replace(shape, V)
+    # scalars next to each other are now VV, which never collapses
+    for c in whitespace:
+        reduced = reduced.replace(c, empty)
+    if not reduced:
+        return True
+    if reduced[:1] not in (b"[", b"{", "[", "{"):
+        # parser_.parse only accepts an object or array at the top
+        return False
+    if deep.search(reduced):
+        return False
+
+    for _ in range(MAX_PASSES):
+        collapsed = object_.sub(V, array.sub(V, reduced))
+        if collapsed == V:
+            return True
+        if collapsed == reduced:
+            return False
+        reduced = collapsed
+    return False
@@ -0,0 +1,223 @@
+"""
+Title: JSON Writer
+Author: Brent Pappas
+"""
+
+import math
+import re
+import unicodedata
+from collections.abc import Mapping, Sequence
+from decimal import Decimal
+from typing import Any, Callable, Iterator, Optional
+
+# characters that must be escaped in ASCII text: quotes, backslashes and
+# control characters (including DEL, which the lexer rejects as well)
+ASCII_ESCAPE_PATTERN = re.compile(r'[\x00-\x1f"\\\x7f]')
+SHORT_ESCAPES = {
+    '"': '\\"',
+    "\\": "\\\\",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\t": "\\t",
+    "\b": "\\b",
+    "\f": "\\f",
+}
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# the number of pieces joined together at a time while streaming
+PIECES_PER_JOIN = 512
+# sequences that are not written as arrays
+BINARY_TYPES = (bytes, bytearray, memoryview)
+
+
+def escape_string(s: str) -> str:
+    '''
+    Args:
+        s: A Python string
+
+    Returns:
+        str: s as a quoted JSON string literal
+
+    Besides quotes, backslashes and control characters, every character the
+    lexer refuses to see raw in a string (any in a Unicode "C" category, such
+    as format characters and lone surrogates) is written as a \\u escape, so
+    everything written can be read back. ASCII strings that need no escaping,
+    which is the common case, are only checked by a single regular
+    expression search, and other strings only go character by character
+    when they hold a non-printable, non-ASCII character.
+
+    '''
+    if s.isascii():
+        if ASCII_ESCAPE_PATTERN.search(s) is None:
+            return '"' + s + '"'
+        return '"' + ASCII_ESCAPE_PATTERN.sub(_escape_match, s) + '"'
+    escaped = ASCII_ESCAPE_PATTERN.sub(_escape_match, s)
+    if escaped.isprintable():
+        return '"' + escaped + '"'
+    return '"' + "".join([_escape_character(c) for c in s]) + '"'
+
+
+def _escape_match(match: 're.Match') -> str:
+    return _escape_character(match.group())
+
+
+def _escape_character(c: str) -> str:
+    escaped = SHORT_ESCAPES.get(c)
+    if escaped is not None:
+        return escaped
+    if c < " " or unicodedata.category(c)[0] == "C":
+        code = ord(c)
+        if code > 0xFFFF:
+            # characters outside the basic multilingual plane become a surrogate pair
+            code -= 0x10000
+            return f"\\u{0xD800 | (code >> 10):04x}\\u{0xDC00 | (code & 0x3FF):04x}"
+        return f"\\u{code:04x}"
+    return c
+
+
+def encode(obj: Any, indent: Optional[int] = None, default: Optional[Callable[[Any], Any]] = None) -> str:
+    '''
+    Args:
+        obj: The Python object to write as JSON. dicts (with str keys),
+            lists, tuples, strs, ints, floats, Decimals, bools and None are
+            supported, as are any other Mapping (such as a MappingProxyType
+            or lazy.LazyObject) and Sequence (other than bytes)
+        indent: None for compact output with no whitespace, or the number of
+            spaces to indent each nested level by
+        default: Called with any other object, and should return a supported
+            object to write in its place (or raise a TypeError). A TypeError
+            is raised if what it returns is not supported either
+
+    Returns:
+        str: The JSON text
+
+    '''
+    return "".join(iter_encode(obj, indent, default, chunk_size=None))
+
+
+def iter_encode(obj: Any, indent: Optional[int] = None, default: Optional[Callable[[Any], Any]] = None,
+                chunk_size: Optional[int] = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    '''
+    Args:
+        obj, indent, default: See encode
+        chunk_size: The approximate number of characters per chunk, or None
+            to produce a single chunk
+
+    Returns:
+        iterator: A generator yielding the JSON text in chunks
+
+    The structures being written are kept on an explicit stack rather than
+    recursed into, so objects of any depth can be written. Small pieces of
+    output are collected in a list and joined together, and a chunk is only
+    yielded once about chunk_size characters are ready, so writing the
+    chunks to a file makes few, large writes.
+
+    '''
+    item_separator = ","
+    key_separator = ":" if indent is None else ": "
+
+    pieces = []
+    append = pieces.append
+    # joined pieces that have not been yielded yet, and their total size
+    joined = []
+    joined_size = 0
+
+    # for each structure being written: an iterator over its remaining
+    # items, whether it is a dict, and its closing bracket
+    stack = []
+    # ids of the structures being written, to catch circular references
+    open_ids = set()
+
+    # the last object default returned
+    defaulted = stack
+
+    o = obj
+    while True:
+        # {invariant: o is the next value to write}
+        if isinstance(o, str):
+            append(escape_string(o))
+        elif o is None:
+            append("null")
+        elif o is True:
+            append("true")
+        elif o is False:
+            append("false")
+        elif isinstance(o, int):
+            append(int.__repr__(o))
+        elif isinstance(o, float):
+            if not math.isfinite(o):
+                raise ValueError(f"Cannot write {o!r}, since JSON has no infinite or NaN numbers")
+            append(float.__repr__(o))
+        elif isinstance(o, Decimal):
+            if not o.is_finite():
+                raise ValueError(f"Cannot write {o!r}, since JSON has no infinite or NaN numbers")
+            append(str(o))
+        elif isinstance(o, (list, tuple, dict)) or (isinstance(o, (Mapping, Sequence))
+                                                    and not isinstance(o, BINARY_TYPES)):
+            is_dict = isinstance(o, (dict, Mapping))
+            if not o:
+                append("{}" if is_dict else "[]")
+            else:
+                if id(o) in open_ids:
+                    raise ValueError("Cannot write a circular reference")
+                open_ids.add(id(o))
+                items = iter(o.items()) if is_dict else iter(o)
+                stack.append((items, is_dict, o))
+                append("{" if is_dict else "[")
+                if indent is not None:
+                    append("\n" + " " * (indent * len(stack)))
+                o = next(items)
+                if is_dict:
+                    key, o = o
+                    append(_encode_key(key))
+                    append(key_separator)
+                continue
+        elif default is not None and o is not defaulted:
+            # what default returns is written as is, so that a default
+            # returning another unsupported object is not called forever
+            o = defaulted = default(o)
+            continue
+        else:
+            raise TypeError(f"Object of type {type(o).__name__} cannot be written as JSON")
+
+        # a value was just written, so move on to the next item of the
+        # innermost structure, closing every structure that is finished
+        while stack:
+            items, is_dict, container = stack[-1]
+            item = next(items, stack)
+            if item is not stack:
+                append(item_separator)
+                if indent is not None:
+                    append("\n" + " " * (indent * len(stack)))
+                if is_dict:
+                    key, o = item
+                    append(_encode_key(key))
+                    append(key_separator)
+                else:
+                    o = item
+                break
+            stack.pop()
+            open_ids.discard(id(container))
+            if indent is not None:
+                append("\n" + " " * (indent * len(stack)))
+            append("}" if is_dict else "]")
+        else:
+            break
+
+        if chunk_size is not None and len(pieces) >= PIECES_PER_JOIN:
+            chunk = "".join(pieces)
+            pieces.clear()
+            joined.append(chunk)
+            joined_size += len(chunk)
+            if joined_size >= chunk_size:
+                yield "".join(joined)
+                joined.clear()
+                joined_size = 0
+
+    joined.append("".join(pieces))
+    yield "".join(joined)
+
+
+def _encode_key(key: Any) -> str:
+    if not isinstance(key, str):
+        raise TypeError(f"Object keys must be str, not {type(key).__name__}")
+    return escape_string(key)